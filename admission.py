@@ -0,0 +1,143 @@
+# Controle de admissão: limites de concorrência independentes por etapa.
+#
+# Transcrição (CPU), IA (rede, lenta) e TTS têm cada uma o seu número de vagas e uma
+# fila de espera limitada. Quem chega com a fila cheia é recusado na hora; quem espera
+# mais que o prazo da etapa também. Assim, num pico, as requisições aceitas mantêm a
+# latência normal em vez de todas ficarem lentas juntas.
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+STAGE_LABELS = {"transcribe": "transcrição", "llm": "IA", "tts": "síntese de voz"}
+
+# (vagas, fila, prazo de espera em segundos)
+DEFAULT_LIMITS = {
+    "transcribe": (8, 32, 10.0),
+    "llm": (16, 64, 30.0),
+    "tts": (4, 32, 10.0),
+}
+
+
+class Overloaded(Exception):
+    """Etapa saturada: a requisição foi recusada sem ser processada."""
+
+    def __init__(self, stage: str, reason: str):
+        self.stage = stage
+        self.reason = reason
+        label = STAGE_LABELS.get(stage, stage)
+        super().__init__(f"O assistente está ocupado ({label}: {reason}). Tente novamente em alguns segundos.")
+
+
+class StageLimiter:
+    def __init__(self, name: str, concurrency: int, max_queue: int, timeout: float):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        timeout = self.timeout if timeout is None else timeout
+        with self._cond:
+            # Com gente na fila, quem chega entra atrás (ordem de chegada)
+            if self.active < self.concurrency and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.name, "fila cheia")
+
+            self.waiting += 1
+            deadline = time.monotonic() + timeout
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        # Repassa um eventual aviso de vaga livre para o próximo da fila
+                        self._cond.notify()
+                        raise Overloaded(self.name, "tempo de espera esgotado")
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None) -> Iterator[None]:
+        self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        # Para handlers assíncronos: a espera na fila roda numa thread, sem travar o laço
+        waiting = asyncio.ensure_future(asyncio.to_thread(self.acquire, timeout))
+        try:
+            await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            # Cancelado na fila: se a vaga chegar depois, é devolvida na hora
+            waiting.add_done_callback(lambda f: f.cancelled() or f.exception() or self.release())
+            raise
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+
+class AdmissionController:
+    def __init__(self, limits: Optional[Dict[str, tuple]] = None):
+        limits = limits if limits is not None else DEFAULT_LIMITS
+        self._limiters = {name: StageLimiter(name, *limit) for name, limit in limits.items()}
+
+    @classmethod
+    def from_env(cls, defaults: Optional[Dict[str, tuple]] = None) -> "AdmissionController":
+        # TRANSCRIBE_CONCURRENCY / TRANSCRIBE_QUEUE / TRANSCRIBE_QUEUE_TIMEOUT, idem para LLM_ e TTS_
+        limits = {}
+        for name, (concurrency, queue, timeout) in (defaults or DEFAULT_LIMITS).items():
+            prefix = name.upper()
+            limits[name] = (
+                int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+                int(os.getenv(f"{prefix}_QUEUE", queue)),
+                float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", timeout)),
+            )
+        return cls(limits)
+
+    def limiter(self, name: str) -> StageLimiter:
+        return self._limiters[name]
+
+    def stage(self, name: str, timeout: Optional[float] = None):
+        return self._limiters[name].slot(timeout)
+
+    def stage_async(self, name: str, timeout: Optional[float] = None):
+        return self._limiters[name].slot_async(timeout)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
@@ -1,15 +1,57 @@
+import asyncio
 import os
 import sys
-import tempfile
+import threading
 import time
-import urllib.parse
-import webbrowser
-import gradio as gr
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Primeiro import local: marca o início do relatório de inicialização
+from startup import lazy_import, preload, timer
+
 from dotenv import load_dotenv
 
+# O .env precisa valer antes dos módulos abaixo lerem a configuração (plugins de
+# comandos, METRICS_ENABLED) e dos limites, cache e contexto montados neste arquivo
+load_dotenv()
+
+from admission import DEFAULT_LIMITS, AdmissionController, Overloaded
+from audio_store import AudioArtifactStore
+from audio_utils import load_audio_array, resample, to_float32_mono, trim_speech
+from batching import BatchedWhisper
+from commands import load_plugins, registry as command_registry
+from conversation import ConversationContext
+from llm_cache import ResponseCache, is_cacheable_response
+from llm_client import prewarm_async
+from llm_router import LLMRouter
+import metrics
+from metrics import ERRORS, IN_FLIGHT, LLM_RETRIES, SILENT_CLIPS
+from model_registry import WhisperModelRegistry, default_model_size
+from resilience import CircuitBreaker, CircuitOpen, RetryPolicy, classify_error
+from stage_timing import recorder as latency, stage
+from streaming import StreamingTranscriber
+from text_utils import SentenceBuffer
+from transcription_pool import TranscriptionPool
+from tts_cache import TTSCache
+
+# Gradio é importado só ao montar a interface (ou no primeiro gr.update())
+gr = lazy_import("gradio")
+
 # global variables
 SERVER_NAME = "0.0.0.0"
 SERVER_PORT = 7860
+# Máximo de clipes por lote do Whisper (também é o limite de requisições simultâneas por evento)
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+WHISPER_BATCH_WAIT = 0.01 # segundos
+# Fila do Gradio: requisições simultâneas por evento e máximo aguardando (acima disso, recusa)
+APP_CONCURRENCY = int(os.getenv("APP_CONCURRENCY", "32"))
+APP_QUEUE_SIZE = int(os.getenv("APP_QUEUE_SIZE", "64"))
+# Respostas em streaming: tokens aparecem no chat e o áudio é gerado frase a frase
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() in {"1", "true", "yes", "sim", "on"}
+# Corta o silêncio das pontas e normaliza o volume antes do Whisper; clipes sem fala nem chegam ao modelo
+TRIM_SILENCE = os.getenv("TRIM_SILENCE", "true").lower() in {"1", "true", "yes", "sim", "on"}
+
+SYSTEM_PROMPT = "Você é um assistente virtual útil e conciso. Responda em português."
 
 # Patch para compatibilidade com Python 3.13+
 if sys.version_info >= (3, 13):
@@ -17,133 +59,416 @@ if sys.version_info >= (3, 13):
     sys.modules['aifc'] = types.ModuleType('aifc')
     sys.modules['audioop'] = types.ModuleType('audioop')
 
-# Lazy imports para o Whisper e gTTS
-whisper_model = None
+# Modelo Whisper compartilhado: carregado uma única vez (com lock) e aquecido na inicialização.
+# O tamanho vem da variável de ambiente WHISPER_MODEL (padrão: base; "base-int8" ou WHISPER_QUANTIZE=int8 para int8).
+whisper_registry = WhisperModelRegistry()
 
 def get_whisper_model():
-    global whisper_model
-    if whisper_model is None:
-        import whisper
-        print("Carregando modelo Whisper (Local e Gratuito)...")
-        whisper_model = whisper.load_model("base")
-    return whisper_model
-
-def get_glm_response(text):    
-    max_retries = 3
-    retry_delay = 2 # segundos
-    
-    for attempt in range(max_retries):
+    return whisper_registry.get()
+
+# Requisições simultâneas são agrupadas em micro-lotes; todo uso do modelo passa por aqui
+whisper_batcher = BatchedWhisper(lambda: get_whisper_model(), max_batch=WHISPER_BATCH_SIZE, max_wait=WHISPER_BATCH_WAIT)
+
+# Vagas e filas independentes por etapa (transcrição, IA, TTS); etapa saturada recusa na hora
+admission = AdmissionController.from_env(
+    dict(DEFAULT_LIMITS, transcribe=(WHISPER_BATCH_SIZE, 4 * WHISPER_BATCH_SIZE, 10.0)))
+
+# Com WHISPER_WORKERS > 0 a transcrição roda em um pool de processos separado da interface
+whisper_pool = None
+
+def get_transcriber():
+    return whisper_pool if whisper_pool is not None else whisper_batcher
+
+def model_status():
+    status = whisper_pool.status() if whisper_pool is not None else whisper_registry.status()
+    if status["state"] == "pronto":
+        return f"✅ Whisper `{status['model']}` pronto ({status['load_seconds']:.1f}s para carregar e aquecer)."
+    if status["state"] == "erro":
+        return f"❌ Falha ao carregar Whisper `{status['model']}`: {status['error']}"
+    return f"⏳ Carregando Whisper `{status['model']}`..."
+
+# Backends da IA (LLM_BACKENDS; padrão: roteador do Hugging Face e OpenAI, os que tiverem chave).
+# Cada pergunta vai ao backend saudável mais rápido; com LLM_HEDGE=true, uma cópia vai ao
+# segundo quando o primeiro demora além do normal
+llm_router = None
+
+def get_llm_router():
+    global llm_router
+    if llm_router is None:
+        llm_router = LLMRouter.from_env(default=("hf", "openai"), on_retry=count_backend_retry)
+    return llm_router if llm_router else None
+
+# Contexto das rodadas anteriores, limitado por CONTEXT_MAX_TOKENS (rodadas antigas viram resumo).
+# Um por sessão, guardado em gr.State: o link é público e os visitantes não compartilham nada.
+def new_conversation():
+    return ConversationContext(SYSTEM_PROMPT)
+
+def build_messages(text, history=None, context=None):
+    if context is None:
+        context = new_conversation()
+    return context, context.build_messages(history, text)
+
+# Novas tentativas com espera exponencial aleatória e disjuntor: com o roteador fora do ar,
+# as perguntas falham na hora (só comandos locais) até uma chamada de teste dar certo
+def count_backend_retry(backend, error):
+    # O roteador passou a pergunta para outro backend
+    LLM_RETRIES.inc(backend=backend)
+
+def log_llm_retry(attempt, error, delay):
+    print(f"Tentativa {attempt + 1} falhou ({classify_error(error)}): {error}; nova tentativa em {delay:.1f}s")
+    LLM_RETRIES.inc(backend=getattr(error, "llm_backend", "desconhecido"))
+
+llm_retry = RetryPolicy.from_env("IA", on_retry=log_llm_retry, passthrough=(Overloaded,))
+
+LLM_UNAVAILABLE_MESSAGE = ("Erro: A IA está indisponível no momento. "
+                           "Os comandos locais (Wikipedia, YouTube, farmácia) continuam funcionando.")
+
+def format_llm_error(error_str):
+    # Limpa o erro se for HTML bruto (Hugging Face costuma retornar HTML em erros de gateway)
+    if "<!DOCTYPE html>" in error_str or "<html>" in error_str:
+        if "504" in error_str:
+            return "Erro: O servidor da IA demorou muito para responder (Timeout). Por favor, tente novamente em instantes."
+        return "Erro: O servidor da IA está temporariamente indisponível. Tente novamente mais tarde."
+    return f"Erro na IA: {error_str}"
+
+# Cache de respostas: perguntas repetidas não chamam o modelo remoto
+llm_cache = ResponseCache.from_env()
+
+async def get_glm_response(text, history=None, context=None):
+    router = get_llm_router()
+    if router is None:
+        return None
+
+    context, messages = build_messages(text, history, context)
+    cache_prefix = context.cache_prefix(messages)
+    cached = llm_cache.get(router.model, cache_prefix, text)
+    if cached is not None:
+        return cached
+
+    def ask():
+        # A vaga da IA é ocupada só durante a chamada: a espera entre tentativas fica de fora
+        with admission.stage("llm"):
+            return router.complete(messages)
+
+    try:
+        # Cada tentativa passa pelo roteador (se um backend falha, o próximo assume na hora)
+        # e roda numa thread; a espera entre tentativas é um asyncio.sleep, sem prender thread
+        content = await llm_retry.call_async(lambda: asyncio.to_thread(ask))
+    except CircuitOpen as e:
+        print(f"IA não consultada: {e}")
+        return LLM_UNAVAILABLE_MESSAGE
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"Falha na IA ({classify_error(e)}): {e}")
+        ERRORS.inc(stage="llm")
+        return format_llm_error(str(e))
+
+    if is_cacheable_response(content):
+        llm_cache.put(router.model, cache_prefix, text, content)
+    return content
+
+async def deltas_in_thread(deltas):
+    # Lê um iterador bloqueante pedaço por pedaço numa thread, sem prender thread entre eles
+    try:
+        while True:
+            delta = await asyncio.to_thread(next, deltas, None)
+            if delta is None:
+                return
+            yield delta
+    finally:
+        close = getattr(deltas, "close", None)
         try:
-            from openai import OpenAI
-            
-            hf_token = os.getenv("HF_TOKEN")
-            if not hf_token or hf_token == "seu_token_hf_aqui":
-                return None
-                
-            client = OpenAI(
-                base_url="https://router.huggingface.co/v1",
-                api_key=hf_token,
-                timeout=30.0 # Timeout de 30 segundos
-            )
-            
-            response = client.chat.completions.create(
-                model="zai-org/GLM-4.7-Flash",
-                messages=[
-                    {"role": "system", "content": "Você é um assistente virtual útil e conciso. Responda em português."},
-                    {"role": "user", "content": text}
-                ]
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            error_str = str(e)
-            print(f"Tentativa {attempt + 1} falhou: {error_str}")
-            
-            # Se for erro de timeout ou gateway (504/502/503), tenta novamente
-            if any(code in error_str for code in ["504", "502", "503", "timeout"]) and attempt < max_retries - 1:
-                time.sleep(retry_delay * (attempt + 1))
-                continue
-                
-            # Limpa o erro se for HTML bruto (Hugging Face costuma retornar HTML em erros de gateway)
-            if "<!DOCTYPE html>" in error_str or "<html>" in error_str:
-                if "504" in error_str:
-                    return "Erro: O servidor da IA demorou muito para responder (Timeout). Por favor, tente novamente em instantes."
-                return "Erro: O servidor da IA está temporariamente indisponível. Tente novamente mais tarde."
-                
-            return f"Erro na IA: {error_str}"
-    return "Erro: Não foi possível obter resposta da IA após várias tentativas."
+            if close is not None:
+                close()
+        except ValueError:
+            pass  # ainda sendo lido numa thread (tarefa cancelada): termina sozinho
+
+async def stream_glm_response(text, history=None, context=None):
+    # Versão em streaming (stream=True): produz os pedaços de texto conforme chegam.
+    # Só há nova tentativa se a falha ocorrer antes do primeiro token. A vaga da IA é
+    # ocupada durante cada tentativa; a espera entre elas é um asyncio.sleep, que não
+    # prende thread nem vaga.
+    router = get_llm_router()
+    if router is None:
+        return
+
+    context, messages = build_messages(text, history, context)
+    cache_prefix = context.cache_prefix(messages)
+    cached = llm_cache.get(router.model, cache_prefix, text)
+    if cached is not None:
+        yield cached
+        return
+
+    started = time.perf_counter()
+    retry_started = llm_retry.now()
+    try:
+        for attempt in llm_retry.attempts():
+            emitted = False
+            parts = []
+            try:
+                async with admission.stage_async("llm"):
+                    async for delta in deltas_in_thread(router.stream(messages)):
+                        if not emitted:
+                            # Tempo até o primeiro token: é o que o usuário percebe como espera
+                            latency.record("llm_first_token", time.perf_counter() - started)
+                        emitted = True
+                        parts.append(delta)
+                        yield delta
+                llm_retry.record_success()
+                latency.record("llm", time.perf_counter() - started)
+                content = "".join(parts)
+                if is_cacheable_response(content):
+                    llm_cache.put(router.model, cache_prefix, text, content)
+                return
+            except (GeneratorExit, asyncio.CancelledError):
+                llm_retry.abandon()
+                raise
+            except llm_retry.passthrough:
+                llm_retry.abandon()
+                raise
+            except Exception as e:
+                if emitted:
+                    llm_retry.record_failure(e)
+                    print(f"Conexão com a IA interrompida: {e}")
+                    ERRORS.inc(stage="llm")
+                    yield " (Erro: a conexão com a IA foi interrompida.)"
+                    return
+                delay = llm_retry.next_delay(attempt, e, retry_started)
+                if delay is None:
+                    print(f"Falha na IA ({classify_error(e)}): {e}")
+                    ERRORS.inc(stage="llm")
+                    yield format_llm_error(str(e))
+                    return
+                await asyncio.sleep(delay)
+    except CircuitOpen as e:
+        print(f"IA não consultada: {e}")
+        yield LLM_UNAVAILABLE_MESSAGE
+
+# Métricas lidas na coleta do /metrics: acertos de cache e fila do Whisper
+def collect_cache_stats():
+    stats = llm_cache.stats()
+    yield {"cache": "llm", "result": "hit"}, stats["hits"]
+    yield {"cache": "llm", "result": "miss"}, stats["misses"]
+    if tts_cache is not None:
+        yield {"cache": "tts", "result": "hit"}, tts_cache.hits
+        yield {"cache": "tts", "result": "miss"}, tts_cache.misses
+
+metrics.registry.callback("assistente_cache_requests_total", "Consultas aos caches de resposta e de TTS.",
+                          "counter", ["cache", "result"], collect_cache_stats)
+metrics.registry.callback("assistente_audio_spool_bytes", "Bytes no diretório de áudios das sessões.",
+                          "gauge", [], lambda: [({}, audio_store.stats()["bytes"])] if audio_store is not None else [])
+def collect_llm_backends(field):
+    def collect():
+        if llm_router:
+            for name, stats in llm_router.stats().items():
+                if stats[field] is not None:
+                    yield {"backend": name}, stats[field]
+    return collect
+
+def collect_llm_latency():
+    # Uma série por modo: stream (até o primeiro token) e complete (resposta inteira)
+    if llm_router:
+        for name, stats in llm_router.stats().items():
+            for mode, seconds in stats["latency"].items():
+                if seconds is not None:
+                    yield {"backend": name, "mode": mode}, seconds
+
+metrics.registry.callback("assistente_llm_backend_latency_seconds",
+                          "Latência por backend da IA e modo (stream: até o primeiro token; complete: resposta inteira), média móvel.",
+                          "gauge", ["backend", "mode"], collect_llm_latency)
+metrics.registry.callback("assistente_llm_backend_error_rate", "Taxa de erro recente por backend da IA.",
+                          "gauge", ["backend"], collect_llm_backends("error_rate"))
+metrics.registry.callback("assistente_llm_backend_requests_total", "Requisições enviadas a cada backend da IA.",
+                          "counter", ["backend"], collect_llm_backends("requests"))
+metrics.registry.callback("assistente_llm_hedges_total", "Cópias (hedge) enviadas a cada backend da IA.",
+                          "counter", ["backend"], collect_llm_backends("hedges"))
+metrics.registry.callback("assistente_llm_circuit_open", "Disjuntor da IA aberto (1) ou fechado/meio-aberto (0).",
+                          "gauge", [], lambda: [({}, int(llm_retry.breaker.state == CircuitBreaker.OPEN))])
+
+def collect_admission(field):
+    def collect():
+        for name, stats in admission.stats().items():
+            yield {"stage": name}, stats[field]
+    return collect
+
+metrics.registry.callback("assistente_stage_active", "Requisições em execução por etapa.",
+                          "gauge", ["stage"], collect_admission("active"))
+metrics.registry.callback("assistente_stage_queue_depth", "Requisições aguardando vaga por etapa.",
+                          "gauge", ["stage"], collect_admission("waiting"))
+metrics.registry.callback("assistente_stage_rejected_total", "Requisições recusadas por fila cheia por etapa.",
+                          "counter", ["stage"], collect_admission("rejected"))
+metrics.registry.callback("assistente_stage_timeouts_total", "Requisições recusadas por prazo de espera por etapa.",
+                          "counter", ["stage"], collect_admission("timeouts"))
+metrics.registry.callback("assistente_whisper_queue_depth", "Áudios aguardando transcrição no lote do Whisper.",
+                          "gauge", [], lambda: [({}, whisper_batcher.pending())])
 
 def try_local_commands(text):
-    s = (text or "").lower()
-    if "wikipedia" in s:
-        query = s.replace("wikipedia", "").replace("pesquisar", "").strip()
-        if not query:
-            return "O que devo pesquisar na Wikipedia?"
-        url = "https://pt.wikipedia.org/wiki/Special:Search?search=" + urllib.parse.quote_plus(query)
-        webbrowser.open(url)
-        return f"Pesquisando '{query}' na Wikipedia."
-        
-    if "youtube" in s or "vídeo" in s or "video" in s:
-        query = s.replace("youtube", "").replace("vídeo", "").replace("video", "").replace("pesquisar", "").strip()
-        if not query:
-            return "O que devo pesquisar no YouTube?"
-        url = "https://www.youtube.com/results?search_query=" + urllib.parse.quote_plus(query)
-        webbrowser.open(url)
-        return f"Pesquisando '{query}' no YouTube."
-        
-    if "farmácia" in s or "farmacia" in s:
-        webbrowser.open("https://www.google.com/maps/search/farmacia+perto+de+mim")
-        return "Abrindo mapa de farmácias próximas."
+    match = command_registry.match(text)
+    if match is None:
+        return None
+    return match.run().message
+
+# Cache de áudio em disco: frases repetidas voltam sem chamada de rede ao gTTS
+tts_cache = None
 
-    return None
+# Frases fixas do sistema, sintetizadas já na inicialização
+SYSTEM_PHRASES = [
+    "Olá! Como posso ajudar?",
+    "O que devo pesquisar na Wikipedia?",
+    "O que devo pesquisar no YouTube?",
+    "Abrindo mapa de farmácias próximas.",
+]
+
+def get_tts_cache():
+    global tts_cache
+    if tts_cache is None:
+        tts_cache = TTSCache()
+    return tts_cache
+
+def gtts_writer(text):
+    def write(path):
+        from gtts import gTTS
+        # Só a síntese ocupa vaga; respostas vindas do cache passam direto
+        with admission.stage("tts"):
+            gTTS(text=text, lang='pt').save(path)
+    return write
+
+# Áudios das sessões (respostas, uploads e cache do Gradio) em um diretório com cotas e limpeza periódica
+audio_store = None
+
+def get_audio_store():
+    global audio_store
+    if audio_store is None:
+        audio_store = AudioArtifactStore.from_env()
+    return audio_store
+
+def stream_audio(path):
+    # Em streaming o Gradio aceita bytes: a frase vai da memória, sem arquivo por sessão
+    if not path:
+        return path
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return path
+
+def publish_audio(path, request=None):
+    # Resposta completa: link (ou cópia) na pasta da sessão, dentro do GRADIO_TEMP_DIR,
+    # de onde o Gradio serve o arquivo sem copiá-lo para o seu cache
+    session = getattr(request, "session_hash", None)
+    if not path or session is None:
+        return path
+    try:
+        return get_audio_store().adopt(session, path)
+    except OSError as e:
+        print(f"[Áudios] Não foi possível guardar a resposta da sessão: {e}")
+        return path
+
+def release_session(request: "gr.Request"):
+    # Navegador desconectou: apaga os áudios da sessão
+    session = getattr(request, "session_hash", None)
+    if session and audio_store is not None:
+        audio_store.release(session)
 
 def text_to_speech(text):
     try:
-        from gtts import gTTS
-        tts = gTTS(text=text, lang='pt')
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-        tts.save(temp_file.name)
-        return temp_file.name
+        with stage("tts"):
+            return get_tts_cache().get_or_create("gtts", "pt", text, gtts_writer(text))
     except Exception as e:
+        ERRORS.inc(stage="tts")
         print(f"Erro TTS: {e}")
         return None
 
-def process_interaction(audio_path, text_input, history):
+def transcribe_audio(audio):
+    # Decodifica em memória (float32 16 kHz); só recorre ao FFmpeg para formatos não suportados
+    with stage("decode"):
+        audio_array = load_audio_array(audio)
+        if audio_array is not None and TRIM_SILENCE:
+            audio_array = trim_speech(audio_array)
+            if audio_array is None:
+                # Só silêncio ou ruído: custa milissegundos, sem vaga nem passada do decodificador
+                SILENT_CLIPS.inc()
+                return ""
+    with admission.stage("transcribe"), stage("transcribe"):
+        result = get_transcriber().transcribe(audio_array if audio_array is not None else audio, language="pt", fp16=False)
+    return result["text"].strip()
+
+def stream_transcription(chunk, transcriber):
+    # Recebe pedaços do microfone ao vivo e mostra a hipótese parcial no campo de texto
+    if chunk is None:
+        return gr.update(), transcriber
+    if transcriber is None:
+        transcriber = StreamingTranscriber(get_transcriber(), language="pt")
+    sr, data = chunk
+    transcriber.feed(resample(to_float32_mono(data), int(sr)))
+    return transcriber.current().text, transcriber
+
+def finalize_transcription(transcriber):
+    # Ao parar a gravação, o texto final já está quase todo decodificado
+    text = ""
+    if transcriber is not None:
+        text = transcriber.finalize()
+        transcriber.close()
+        print(f"Transcrição Whisper (ao vivo): {text}")
+    return text
+
+async def finish_transcription(transcriber, history, context=None, request: "gr.Request" = None):
+    text = await asyncio.to_thread(finalize_transcription, transcriber)
+    history, text_out, audio_response = await process_interaction(None, text, history, context, request)
+    return history, text_out, audio_response, None
+
+def read_input(audio, text_input):
+    # Determinar a entrada (áudio ou texto)
+    if audio is not None:
+        print(f"Processando áudio de: {audio if isinstance(audio, str) else 'microfone'}")
+        input_text = transcribe_audio(audio)
+        print(f"Transcrição Whisper: {input_text}")
+        return input_text
+    if text_input:
+        print(f"Entrada de texto: {text_input}")
+        return text_input
+    return ""
+
+def not_configured_message(input_text):
+    return f"Você disse: {input_text}. (Comando não reconhecido e IA não configurada)"
+
+# Os handlers do chat são assíncronos: transcrição, comandos, cada tentativa da IA e TTS
+# rodam em threads, e as esperas (novas tentativas da IA) não prendem nenhum worker
+async def process_interaction(audio, text_input, history, context=None, request: "gr.Request" = None):
+    with IN_FLIGHT.track(handler="interaction"):
+        return await _process_interaction(audio, text_input, history, context, request)
+
+async def _process_interaction(audio, text_input, history, context=None, request=None):
     # Inicializar histórico se for None
     if history is None:
         history = []
         
-    # Determinar a entrada (áudio ou texto)
     input_text = ""
     
     try:
-        if audio_path:
-            print(f"Processando áudio de: {audio_path}")
-            model = get_whisper_model()
-            result = model.transcribe(audio_path, language="pt", fp16=False)
-            input_text = result["text"].strip()
-            print(f"Transcrição Whisper: {input_text}")
-        elif text_input:
-            input_text = text_input
-            print(f"Entrada de texto: {input_text}")
+        input_text = await asyncio.to_thread(read_input, audio, text_input)
         
         if not input_text:
             return history, "", gr.update()
 
         # Processar comando local primeiro
-        response_text = try_local_commands(input_text)
+        with stage("route"):
+            response_text = await asyncio.to_thread(try_local_commands, input_text)
         
         # Se não for comando local, tentar IA GLM
         if response_text is None:
-            response_text = get_glm_response(input_text)
+            with stage("llm"):
+                response_text = await get_glm_response(input_text, history, context)
             
             # Se a IA não estiver configurada (sem token), apenas confirma o que ouviu
             if response_text is None:
-                response_text = f"Você disse: {input_text}. (Comando não reconhecido e IA não configurada)"
+                response_text = not_configured_message(input_text)
         
         print(f"Resposta: {response_text}")
 
         # Gerar áudio
-        audio_response = text_to_speech(response_text)
+        audio_response = publish_audio(await asyncio.to_thread(text_to_speech, response_text), request)
         
         # Atualizar histórico
         history.append({"role": "user", "content": input_text})
@@ -152,16 +477,148 @@ def process_interaction(audio_path, text_input, history):
         return history, "", audio_response if audio_response else gr.update()
 
     except Exception as e:
-        error_msg = f"Erro no processamento: {str(e)}"
-        print(error_msg)
+        error_msg = error_message(e)
         history.append({"role": "user", "content": input_text if input_text else "???"})
         history.append({"role": "assistant", "content": error_msg})
         return history, "", gr.update()
 
+def error_message(e):
+    if isinstance(e, Overloaded):
+        print(f"[Admissão] Recusado: {e}")
+        return str(e)
+    ERRORS.inc(stage="interaction")
+    error_msg = f"Erro no processamento: {str(e)}"
+    print(error_msg)
+    return error_msg
+
+async def single_delta(text):
+    yield text
+
+async def stream_response(input_text, history, context=None):
+    # Gerador: os tokens vão para o chat assim que chegam e cada frase completa
+    # é sintetizada em segundo plano, na ordem, enquanto o restante ainda é gerado.
+    previous = list(history)
+    history.append({"role": "user", "content": input_text})
+    history.append({"role": "assistant", "content": ""})
+
+    with stage("route"):
+        local_response = await asyncio.to_thread(try_local_commands, input_text)
+    if local_response is not None:
+        deltas = single_delta(local_response)
+    elif get_llm_router() is None:
+        deltas = single_delta(not_configured_message(input_text))
+    else:
+        deltas = stream_glm_response(input_text, previous, context)
+
+    sentences = SentenceBuffer()
+    pending = deque()
+
+    async def ready_audio(wait=False):
+        # Libera os áudios prontos respeitando a ordem das frases
+        while pending and (wait or pending[0].done()):
+            audio_file = await asyncio.wrap_future(pending.popleft())
+            if audio_file:
+                yield stream_audio(audio_file)
+
+    tts_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts")
+    try:
+        async for delta in deltas:
+            history[-1]["content"] += delta
+            for sentence in sentences.push(delta):
+                pending.append(tts_pool.submit(text_to_speech, sentence))
+            yielded = False
+            async for audio_file in ready_audio():
+                yielded = True
+                yield history, "", audio_file
+            if not yielded:
+                yield history, "", None
+
+        for sentence in sentences.flush():
+            pending.append(tts_pool.submit(text_to_speech, sentence))
+        print(f"Resposta: {history[-1]['content']}")
+        async for audio_file in ready_audio(wait=True):
+            yield history, "", audio_file
+    finally:
+        # Sem esperar no laço: frases ainda na fila (resposta cancelada) são descartadas
+        tts_pool.shutdown(wait=False, cancel_futures=True)
+
+    if not history[-1]["content"]:
+        history[-1]["content"] = not_configured_message(input_text)
+        yield history, "", None
+
+async def process_interaction_stream(audio, text_input, history, context=None):
+    with IN_FLIGHT.track(handler="interaction_stream"):
+        async for update in _process_interaction_stream(audio, text_input, history, context):
+            yield update
+
+async def _process_interaction_stream(audio, text_input, history, context=None):
+    if history is None:
+        history = []
+
+    input_text = ""
+    try:
+        input_text = await asyncio.to_thread(read_input, audio, text_input)
+        if not input_text:
+            yield history, "", None
+            return
+        async for update in stream_response(input_text, history, context):
+            yield update
+    except Exception as e:
+        error_msg = error_message(e)
+        if not input_text:
+            history.append({"role": "user", "content": "???"})
+            history.append({"role": "assistant", "content": error_msg})
+        elif history[-1]["content"]:
+            history[-1]["content"] += f"\n\n{error_msg}"
+        else:
+            history[-1]["content"] = error_msg
+        yield history, "", None
+
+async def finish_transcription_stream(transcriber, history, context=None):
+    text = await asyncio.to_thread(finalize_transcription, transcriber)
+    async for history, text_out, audio_chunk in process_interaction_stream(None, text, history, context):
+        yield history, text_out, audio_chunk, None
+
 def main():
-    load_dotenv()
-    
-    with gr.Blocks(title="Assistente Virtual") as demo:
+    global whisper_pool
+    timer.mark("imports")
+    load_plugins(command_registry)
+
+    # Carrega e aquece o Whisper em segundo plano enquanto a interface sobe
+    whisper_registry.model_size = default_model_size()
+    workers = int(os.getenv("WHISPER_WORKERS", "0"))
+    if workers > 0:
+        whisper_pool = TranscriptionPool(whisper_registry.model_size, workers=workers)
+        whisper_pool.start()
+    else:
+        whisper_registry.start()
+
+    # Abre a conexão com cada backend da IA antes da primeira pergunta
+    router = get_llm_router()
+    if router is not None:
+        print(f"[LLM] Backends: {', '.join(f'{b.name} ({b.model})' for b in router.backends)}")
+        for backend in router.backends:
+            prewarm_async(backend.api_key, backend.base_url)
+
+    # Pré-calcula o áudio das frases fixas em segundo plano
+    threading.Thread(
+        target=lambda: get_tts_cache().precompute("gtts", "pt", SYSTEM_PHRASES, gtts_writer),
+        name="tts-precompute",
+        daemon=True
+    ).start()
+    timer.mark("background tasks")
+
+    # As pastas de sessão ficam dentro do GRADIO_TEMP_DIR (também em tmpfs), para as
+    # respostas serem servidas sem cópia. Uploads e cópias do Gradio são apagados pelo
+    # próprio Gradio (delete_cache), com a mesma idade máxima; o coletor do
+    # armazenamento só mexe nas pastas de sessão
+    store = get_audio_store()
+    os.environ["GRADIO_TEMP_DIR"] = store.gradio_dir
+    store.start_reaper()
+
+    preload(gr)
+    delete_cache = (max(1, int(store.reap_interval)), max(1, int(store.max_age)))
+    with gr.Blocks(title="Assistente Virtual", delete_cache=delete_cache) as demo:
         gr.Markdown("# 🤖 Assistente Virtual com IA")
         gr.Markdown("Este assistente usa **OpenAI Whisper** para voz e **GLM-4.7-Flash** para inteligência via Hugging Face.")
         
@@ -169,34 +626,77 @@ def main():
         gr.Markdown("- 'Pesquisar Wikipedia sobre [assunto]'")
         gr.Markdown("- 'Abrir YouTube' ou 'Vídeo de [assunto]'")
         gr.Markdown("- 'Farmácia próxima'")
+        status_md = gr.Markdown(model_status())
         
         with gr.Row():
             with gr.Column(scale=2):
                 chatbot = gr.Chatbot(label="Conversa")
-                audio_output = gr.Audio(label="Resposta em Áudio", autoplay=True)
+                # Em streaming, cada frase sintetizada é anexada e tocada em sequência
+                audio_output = gr.Audio(label="Resposta em Áudio", autoplay=True, streaming=STREAM_RESPONSES)
             
             with gr.Column(scale=1):
-                audio_input = gr.Audio(label="Fale aqui", type="filepath")
+                audio_input = gr.Audio(label="Fale aqui", type="numpy")
+                live_audio = gr.Audio(label="Fale ao vivo (transcrição em tempo real)", sources=["microphone"], streaming=True, type="numpy")
+                stream_state = gr.State(None)
+                # Contexto da conversa desta sessão (criado quando a página carrega)
+                conversation_state = gr.State(new_conversation)
                 text_input = gr.Textbox(label="Ou digite aqui", placeholder="Ex: Pesquisar Wikipedia sobre Python")
                 btn_send = gr.Button("Enviar", variant="primary")
                 btn_clear = gr.Button("Limpar Conversa")
 
         # Eventos
+        respond = process_interaction_stream if STREAM_RESPONSES else process_interaction
+        finish = finish_transcription_stream if STREAM_RESPONSES else finish_transcription
+
         btn_send.click(
-            process_interaction, 
-            inputs=[audio_input, text_input, chatbot], 
-            outputs=[chatbot, text_input, audio_output]
+            respond, 
+            inputs=[audio_input, text_input, chatbot, conversation_state], 
+            outputs=[chatbot, text_input, audio_output],
+            concurrency_limit=APP_CONCURRENCY
         )
         
         text_input.submit(
-            process_interaction, 
-            inputs=[audio_input, text_input, chatbot], 
-            outputs=[chatbot, text_input, audio_output]
+            respond, 
+            inputs=[audio_input, text_input, chatbot, conversation_state], 
+            outputs=[chatbot, text_input, audio_output],
+            concurrency_limit=APP_CONCURRENCY
         )
 
-        btn_clear.click(lambda: ([], "", gr.update(value=None)), None, [chatbot, text_input, audio_output])
+        live_audio.stream(
+            stream_transcription,
+            inputs=[live_audio, stream_state],
+            outputs=[text_input, stream_state],
+            stream_every=0.5,
+            concurrency_limit=WHISPER_BATCH_SIZE
+        )
+
+        live_audio.stop_recording(
+            finish,
+            inputs=[stream_state, chatbot, conversation_state],
+            outputs=[chatbot, text_input, audio_output, stream_state],
+            concurrency_limit=APP_CONCURRENCY
+        )
+
+        btn_clear.click(lambda: ([], "", gr.update(value=None), new_conversation()), None,
+                        [chatbot, text_input, audio_output, conversation_state])
+
+        demo.load(model_status, None, status_md)
+        demo.unload(release_session)
+
+    timer.mark("ui")
+    timer.report()
 
-    demo.launch(server_name=SERVER_NAME, server_port=SERVER_PORT, share=True)
+    # /metrics no mesmo servidor do Gradio (formato de texto do Prometheus)
+    # Só a própria máquina (ou quem enviar METRICS_TOKEN) lê as métricas: o link é público
+    metrics_route = metrics.registry.route(token=os.getenv("METRICS_TOKEN") or None)
+    app_kwargs = {"routes": [metrics_route]} if metrics.registry.enabled else None
+    # Fila limitada: com APP_QUEUE_SIZE requisições aguardando, o Gradio recusa as novas na hora
+    demo.queue(max_size=APP_QUEUE_SIZE, default_concurrency_limit=APP_CONCURRENCY)
+    # As respostas em áudio vêm do cache de TTS (fora do diretório temporário do Gradio) ou
+    # da pasta da sessão; os dois precisam estar liberados, senão o Gradio recusa o arquivo
+    allowed_paths = [get_tts_cache().directory, store.root]
+    demo.launch(server_name=SERVER_NAME, server_port=SERVER_PORT, share=True,
+                allowed_paths=allowed_paths, app_kwargs=app_kwargs)
 
 if __name__ == "__main__":
     main()
@@ -15,6 +15,11 @@ import urllib.parse
 import webbrowser
 from dotenv import load_dotenv
 
+from audio_utils import WHISPER_SAMPLE_RATE, EndpointConfig, record_utterance, to_pcm16
+from commands import load_plugins, registry as command_registry
+from pipeline import EXIT_WORDS, ConversationPipeline
+from wake_word import WakeWordSTT, WakeWordUnavailable, build_gate
+
 
 class SpeechToText(Protocol):
     def listen(self, timeout: Optional[float] = None) -> Optional[str]:
@@ -53,6 +58,21 @@ class SpeechRecognitionSTT:
             print(f"Erro no reconhecimento: {e}")
             return None
 
+    def listen_from(self, read_block, prefix=None, timeout: Optional[float] = None) -> Optional[str]:
+        # Depois da palavra de ativação: continua no microfone aberto pelo portão,
+        # começando pelo áudio que veio logo após a palavra
+        print("\n[Ouvindo...] Fale agora.")
+        try:
+            audio = record_utterance(read_block, EndpointConfig(start_timeout=timeout), prefix)
+            if audio is None:
+                return None
+            print("[Processando...]")
+            data = self._sr.AudioData(to_pcm16(audio), WHISPER_SAMPLE_RATE, 2)
+            return self._rec.recognize_google(data, language=self._language)
+        except Exception as e:
+            print(f"Erro no reconhecimento: {e}")
+            return None
+
 
 class TextInputSTT:
     def __init__(self, inputs: Optional[Iterable[str]] = None):
@@ -161,19 +181,25 @@ def find_nearest_pharmacy() -> ActionResult:
     return ActionResult(True, "Abrindo pesquisa de farmácia mais próxima")
 
 
+# Comandos deste script; plugins registrados em commands.registry também são atendidos
+ACTIONS = {
+    "wikipedia": open_wikipedia,
+    "youtube": open_youtube,
+    "farmacia": lambda query: find_nearest_pharmacy(),
+}
+
+
 def parse_and_execute(text: str) -> ActionResult:
-    s = (text or "").lower()
-    if not s:
+    if not (text or "").strip():
         return ActionResult(False, "Nenhum texto reconhecido")
-    if "wikipedia" in s:
-        q = s.replace("wikipedia", "").replace("pesquisar", "").strip()
-        return open_wikipedia(q or "")
-    if "youtube" in s or "vídeo" in s or "video" in s:
-        q = s.replace("youtube", "").replace("vídeo", "").replace("video", "").replace("pesquisar", "").strip()
-        return open_youtube(q or "")
-    if "farmácia" in s or "farmacia" in s:
-        return find_nearest_pharmacy()
-    return ActionResult(False, "Comando não reconhecido")
+    match = command_registry.match(text)
+    if match is None:
+        return ActionResult(False, "Comando não reconhecido")
+    action = ACTIONS.get(match.name)
+    if action is not None:
+        return action(match.query)
+    result = match.run()
+    return ActionResult(result.success, result.message)
 
 
 # %% [markdown]
@@ -185,6 +211,10 @@ class Assistant:
         self._tts = tts
         self._config = config
 
+    @property
+    def stt(self) -> SpeechToText:
+        return self._stt
+
     def run_once(self, text_override: Optional[str] = None) -> ActionResult:
         text = text_override if text_override is not None else self._stt.listen()
         print(f"🎤 Você: {text}")
@@ -192,7 +222,19 @@ class Assistant:
         self._tts.speak(result.message)
         return result
 
-    def run(self) -> None:
+    def respond(self, text: Optional[str]) -> str:
+        if text is None:
+            return "Não entendi"
+        return parse_and_execute(text).message
+
+    def run(self, overlap: bool = False) -> None:
+        if overlap:
+            # Estágios simultâneos: o microfone já ouve o próximo comando enquanto este é executado e falado
+            pipeline = ConversationPipeline(self._stt, self._tts, self.respond,
+                                            greeting="Olá! Diga um comando.", skip_empty=False)
+            pipeline.run()
+            return
+
         self._tts.speak("Olá! Diga um comando.")
         while True:
             text = self._stt.listen()
@@ -202,15 +244,14 @@ class Assistant:
             
             print(f"🎤 Você: {text}")
             
-            if text.lower().strip() in {"sair", "encerrar", "exit", "tchau"}:
+            if text.lower().strip() in EXIT_WORDS:
                 self._tts.speak("Até logo!")
                 break
             
-            result = parse_and_execute(text)
-            self._tts.speak(result.message)
+            self._tts.speak(self.respond(text))
 
 
-def build_assistant(mode: str, once_text: str | None) -> Assistant:
+def build_assistant(mode: str, once_text: str | None, wake_word: bool = False) -> Assistant:
     cfg = load_config()
     
     # Selecionar TTS
@@ -226,12 +267,21 @@ def build_assistant(mode: str, once_text: str | None) -> Assistant:
         except Exception:
             print("Falha ao iniciar microfone. Alternando para modo texto.")
             stt = TextInputSTT([once_text] if once_text else None)
+        else:
+            if wake_word:
+                stt = with_wake_word(stt, cfg)
     else:
         stt = TextInputSTT([once_text] if once_text else None)
         
     return Assistant(stt=stt, tts=tts, config=cfg)
 
 
+def with_wake_word(stt: SpeechToText, cfg: Config) -> SpeechToText:
+    # Só envia áudio ao reconhecimento online depois da palavra de ativação (cfg.wake_word).
+    # Sem exemplos gravados, build_gate falha (WakeWordUnavailable) em vez de seguir sem portão.
+    return WakeWordSTT(stt, build_gate(cfg.wake_word), cfg.wake_word)
+
+
 # %% [markdown]
 # Interface de Linha de Comando (CLI)
 
@@ -240,17 +290,25 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--mode", choices=["voice", "text"], default="voice")
     p.add_argument("--once", action="store_true")
     p.add_argument("--command", type=str, default=None)
+    p.add_argument("--overlap", action="store_true", help="Ouvir o próximo comando enquanto fala (use fones de ouvido)")
+    p.add_argument("--wake-word", action="store_true", help="Esperar a palavra de ativação (WAKE_WORD) antes de cada comando")
     return p.parse_args()
 
 
 def main() -> None:
     load_dotenv()
+    load_plugins(command_registry)
     args = parse_args()
-    assistant = build_assistant(args.mode, args.command)
+    try:
+        assistant = build_assistant(args.mode, args.command, wake_word=args.wake_word)
+    except WakeWordUnavailable as e:
+        raise SystemExit(f"[Palavra de ativação] {e}")
     if args.once:
         assistant.run_once(args.command)
     else:
-        assistant.run()
+        assistant.run(overlap=args.overlap)
+    if isinstance(assistant.stt, WakeWordSTT):
+        print(f"[CPU] {assistant.stt.meter.format_report()}")
 
 
 if __name__ == "__main__":
@@ -3,14 +3,16 @@
 
 # %%
 import argparse
+import io
 import os
+import queue
 import sys
-import tempfile
-import time
-import urllib.parse
-import webbrowser
-from dataclasses import dataclass
-from typing import Protocol, Optional, Iterable
+import threading
+from dataclasses import dataclass, replace
+from typing import Callable, List, Protocol, Optional, Iterable, Tuple
+
+# Primeiro import local: marca o início do relatório de inicialização
+from startup import timer
 
 from dotenv import load_dotenv
 
@@ -20,8 +22,20 @@ if sys.version_info >= (3, 13):
     sys.modules['aifc'] = types.ModuleType('aifc')
     sys.modules['audioop'] = types.ModuleType('audioop')
 
-# Imports globais rápidos
-import requests
+from audio_utils import WHISPER_SAMPLE_RATE, EndpointConfig, record_utterance, resample, trim_speech
+from commands import load_plugins, registry as command_registry
+from conversation import ConversationContext
+from llm_cache import CachedIntelligence, ResponseCache
+from llm_client import OPENAI_URL, prewarm_async
+from llm_router import Backend, LLMRouter
+from model_registry import _load_whisper, model_spec, warm_up
+from pipeline import EXIT_WORDS, ConversationPipeline
+from playback import AudioPlayer, decode_audio
+from stage_timing import stage
+from streaming import PartialTranscript, StreamingTranscriber
+from text_utils import split_sentences
+from tts_cache import TTSCache
+from wake_word import WakeWordSTT, WakeWordUnavailable, build_gate, enroll
 
 # %% [markdown]
 # Protocolos
@@ -45,27 +59,31 @@ class Intelligence(Protocol):
 # Implementações
 
 class WhisperSTT:
-    def __init__(self, model_size: str = "base", language: str = "pt", duration: int = 5):
+    def __init__(self, model_size: str = "base", language: str = "pt", duration: int = 5,
+                 endpointing: Optional[EndpointConfig] = None,
+                 on_partial: Optional[Callable[[PartialTranscript], None]] = None,
+                 on_speech_start: Optional[Callable[[], None]] = None):
         print(f"\n[WhisperSTT] Inicializando (Local e Gratuito)...")
         print(f"[WhisperSTT] Carregando bibliotecas de áudio e IA (isso pode demorar na primeira vez)...")
         
         try:
             import whisper
             import sounddevice as sd
-            import scipy.io.wavfile as wav
             import numpy as np
             self._whisper = whisper
             self._sd = sd
-            self._wav = wav
             self._np = np
         except ImportError as e:
             print(f"[WhisperSTT] ERRO: Faltam dependências: {e}")
-            print("Instale com: pip install openai-whisper sounddevice scipy numpy")
+            print("Instale com: pip install openai-whisper sounddevice numpy")
             raise e
 
         print(f"[WhisperSTT] Carregando modelo Whisper '{model_size}'...")
         try:
-            self._model = self._whisper.load_model(model_size)
+            # Snapshot mapeável em memória quando disponível (ver model_registry.py)
+            self._model = _load_whisper(model_size)
+            # Inferência de aquecimento: a primeira fala real já roda na latência normal
+            warm_up(self._model, language)
             print("[WhisperSTT] Modelo carregado com sucesso.")
         except Exception as e:
             print(f"[WhisperSTT] ERRO CRÍTICO ao carregar modelo: {e}")
@@ -74,31 +92,92 @@ class WhisperSTT:
 
         self._language = language
         self._duration = duration
+        self._endpointing = endpointing
+        # Chamado quando o VAD detecta o início da fala (ex.: GTTSTTS.stop para barge-in)
+        self.on_speech_start = on_speech_start
+        # Transcrição incremental (apenas no modo VAD): hipóteses parciais enquanto o usuário fala
+        self._streaming = None
+        if endpointing is not None and on_partial is not None:
+            self._streaming = StreamingTranscriber(self._model, language=language, on_partial=on_partial)
+
+    def _record_until_silence(self, start_timeout: Optional[float] = None,
+                              on_speech: Optional[Callable] = None,
+                              read_block: Optional[Callable] = None, prefix=None):
+        # Lê blocos do microfone e encerra assim que o VAD detecta o fim da fala
+        config = self._endpointing
+        if start_timeout is not None:
+            config = replace(config, start_timeout=start_timeout)
+        if read_block is not None:
+            return record_utterance(read_block, config, prefix, on_speech, self.on_speech_start)
+
+        block_size = config.block_size
+        with self._sd.InputStream(samplerate=WHISPER_SAMPLE_RATE, channels=1, dtype='float32', blocksize=block_size) as stream:
+            return record_utterance(lambda: stream.read(block_size)[0], config, None, on_speech, self.on_speech_start)
+
+    def _read(self, read_block: Callable, duration: float, prefix=None):
+        # Modo de duração fixa em um microfone já aberto
+        needed = int(duration * WHISPER_SAMPLE_RATE)
+        blocks = [prefix] if prefix is not None else []
+        total = sum(len(b) for b in blocks)
+        while total < needed:
+            block = self._np.asarray(read_block(), dtype=self._np.float32).reshape(-1)
+            blocks.append(block)
+            total += len(block)
+        return self._np.concatenate(blocks)[:needed]
+
+    def _record(self, duration: float):
+        # Grava direto em float32 a 16 kHz (formato nativo do Whisper).
+        # Se o dispositivo não aceitar 16 kHz, grava na taxa padrão e reamostra em memória.
+        try:
+            recording = self._sd.rec(int(duration * WHISPER_SAMPLE_RATE), samplerate=WHISPER_SAMPLE_RATE, channels=1, dtype='float32')
+            self._sd.wait()
+            return recording.reshape(-1)
+        except self._sd.PortAudioError:
+            fs = int(self._sd.query_devices(kind='input')['default_samplerate'])
+            recording = self._sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype='float32')
+            self._sd.wait()
+            return resample(recording.reshape(-1), fs)
 
     def listen(self, timeout: Optional[float] = None) -> Optional[str]:
-        duration = timeout if timeout is not None else self._duration
-        fs = 44100  # Sample rate
-        
-        print(f"\n[Ouvindo] Fale agora ({duration}s)...")
+        return self._listen(timeout)
+
+    def listen_from(self, read_block: Callable, prefix=None, timeout: Optional[float] = None) -> Optional[str]:
+        # Continua em um microfone já aberto (ex.: pelo portão da palavra de ativação),
+        # começando pelo áudio já lido (prefix)
+        return self._listen(timeout, read_block, prefix)
+
+    def _listen(self, timeout: Optional[float] = None, read_block: Optional[Callable] = None,
+                prefix=None) -> Optional[str]:
         try:
-            recording = self._sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype='int16')
-            self._sd.wait()
-            print("[Processando] Transcrevendo áudio...")
+            if self._endpointing is not None:
+                # No modo VAD, o timeout limita a espera pelo início da fala
+                print("\n[Ouvindo] Fale agora...")
+                if self._streaming is not None:
+                    audio = self._record_until_silence(timeout, self._streaming.feed, read_block, prefix)
+                    if audio is None:
+                        return None
+                    # A maior parte do texto já foi decodificada durante a fala
+                    text = self._streaming.finalize()
+                    return text if text else None
+                audio = self._record_until_silence(timeout, None, read_block, prefix)
+                if audio is None:
+                    return None
+            else:
+                duration = timeout if timeout is not None else self._duration
+                print(f"\n[Ouvindo] Fale agora ({duration}s)...")
+                audio = self._record(duration) if read_block is None else self._read(read_block, duration, prefix)
 
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-                temp_filename = f.name
-            
-            self._wav.write(temp_filename, fs, recording)
+            # Silêncio nas pontas fica de fora; sem fala nenhuma, o Whisper nem é chamado
+            audio = trim_speech(audio)
+            if audio is None:
+                return None
+            print("[Processando] Transcrevendo áudio...")
 
-            # Transcrever
-            result = self._model.transcribe(temp_filename, language=self._language, fp16=False)
+            # Transcrever direto do buffer em memória (sem arquivo temporário nem FFmpeg)
+            with stage("transcribe"):
+                result = self._model.transcribe(audio, language=self._language, fp16=False)
             text = result["text"].strip()
 
-            try:
-                os.remove(temp_filename)
-            except OSError:
-                pass
-
             return text if text else None
 
         except Exception as e:
@@ -106,6 +185,11 @@ class WhisperSTT:
             return None
 
 
+def print_partial(partial: PartialTranscript) -> None:
+    # Mostra o texto ao vivo na mesma linha do terminal
+    print(f"\r🎤 (ao vivo) {partial.text}", end="\n" if partial.final else "", flush=True)
+
+
 class TextInputSTT:
     def __init__(self, inputs: Optional[Iterable[str]] = None):
         self._inputs = list(inputs) if inputs is not None else None
@@ -122,18 +206,64 @@ class TextInputSTT:
 
 
 class GTTSTTS:
-    def __init__(self, language: str = "pt"):
+    def __init__(self, language: str = "pt", cache: Optional[TTSCache] = None, player: Optional[AudioPlayer] = None):
         self._language = language
+        # Cache opcional em disco: frases repetidas não voltam ao gTTS
+        self._cache = cache
         self._gTTS = None
-        self._pygame = None
+        self._player = player
+        # Sinalizado por stop(): interrompe a fala atual e descarta as frases restantes
+        self._interrupted = threading.Event()
         try:
             from gtts import gTTS
-            import pygame
             self._gTTS = gTTS
-            self._pygame = pygame
-            self._pygame.mixer.init()
+            if self._player is None:
+                self._player = AudioPlayer()
+        except Exception as e:
+            print(f"Aviso: Erro ao inicializar áudio (gTTS/sounddevice): {e}")
+
+    def _writer(self, sentence: str) -> Callable[[str], None]:
+        def write(path: str) -> None:
+            self._gTTS(text=sentence, lang=self._language, slow=False).save(path)
+        return write
+
+    def _synthesize(self, sentence: str):
+        with stage("tts"):
+            return self._synthesize_pcm(sentence)
+
+    def _synthesize_pcm(self, sentence: str):
+        # MP3 em memória (ou lido do cache) decodificado direto para PCM, sem arquivo temporário
+        if self._cache is not None:
+            path = self._cache.get_or_create("gtts", self._language, sentence, self._writer(sentence))
+            with open(path, "rb") as f:
+                data = f.read()
+        else:
+            buffer = io.BytesIO()
+            self._gTTS(text=sentence, lang=self._language, slow=False).write_to_fp(buffer)
+            data = buffer.getvalue()
+        return decode_audio(data)
+
+    def precompute(self, phrases: Iterable[str]) -> None:
+        if self._cache is not None and self._gTTS is not None:
+            self._cache.precompute("gtts", self._language, phrases, self._writer)
+
+    def _produce(self, sentences: List[str], ready: "queue.Queue") -> None:
+        # Produtor: sintetiza as frases em ordem, ficando no máximo uma à frente da reprodução
+        try:
+            for sentence in sentences:
+                if self._interrupted.is_set():
+                    break
+                ready.put(self._synthesize(sentence))
         except Exception as e:
-            print(f"Aviso: Erro ao inicializar áudio (gTTS/Pygame): {e}")
+            print(f"Erro ao sintetizar áudio: {e}")
+        finally:
+            ready.put(None)
+
+    def stop(self) -> None:
+        # Barge-in: pode ser chamado pelo microfone quando o usuário começa a falar
+        self._interrupted.set()
+        if self._player is not None:
+            self._player.stop()
 
     def speak(self, text: str) -> None:
         if not text:
@@ -141,61 +271,87 @@ class GTTSTTS:
         
         print(f"\n🤖 Assistente: {text}")
 
-        if not self._gTTS or not self._pygame:
+        if not self._gTTS or not self._player:
             return
 
-        try:
-            tts = self._gTTS(text=text, lang=self._language, slow=False)
-            
-            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
-                temp_filename = f.name
-            
-            tts.save(temp_filename)
+        self._interrupted.clear()
+        # Consumidor: toca a frase N enquanto a N+1 é sintetizada em segundo plano,
+        # então o silêncio inicial não cresce com o tamanho da resposta.
+        ready: "queue.Queue" = queue.Queue(maxsize=1)
+        producer = threading.Thread(target=self._produce, args=(split_sentences(text), ready), daemon=True)
+        producer.start()
 
-            self._pygame.mixer.music.load(temp_filename)
-            self._pygame.mixer.music.play()
-            
-            while self._pygame.mixer.music.get_busy():
-                time.sleep(0.1)
-            
-            self._pygame.mixer.music.unload()
-            
+        while True:
+            item = ready.get()
+            if item is None:
+                break
+            if self._interrupted.is_set():
+                continue
             try:
-                os.remove(temp_filename)
-            except OSError:
-                pass
-                
-        except Exception as e:
-            print(f"Erro ao reproduzir áudio: {e}")
+                self._player.play(*item).wait()
+            except Exception as e:
+                print(f"Erro ao reproduzir áudio: {e}")
 
+        producer.join()
+        if self._interrupted.is_set():
+            print("[TTS] Fala interrompida.")
 
-class ChatGPTIntelligence:
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
-        try:
-            import openai
-            self._client = openai.OpenAI(api_key=api_key)
-            self._model = model
-        except ImportError:
-            print("Erro: Biblioteca 'openai' não encontrada. Instale com 'pip install openai'.")
-            raise
+
+SYSTEM_PROMPT = "Você é um assistente virtual útil e conciso. Responda em português."
+
+
+class RoutedIntelligence:
+    """Intelligence sobre um conjunto de backends (llm_router.py): cada pergunta vai ao mais rápido saudável."""
+
+    system_prompt = SYSTEM_PROMPT
+
+    def __init__(self, router: LLMRouter, context: Optional[ConversationContext] = None):
+        self._router = router
+        # Rodadas anteriores entram no prompt dentro do orçamento de tokens (as antigas viram resumo)
+        self._context = context or ConversationContext(self.system_prompt)
+        self._history: List[dict] = []
+
+    @property
+    def router(self) -> LLMRouter:
+        return self._router
+
+    @property
+    def model(self) -> str:
+        return self._router.model
+
+    def cache_prefix(self, text: str) -> str:
+        # Usado pelo CachedIntelligence: a resposta depende da conversa até aqui
+        return self._context.cache_prefix(self._context.build_messages(self._history, text))
+
+    def remember(self, text: str, response: str) -> None:
+        self._history.append({"role": "user", "content": text})
+        self._history.append({"role": "assistant", "content": response})
 
     def process(self, text: str) -> str:
         if not text:
             return "Não entendi."
-        
+
         try:
-            response = self._client.chat.completions.create(
-                model=self._model,
-                messages=[
-                    {"role": "system", "content": "Você é um assistente virtual útil e conciso. Responda em português."},
-                    {"role": "user", "content": text}
-                ]
-            )
-            return response.choices[0].message.content
+            content = self._router.complete(self._context.build_messages(self._history, text))
+            self.remember(text, content)
+            return content
         except Exception as e:
             return f"Erro na IA: {str(e)}"
 
 
+class ChatGPTIntelligence(RoutedIntelligence):
+    """Um único backend compatível com a API da OpenAI."""
+
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo", base_url: str = OPENAI_URL,
+                 context: Optional[ConversationContext] = None):
+        try:
+            import openai
+        except ImportError:
+            print("Erro: Biblioteca 'openai' não encontrada. Instale com 'pip install openai'.")
+            raise
+        super().__init__(LLMRouter([Backend("openai", base_url, api_key, model)]), context)
+
+
 # %% [markdown]
 # Ações Locais
 
@@ -207,43 +363,51 @@ class ActionResult:
 
 
 def try_local_commands(text: str) -> Optional[ActionResult]:
-    s = (text or "").lower()
-    
-    if "wikipedia" in s:
-        query = s.replace("wikipedia", "").replace("pesquisar", "").strip()
-        if not query:
-            return ActionResult(False, "O que devo pesquisar na Wikipedia?", True)
-        url = "https://pt.wikipedia.org/wiki/Special:Search?search=" + urllib.parse.quote_plus(query)
-        webbrowser.open(url)
-        return ActionResult(True, f"Pesquisando '{query}' na Wikipedia", True)
-        
-    if "youtube" in s or "vídeo" in s or "video" in s:
-        query = s.replace("youtube", "").replace("vídeo", "").replace("video", "").replace("pesquisar", "").strip()
-        if not query:
-            return ActionResult(False, "O que devo pesquisar no YouTube?", True)
-        url = "https://www.youtube.com/results?search_query=" + urllib.parse.quote_plus(query)
-        webbrowser.open(url)
-        return ActionResult(True, f"Pesquisando '{query}' no YouTube", True)
-        
-    if "farmácia" in s or "farmacia" in s:
-        url = "https://www.google.com/maps/search/farmacia+perto+de+mim"
-        webbrowser.open(url)
-        return ActionResult(True, "Abrindo mapa de farmácias", True)
-
-    return None
+    match = command_registry.match(text)
+    if match is None:
+        return None
+    result = match.run()
+    return ActionResult(result.success, result.message, True)
 
 
 # %% [markdown]
 # Orquestrador
 
+# Frases fixas faladas pelo assistente (pré-calculadas no cache de TTS)
+SYSTEM_PHRASES = [
+    "Olá! Como posso ajudar?",
+    "Até logo!",
+    "O que devo pesquisar na Wikipedia?",
+    "O que devo pesquisar no YouTube?",
+    "Abrindo mapa de farmácias próximas.",
+    "Comando não reconhecido. (IA não configurada)",
+]
+
 class AIAssistant:
     def __init__(self, stt: SpeechToText, tts: TextToSpeech, ai: Optional[Intelligence]):
         self._stt = stt
         self._tts = tts
         self._ai = ai
 
-    def run(self):
+    def respond(self, text: str) -> str:
+        with stage("route"):
+            local_result = try_local_commands(text)
+        if local_result:
+            return local_result.message
+
+        if self._ai:
+            with stage("llm"):
+                return self._ai.process(text)
+        return "Comando não reconhecido. (IA não configurada)"
+
+    def run(self, overlap: bool = False):
         print("\n--- Assistente Pronto ---")
+        if overlap:
+            # Ouvir, responder e falar em estágios simultâneos: a próxima fala é
+            # capturada enquanto a resposta anterior ainda está sendo gerada/falada
+            ConversationPipeline(self._stt, self._tts, self.respond, greeting="Olá! Como posso ajudar?").run()
+            return
+
         self._tts.speak("Olá! Como posso ajudar?")
         
         while True:
@@ -254,32 +418,80 @@ class AIAssistant:
                 
             print(f"🎤 Você: {text}")
             
-            if text.lower().strip() in {"sair", "encerrar", "exit", "tchau"}:
+            if text.lower().strip() in EXIT_WORDS:
                 self._tts.speak("Até logo!")
                 break
 
-            local_result = try_local_commands(text)
-            if local_result:
-                self._tts.speak(local_result.message)
-                continue
-
-            if self._ai:
-                response = self._ai.process(text)
-                self._tts.speak(response)
-            else:
-                self._tts.speak("Comando não reconhecido. (IA não configurada)")
+            self._tts.speak(self.respond(text))
 
 
 # %% [markdown]
 # Configuração e Main
 
-def parse_args():
+def parse_args(argv: Optional[List[str]] = None):
     p = argparse.ArgumentParser("Assistente AI")
     p.add_argument("--mode", choices=["voice", "text"], default="voice", help="Modo de entrada")
-    p.add_argument("--no-ai", action="store_true", help="Desativar ChatGPT")
-    p.add_argument("--duration", type=int, default=5, help="Duração da gravação (segundos)")
-    p.add_argument("--model", type=str, default="base", help="Modelo Whisper (tiny, base, small, medium, large)")
-    return p.parse_args()
+    p.add_argument("--no-ai", action="store_true", help="Desativar a IA")
+    p.add_argument("--no-cache", action="store_true", help="Desativar o cache de respostas da IA")
+    p.add_argument("--duration", type=int, default=5, help="Duração da gravação no modo fixo (segundos)")
+    p.add_argument("--endpoint", choices=["vad", "fixed"], default="vad", help="Fim da gravação por detecção de silêncio ou duração fixa")
+    p.add_argument("--pre-roll", type=float, default=0.3, help="Áudio mantido antes do início da fala (segundos)")
+    p.add_argument("--hangover", type=float, default=0.8, help="Silêncio que encerra a fala (segundos)")
+    p.add_argument("--max-length", type=float, default=15.0, help="Duração máxima de uma fala (segundos)")
+    p.add_argument("--stream", action="store_true", help="Transcrição incremental com texto ao vivo (modo VAD)")
+    p.add_argument("--model", type=str, default="base", help="Modelo Whisper (tiny, base, small, medium, large; sufixo -int8 para quantizado, ex.: base-int8)")
+    p.add_argument("--overlap", action="store_true", help="Ouvir a próxima fala enquanto responde (estágios simultâneos; use fones de ouvido)")
+    p.add_argument("--wake-word", action="store_true", help="Só transcrever depois da palavra de ativação (WAKE_WORD, padrão 'assistente')")
+    p.add_argument("--enroll-wake-word", type=int, default=0, metavar="N", help="Gravar N exemplos da palavra de ativação e sair")
+    p.add_argument("--barge-in", action="store_true", help="Interromper a fala do assistente quando o usuário começar a falar (use fones de ouvido)")
+    return p.parse_args(argv)
+
+def with_wake_word(stt: WhisperSTT, tts: Optional[GTTSTTS] = None) -> SpeechToText:
+    # Microfone sempre aberto, mas o Whisper só roda depois da palavra de ativação.
+    # Exige os exemplos gravados (--enroll-wake-word); sem eles, WakeWordUnavailable.
+    wake_word = os.getenv("WAKE_WORD", "assistente")
+    gate = build_gate(wake_word)
+    # Com barge-in, dizer a palavra de ativação interrompe a fala do assistente
+    return WakeWordSTT(stt, gate, wake_word, on_wake=tts.stop if tts is not None else None)
+
+def build_stt(args, tts: GTTSTTS) -> SpeechToText:
+    if args.mode == "voice":
+        try:
+            endpointing = None
+            if args.endpoint == "vad":
+                endpointing = EndpointConfig(pre_roll=args.pre_roll, hangover=args.hangover, max_length=args.max_length)
+            on_partial = print_partial if args.stream else None
+            # Barge-in: só no modo VAD com estágios simultâneos (o microfone precisa estar aberto durante a fala)
+            on_speech_start = tts.stop if args.barge_in and endpointing is not None and args.overlap else None
+            stt = WhisperSTT(model_size=model_spec(args.model), language="pt", duration=args.duration,
+                             endpointing=endpointing, on_partial=on_partial, on_speech_start=on_speech_start)
+        except Exception:
+            print("Falha ao carregar Whisper. Alternando para modo texto.")
+            return TextInputSTT()
+        if args.wake_word:
+            # Fora do try: sem portão utilizável, --wake-word encerra com a instrução de correção
+            stt = with_wake_word(stt, tts if args.barge_in and args.overlap else None)
+    else:
+        stt = TextInputSTT()
+    return stt
+
+def build_ai(args) -> Optional[Intelligence]:
+    ai = None
+    if not args.no_ai:
+        # Backends em LLM_BACKENDS (padrão: OpenAI e roteador do Hugging Face, os que tiverem chave)
+        router = LLMRouter.from_env(default=("openai", "hf"))
+        if router:
+            ai = RoutedIntelligence(router)
+            if not args.no_cache:
+                # Perguntas repetidas são respondidas pelo cache, sem chamada remota
+                ai = CachedIntelligence(ai, ResponseCache.from_env())
+            # Abre as conexões enquanto o resto do assistente inicializa
+            for backend in router.backends:
+                prewarm_async(backend.api_key, backend.base_url)
+        else:
+            print("\n[AVISO] Nenhuma IA configurada (OPENAI_API_KEY, HF_TOKEN ou LLM_BACKENDS).")
+            print("Apenas comandos locais (Wikipedia, YouTube) funcionarão.")
+    return ai
 
 def check_ffmpeg():
     import shutil
@@ -291,41 +503,45 @@ def check_ffmpeg():
 
 def main():
     print(">>> Iniciando Assistente Virtual...")
+    timer.mark("imports")
     load_dotenv()
+    load_plugins(command_registry)
     args = parse_args()
+    timer.mark("config")
+
+    if args.enroll_wake_word:
+        enroll(args.enroll_wake_word)
+        return
     
     check_ffmpeg()
 
-    # Configurar TTS
-    tts = GTTSTTS(language="pt")
+    # Configurar TTS (com cache em disco e frases fixas pré-calculadas em segundo plano)
+    with timer.phase("tts"):
+        tts = GTTSTTS(language="pt", cache=TTSCache())
+    threading.Thread(target=tts.precompute, args=(SYSTEM_PHRASES,), name="tts-precompute", daemon=True).start()
 
     # Configurar STT
-    stt = None
-    if args.mode == "voice":
+    with timer.phase("stt"):
         try:
-            stt = WhisperSTT(model_size=args.model, language="pt", duration=args.duration)
-        except Exception:
-            print("Falha ao carregar Whisper. Alternando para modo texto.")
-            stt = TextInputSTT()
-    else:
-        stt = TextInputSTT()
+            stt = build_stt(args, tts)
+        except WakeWordUnavailable as e:
+            raise SystemExit(f"[Palavra de ativação] {e}")
 
     # Configurar IA
-    ai = None
-    if not args.no_ai:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key and api_key != "sua_chave_api_aqui":
-            try:
-                ai = ChatGPTIntelligence(api_key=api_key)
-            except Exception as e:
-                print(f"Erro ao inicializar ChatGPT: {e}")
-        else:
-            print("\n[AVISO] Chave OpenAI não configurada (OPENAI_API_KEY).")
-            print("Apenas comandos locais (Wikipedia, YouTube) funcionarão.")
-    
+    with timer.phase("ai"):
+        ai = build_ai(args)
+
+    timer.report()
+
     # Iniciar
     assistant = AIAssistant(stt, tts, ai)
-    assistant.run()
+    assistant.run(overlap=args.overlap)
+
+    if isinstance(stt, WakeWordSTT):
+        print(f"[CPU] {stt.meter.format_report()}")
+    if isinstance(ai, CachedIntelligence):
+        stats = ai.cache.stats()
+        print(f"[Cache IA] {stats['hits']} acertos, {stats['misses']} faltas.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,223 @@
+# Armazenamento dos áudios gerados e recebidos durante as conversas.
+#
+# Tudo fica em um diretório próprio (em tmpfs, /dev/shm, quando disponível), que
+# contém o diretório temporário do Gradio (gradio/, o GRADIO_TEMP_DIR). Cada sessão tem
+# uma subpasta em gradio/sessions/: o Gradio serve os arquivos de dentro do seu
+# diretório sem copiá-los. A pasta da sessão é apagada quando o navegador desconecta;
+# um coletor em segundo plano remove arquivos antigos e, se o total passar do limite
+# de bytes, os menos recentes. Assim o uso de disco não cresce com o tempo de atividade.
+# Só as pastas de sessão são tocadas: o resto do diretório do Gradio (uploads e cópias)
+# é limpo pelo próprio Gradio (Blocks(delete_cache=...)).
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_SESSION_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_MAX_AGE = 3600.0  # segundos
+DEFAULT_REAP_INTERVAL = 60.0  # segundos
+SESSIONS_DIR = "sessions"
+GRADIO_DIR = "gradio"
+
+
+def default_spool_dir() -> str:
+    # tmpfs evita E/S de disco para arquivos de vida curta
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return os.path.join(shm, "assistente-virtual")
+    return os.path.join(tempfile.gettempdir(), "assistente-virtual")
+
+
+def _safe_name(session: str) -> str:
+    name = "".join(c for c in str(session) if c.isalnum() or c in "-_")
+    return name or "anonimo"
+
+
+class AudioArtifactStore:
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: float = DEFAULT_MAX_AGE, session_max_bytes: int = DEFAULT_SESSION_MAX_BYTES,
+                 reap_interval: float = DEFAULT_REAP_INTERVAL, gradio_dir: Optional[str] = None,
+                 clock: Callable[[], float] = time.time):
+        self.root = os.path.abspath(root or default_spool_dir())
+        # Diretório temporário do Gradio (GRADIO_TEMP_DIR); as sessões ficam dentro dele
+        self.gradio_dir = os.path.abspath(gradio_dir or os.path.join(self.root, GRADIO_DIR))
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.session_max_bytes = session_max_bytes
+        self.reap_interval = reap_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._approx_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.files_removed = 0
+        self.bytes_removed = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "AudioArtifactStore":
+        mb = 1024 * 1024
+        return cls(
+            root=os.getenv("AUDIO_SPOOL_DIR") or None,
+            max_bytes=int(float(os.getenv("AUDIO_SPOOL_MAX_MB", DEFAULT_MAX_BYTES / mb)) * mb),
+            max_age=float(os.getenv("AUDIO_SPOOL_MAX_AGE", DEFAULT_MAX_AGE)),
+            session_max_bytes=int(float(os.getenv("AUDIO_SESSION_MAX_MB", DEFAULT_SESSION_MAX_BYTES / mb)) * mb),
+            gradio_dir=os.getenv("GRADIO_TEMP_DIR") or None,
+        )
+
+    # Arquivos por sessão
+
+    @property
+    def sessions_root(self) -> str:
+        return os.path.join(self.gradio_dir, SESSIONS_DIR)
+
+    def session_dir(self, session: str) -> str:
+        return os.path.join(self.sessions_root, _safe_name(session))
+
+    def contains(self, path: str) -> bool:
+        # Só os arquivos das sessões pertencem a este armazenamento
+        path = os.path.abspath(path)
+        return os.path.commonpath([path, self.sessions_root]) == self.sessions_root
+
+    def put(self, session: str, data: bytes, suffix: str = ".mp3") -> str:
+        directory = self.session_dir(session)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        path = tmp_path[:-len(".tmp")] + suffix
+        os.replace(tmp_path, path)
+        self._added(directory, len(data), keep=path)
+        return path
+
+    def adopt(self, session: str, source: str) -> str:
+        # Traz um arquivo (ex.: do cache de TTS) para a pasta da sessão; link físico quando
+        # possível (sem cópia), senão cópia
+        directory = self.session_dir(session)
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(source)[1])
+        os.close(fd)
+        os.remove(path)
+        try:
+            os.link(source, path)
+        except OSError:
+            shutil.copyfile(source, path)
+        self._added(directory, os.path.getsize(path), keep=path)
+        return path
+
+    def discard(self, path: str) -> bool:
+        # Remove um arquivo já consumido (ex.: gravação enviada), se for deste armazenamento
+        return bool(path) and self.contains(path) and self._unlink(path)
+
+    def release(self, session: str) -> None:
+        directory = self.session_dir(session)
+        removed, size = self._remove_tree(directory)
+        with self._lock:
+            self._approx_bytes = max(0, self._approx_bytes - size)
+            self.files_removed += removed
+            self.bytes_removed += size
+
+    def _added(self, directory: str, size: int, keep: str) -> None:
+        # Cota da sessão: remove os arquivos mais antigos dela (menos o recém-criado)
+        files = self._scan(directory)
+        total = sum(s for _, s, _ in files)
+        for path, s, _ in sorted(files, key=lambda f: f[2]):
+            if total <= self.session_max_bytes:
+                break
+            if path != keep and self._unlink(path):
+                total -= s
+        with self._lock:
+            self._approx_bytes += size
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.reap()
+
+    # Coleta
+
+    def _scan(self, directory: str) -> List[Tuple[str, int, float]]:
+        files = []
+        for dirpath, _dirnames, filenames in os.walk(directory):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((path, st.st_size, st.st_mtime))
+        return files
+
+    def _unlink(self, path: str) -> bool:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return False
+        with self._lock:
+            self._approx_bytes = max(0, self._approx_bytes - size)
+            self.files_removed += 1
+            self.bytes_removed += size
+        return True
+
+    def _remove_tree(self, directory: str) -> Tuple[int, int]:
+        files = self._scan(directory)
+        shutil.rmtree(directory, ignore_errors=True)
+        return len(files), sum(s for _, s, _ in files)
+
+    def _prune_empty_dirs(self) -> None:
+        for dirpath, _dirnames, _filenames in os.walk(self.sessions_root, topdown=False):
+            if dirpath != self.sessions_root:
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+
+    def reap(self) -> int:
+        # Remove arquivos mais velhos que max_age e, acima de max_bytes, os menos recentes.
+        # Percorre só as pastas de sessão (inclusive sobras de execuções anteriores).
+        now = self._clock()
+        files = sorted(self._scan(self.sessions_root), key=lambda f: f[2])
+        removed = 0
+        total = sum(s for _, s, _ in files)
+        for path, size, mtime in files:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            if self._unlink(path):
+                removed += 1
+                total -= size
+        with self._lock:
+            self._approx_bytes = total
+        self._prune_empty_dirs()
+        return removed
+
+    def start_reaper(self) -> threading.Thread:
+        def _run():
+            # A primeira passada já remove as sobras de execuções anteriores
+            while True:
+                try:
+                    self.reap()
+                except Exception as e:
+                    print(f"[Áudios] Erro na limpeza: {e}")
+                if self._stop.wait(self.reap_interval):
+                    break
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=_run, name="audio-reaper", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "bytes": self._approx_bytes,
+                "files_removed": self.files_removed,
+                "bytes_removed": self.bytes_removed,
+            }
@@ -0,0 +1,282 @@
+# Utilidades de áudio em memória para o Whisper.
+#
+# O Whisper aceita diretamente um array float32 mono a 16 kHz. Convertendo o
+# áudio aqui evitamos gravar arquivos temporários e iniciar o FFmpeg a cada fala.
+
+import wave
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+
+WHISPER_SAMPLE_RATE = 16000
+
+
+def to_float32_mono(audio: np.ndarray) -> np.ndarray:
+    audio = np.asarray(audio)
+    if audio.dtype.kind == "i":
+        scale = float(np.iinfo(audio.dtype).max) + 1.0
+        audio = audio.astype(np.float32) / scale
+    elif audio.dtype.kind == "u":
+        # PCM de 8 bits é sem sinal, centrado em 128
+        half = (float(np.iinfo(audio.dtype).max) + 1.0) / 2.0
+        audio = (audio.astype(np.float32) - half) / half
+    else:
+        audio = audio.astype(np.float32, copy=False)
+
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    return audio
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    if orig_sr == target_sr or audio.size == 0:
+        return audio.astype(np.float32, copy=False)
+
+    if orig_sr > target_sr and orig_sr % target_sr == 0:
+        # Decimação inteira (ex: 48 kHz -> 16 kHz): a média por bloco já serve de filtro passa-baixa
+        factor = orig_sr // target_sr
+        n = (len(audio) // factor) * factor
+        return audio[:n].reshape(-1, factor).mean(axis=1).astype(np.float32)
+
+    if orig_sr > target_sr:
+        # Suaviza antes de interpolar para reduzir aliasing
+        width = int(np.ceil(orig_sr / target_sr))
+        kernel = np.ones(width, dtype=np.float32) / width
+        audio = np.convolve(audio, kernel, mode="same")
+
+    n_out = int(round(len(audio) * target_sr / orig_sr))
+    x_old = np.arange(len(audio), dtype=np.float64) / orig_sr
+    x_new = np.arange(n_out, dtype=np.float64) / target_sr
+    return np.interp(x_new, x_old, audio).astype(np.float32)
+
+
+def decode_wav(path_or_file) -> Tuple[np.ndarray, int]:
+    with wave.open(path_or_file, "rb") as w:
+        sr = w.getframerate()
+        channels = w.getnchannels()
+        width = w.getsampwidth()
+        frames = w.readframes(w.getnframes())
+
+    dtypes = {1: np.uint8, 2: np.int16, 4: np.int32}
+    if width not in dtypes:
+        raise ValueError(f"WAV com {width * 8} bits não suportado")
+
+    data = np.frombuffer(frames, dtype=dtypes[width])
+    if channels > 1:
+        data = data.reshape(-1, channels)
+    return to_float32_mono(data), sr
+
+
+def load_audio_array(source: Union[str, Tuple[int, np.ndarray], np.ndarray, None]) -> Optional[np.ndarray]:
+    """Converte a entrada em float32 mono 16 kHz; retorna None se precisar do FFmpeg."""
+    if source is None:
+        return None
+
+    if isinstance(source, tuple):
+        # Formato do gr.Audio(type="numpy"): (taxa de amostragem, dados)
+        sr, data = source
+        return resample(to_float32_mono(data), int(sr))
+
+    if isinstance(source, np.ndarray):
+        return to_float32_mono(source)
+
+    if isinstance(source, str) and source.lower().endswith(".wav"):
+        try:
+            audio, sr = decode_wav(source)
+            return resample(audio, sr)
+        except (OSError, EOFError, wave.Error, ValueError):
+            return None
+
+    return None
+
+
+# Pré-processamento antes do Whisper: corte de silêncio, volume e clipes sem fala
+
+@dataclass
+class TrimConfig:
+    frame_ms: int = 30           # Quadro usado no cálculo de energia
+    pad: float = 0.3             # Margem mantida antes e depois da fala (s)
+    min_speech: float = 0.1      # Fala mínima (s) para valer a chamada ao Whisper
+    min_rms: float = 0.005       # Energia mínima considerada voz
+    noise_ratio: float = 3.0     # Quanto acima do ruído de fundo a voz deve estar
+    noise_percentile: float = 10.0  # Percentil da energia dos quadros tomado como ruído de fundo
+    max_noise: float = 0.01      # Teto da estimativa de ruído (fala contínua não vira "ruído de fundo")
+    loud_rms: float = 0.03       # Clipe com energia típica (mediana dos quadros) acima disso nunca é descartado
+    target_rms: float = 0.1      # Volume da fala após a normalização
+    max_gain: float = 10.0       # Ganho máximo (não amplifica ruído indefinidamente)
+
+    @property
+    def frame_size(self) -> int:
+        return int(WHISPER_SAMPLE_RATE * self.frame_ms / 1000)
+
+
+def frame_energy(audio: np.ndarray, frame_size: int) -> np.ndarray:
+    """RMS de cada quadro (o último, incompleto, também conta), sem laço em Python."""
+    n = len(audio) // frame_size
+    full = audio[:n * frame_size].reshape(n, frame_size)
+    energy = np.einsum("ij,ij->i", full, full) / frame_size
+    tail = audio[n * frame_size:]
+    if tail.size:
+        energy = np.append(energy, np.dot(tail, tail) / tail.size)
+    return np.sqrt(energy)
+
+
+def normalize_loudness(audio: np.ndarray, speech_rms: float, config: Optional[TrimConfig] = None) -> np.ndarray:
+    # Leva o volume da fala a target_rms, sem passar do ganho máximo nem saturar os picos
+    cfg = config or TrimConfig()
+    if speech_rms <= 0:
+        return audio
+    gain = min(cfg.target_rms / speech_rms, cfg.max_gain)
+    peak = float(np.max(np.abs(audio))) if audio.size else 0.0
+    if peak * gain > 0.99:
+        gain = 0.99 / peak
+    return (audio * np.float32(gain)).astype(np.float32, copy=False)
+
+
+def trim_speech(audio: np.ndarray, config: Optional[TrimConfig] = None) -> Optional[np.ndarray]:
+    """Fala recortada e normalizada (float32 16 kHz); None se o clipe não tiver fala."""
+    cfg = config or TrimConfig()
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    if audio.size == 0:
+        return None
+
+    frame = cfg.frame_size
+    energy = frame_energy(audio, frame)
+    # Em fala sem pausas (ou tom constante) o percentil baixo já é voz: daí o teto
+    noise = min(float(np.percentile(energy, cfg.noise_percentile)), cfg.max_noise)
+    voiced = energy > max(cfg.min_rms, noise * cfg.noise_ratio)
+    if np.count_nonzero(voiced) * cfg.frame_ms / 1000 < cfg.min_speech:
+        # Nada a recortar, mas o clipe é alto do começo ao fim (não só um clique): vai
+        # inteiro, em vez de descartado
+        if float(np.median(energy)) >= cfg.loud_rms:
+            return normalize_loudness(audio, float(np.sqrt(np.mean(np.square(energy)))), cfg)
+        return None
+
+    indices = np.flatnonzero(voiced)
+    pad = int(cfg.pad * WHISPER_SAMPLE_RATE)
+    start = max(0, indices[0] * frame - pad)
+    end = min(len(audio), (indices[-1] + 1) * frame + pad)
+    speech_rms = float(np.sqrt(np.mean(np.square(energy[voiced]))))
+    return normalize_loudness(audio[start:end], speech_rms, cfg)
+
+
+# Detecção de fim de fala (VAD por energia)
+
+@dataclass
+class EndpointConfig:
+    block_ms: int = 30           # Tamanho de cada bloco lido do microfone
+    pre_roll: float = 0.3        # Áudio mantido antes do início da fala (s)
+    hangover: float = 0.8        # Silêncio necessário para encerrar a fala (s)
+    max_length: float = 15.0     # Duração máxima de uma fala (s)
+    start_timeout: Optional[float] = None  # Espera máxima pelo início da fala (s)
+    onset_blocks: int = 2        # Blocos consecutivos com voz para iniciar
+    min_rms: float = 0.01        # Energia mínima considerada voz
+    noise_ratio: float = 3.0     # Quanto acima do ruído de fundo a voz deve estar
+
+    @property
+    def block_size(self) -> int:
+        return int(WHISPER_SAMPLE_RATE * self.block_ms / 1000)
+
+    def blocks(self, seconds: float) -> int:
+        return max(1, int(round(seconds * 1000 / self.block_ms)))
+
+
+class Endpointer:
+    """Recebe blocos de áudio e devolve a fala completa assim que o usuário para de falar."""
+
+    def __init__(self, config: Optional[EndpointConfig] = None,
+                 on_speech: Optional[Callable[[np.ndarray], None]] = None):
+        self.config = config or EndpointConfig()
+        # Recebe cada bloco que passa a fazer parte da fala (útil para transcrição incremental)
+        self._on_speech = on_speech
+        self.reset()
+
+    def reset(self) -> None:
+        cfg = self.config
+        self._pre_roll = deque(maxlen=cfg.blocks(cfg.pre_roll))
+        self._speech = []
+        self._in_speech = False
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._waited = 0
+        self._noise_floor = cfg.min_rms / cfg.noise_ratio
+        self.timed_out = False
+
+    @property
+    def in_speech(self) -> bool:
+        return self._in_speech
+
+    def is_voiced(self, block: np.ndarray) -> bool:
+        cfg = self.config
+        rms = float(np.sqrt(np.mean(np.square(block, dtype=np.float32)))) if block.size else 0.0
+        voiced = rms > max(cfg.min_rms, self._noise_floor * cfg.noise_ratio)
+        if not voiced and not self._in_speech:
+            # Acompanha o ruído de fundo apenas fora da fala
+            self._noise_floor = 0.95 * self._noise_floor + 0.05 * rms
+        return voiced
+
+    def feed(self, block: np.ndarray) -> Optional[np.ndarray]:
+        cfg = self.config
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        voiced = self.is_voiced(block)
+
+        if not self._in_speech:
+            self._pre_roll.append(block)
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            self._waited += 1
+            if self._voiced_run >= cfg.onset_blocks:
+                self._in_speech = True
+                self._speech = list(self._pre_roll)
+                self._pre_roll.clear()
+                self._silent_run = 0
+                if self._on_speech:
+                    for b in self._speech:
+                        self._on_speech(b)
+            elif cfg.start_timeout is not None and self._waited >= cfg.blocks(cfg.start_timeout):
+                self.timed_out = True
+            return None
+
+        self._speech.append(block)
+        if self._on_speech:
+            self._on_speech(block)
+        self._silent_run = 0 if voiced else self._silent_run + 1
+        if self._silent_run >= cfg.blocks(cfg.hangover) or len(self._speech) >= cfg.blocks(cfg.max_length):
+            return self.finish()
+        return None
+
+    def finish(self) -> Optional[np.ndarray]:
+        # Encerra a fala atual (por exemplo, ao fechar o microfone)
+        speech = self._speech if self._in_speech else []
+        self.reset()
+        if not speech:
+            return None
+        return np.concatenate(speech)
+
+
+def record_utterance(read_block: Callable[[], np.ndarray], config: EndpointConfig,
+                     prefix: Optional[np.ndarray] = None,
+                     on_speech: Optional[Callable[[np.ndarray], None]] = None,
+                     on_start: Optional[Callable[[], None]] = None) -> Optional[np.ndarray]:
+    # Lê blocos até o fim da fala (None se ela não começar dentro de start_timeout).
+    # prefix: áudio já lido do mesmo microfone, processado antes dos blocos novos
+    endpointer = Endpointer(config, on_speech=on_speech)
+    size = config.block_size
+    pending = [] if prefix is None else [prefix[i:i + size] for i in range(0, len(prefix), size)]
+    pending.reverse()
+    while True:
+        block = pending.pop() if pending else read_block()
+        was_speaking = endpointer.in_speech
+        utterance = endpointer.feed(block)
+        if on_start is not None and not was_speaking and endpointer.in_speech:
+            on_start()
+        if utterance is not None:
+            return utterance
+        if endpointer.timed_out:
+            return None
+
+
+def to_pcm16(audio: np.ndarray) -> bytes:
+    # float32 em [-1, 1] para PCM de 16 bits (little-endian)
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
@@ -0,0 +1,148 @@
+# Inferência em micro-lotes com o Whisper.
+#
+# Requisições simultâneas são agrupadas por alguns milissegundos (ou até N clipes),
+# preenchidas até a janela de 30 s do espectrograma mel e decodificadas em um único
+# passe do encoder e do decoder. Todo uso do modelo acontece na thread do lote, o
+# que também evita chamadas concorrentes ao mesmo modelo PyTorch.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from audio_utils import WHISPER_SAMPLE_RATE
+
+# Opções de transcribe() que não impedem a decodificação em lote
+_BATCHABLE_OPTIONS = {"language", "fp16", "condition_on_previous_text"}
+
+# Mesmos limites que o whisper.transcribe usa para aceitar uma decodificação
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+@dataclass
+class _Job:
+    audio: object
+    options: Dict[str, object]
+    future: Future = field(default_factory=Future)
+
+
+class BatchedWhisper:
+    """Fachada com a mesma interface de model.transcribe(), servida em micro-lotes."""
+
+    def __init__(self, get_model: Callable, max_batch: int = 8, max_wait: float = 0.01,
+                 n_samples: int = 30 * WHISPER_SAMPLE_RATE):
+        self._get_model = get_model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._n_samples = n_samples
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches_run = 0
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="whisper-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, audio, **options) -> Future:
+        self._ensure_worker()
+        job = _Job(audio, {k: v for k, v in options.items() if v is not None})
+        self._queue.put(job)
+        return job.future
+
+    def transcribe(self, audio, **options) -> dict:
+        return self.submit(audio, **options).result()
+
+    def pending(self) -> int:
+        # Pedidos ainda na fila (sem contar o lote em execução)
+        return self._queue.qsize()
+
+    def _batchable(self, job: _Job) -> bool:
+        return (isinstance(job.audio, np.ndarray)
+                and job.audio.ndim == 1
+                and len(job.audio) <= self._n_samples
+                and set(job.options) <= _BATCHABLE_OPTIONS)
+
+    def _collect(self) -> List[_Job]:
+        batch = [self._queue.get()]
+        # Aguarda mais clipes por no máximo max_wait segundos
+        end = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                model = self._get_model()
+            except Exception as e:
+                for job in batch:
+                    job.future.set_exception(e)
+                continue
+
+            groups: Dict[object, List[_Job]] = {}
+            for job in batch:
+                if self._batchable(job):
+                    groups.setdefault(job.options.get("language"), []).append(job)
+                else:
+                    self._run_single(model, job)
+
+            for language, jobs in groups.items():
+                if len(jobs) == 1:
+                    # Sozinho não há ganho: transcribe() completo, com fallback de temperatura
+                    self._run_single(model, jobs[0])
+                else:
+                    self._run_batch(model, language, jobs)
+
+    def _run_single(self, model, job: _Job) -> None:
+        try:
+            job.future.set_result(model.transcribe(job.audio, **job.options))
+        except Exception as e:
+            job.future.set_exception(e)
+
+    def _run_batch(self, model, language, jobs: List[_Job]) -> None:
+        try:
+            results = self._decode_batch(model, language, [job.audio for job in jobs])
+        except Exception as e:
+            print(f"[Batch] Falha no lote de {len(jobs)} clipes, processando individualmente: {e}")
+            for job in jobs:
+                self._run_single(model, job)
+            return
+
+        self.batches_run += 1
+        for job, result in zip(jobs, results):
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                job.future.set_result({"text": "", "language": language})
+            elif result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD:
+                # Decodificação suspeita: refaz este clipe com o transcribe() completo
+                self._run_single(model, job)
+            else:
+                job.future.set_result({"text": result.text.strip(), "language": language})
+
+    def _decode_batch(self, model, language, clips: List[np.ndarray]) -> list:
+        import torch
+        import whisper
+
+        n_mels = model.dims.n_mels
+        mels = [whisper.log_mel_spectrogram(whisper.pad_or_trim(clip), n_mels=n_mels) for clip in clips]
+        mel = torch.stack(mels).to(model.device)
+        options = whisper.DecodingOptions(language=language, fp16=False, without_timestamps=True)
+        return whisper.decode(model, mel, options)
+
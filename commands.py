@@ -0,0 +1,237 @@
+# Roteamento de comandos locais (Wikipedia, YouTube, farmácia e plugins).
+#
+# Todas as frases de ativação são compiladas em uma única expressão regular em forma
+# de trie; a frase do usuário é percorrida uma só vez, independentemente de quantos
+# comandos existam. Acentos e maiúsculas não importam ("video" == "Vídeo"), as frases
+# casam apenas palavras inteiras e o texto restante vira o parâmetro do comando
+# (a consulta da Wikipedia ou do YouTube).
+
+import importlib
+import os
+import re
+import threading
+import unicodedata
+import urllib.parse
+import webbrowser
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass
+class CommandResult:
+    success: bool
+    message: str
+
+
+Handler = Callable[[str], CommandResult]
+
+
+@dataclass
+class Command:
+    name: str
+    triggers: Tuple[str, ...]
+    handler: Handler
+    fillers: Tuple[str, ...] = ()
+    order: int = 0
+
+
+@dataclass
+class CommandMatch:
+    command: Command
+    query: str
+
+    @property
+    def name(self) -> str:
+        return self.command.name
+
+    def run(self) -> CommandResult:
+        return self.command.handler(self.query)
+
+
+def _fold(text: str) -> str:
+    # Remove acentos mantendo o comprimento (um caractere por caractere), para que as
+    # posições encontradas valham também para o texto original
+    if text.isascii():
+        return text
+    return "".join(unicodedata.normalize("NFKD", c)[0] for c in text)
+
+
+def _trie_regex(phrases: Iterable[str]) -> str:
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        end = "" in node
+        branches = [(r"\s+" if char == " " else re.escape(char)) + build(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not end:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        # Quantificador guloso: a frase mais longa é tentada primeiro
+        return body + "?" if end else body
+
+    return r"(?<!\w)(?:" + build(trie) + r")(?!\w)"
+
+
+class CommandRegistry:
+    """Registro de comandos compilado em um único autômato (regex em trie)."""
+
+    def __init__(self):
+        self._commands: Dict[str, Command] = {}
+        self._phrases: Dict[str, List[Tuple[Command, bool]]] = {}
+        self._pattern: Optional[re.Pattern] = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, triggers: Iterable[str], handler: Handler, fillers: Iterable[str] = ()) -> Command:
+        triggers = tuple(triggers)
+        if not triggers:
+            raise ValueError(f"O comando '{name}' precisa de ao menos uma frase de ativação.")
+        with self._lock:
+            previous = self._commands.get(name)
+            command = Command(
+                name=name,
+                triggers=triggers,
+                handler=handler,
+                fillers=tuple(fillers),
+                # Um comando substituído mantém a sua prioridade original
+                order=previous.order if previous is not None else len(self._commands),
+            )
+            self._commands[name] = command
+            self._rebuild_phrases()
+        return command
+
+    def command(self, name: str, triggers: Iterable[str], fillers: Iterable[str] = ()) -> Callable[[Handler], Handler]:
+        # Uso como decorador, para plugins:
+        #   @registry.command("clima", ["clima", "previsão do tempo"])
+        #   def clima(query): ...
+        def decorator(handler: Handler) -> Handler:
+            self.register(name, triggers, handler, fillers)
+            return handler
+        return decorator
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            if self._commands.pop(name, None) is not None:
+                self._rebuild_phrases()
+
+    def _rebuild_phrases(self) -> None:
+        phrases: Dict[str, List[Tuple[Command, bool]]] = {}
+        for command in self._commands.values():
+            for trigger in command.triggers:
+                phrases.setdefault(self._normalize(trigger), []).append((command, True))
+            for filler in command.fillers:
+                phrases.setdefault(self._normalize(filler), []).append((command, False))
+        phrases.pop("", None)
+        self._phrases = phrases
+        # Recompilado sob demanda no próximo match()
+        self._pattern = None
+
+    @staticmethod
+    def _normalize(phrase: str) -> str:
+        return " ".join(_fold(phrase.lower()).split())
+
+    def _compiled(self) -> Optional[re.Pattern]:
+        pattern = self._pattern
+        if pattern is None and self._phrases:
+            with self._lock:
+                if self._pattern is None:
+                    self._pattern = re.compile(_trie_regex(self._phrases))
+                pattern = self._pattern
+        return pattern
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._commands
+
+    def match(self, text: str) -> Optional[CommandMatch]:
+        s = (text or "").lower()
+        pattern = self._compiled()
+        if not s or pattern is None:
+            return None
+
+        phrases = self._phrases
+        found = []
+        best: Optional[Command] = None
+        for m in pattern.finditer(_fold(s)):
+            entries = phrases.get(" ".join(m.group().split()), ())
+            found.append((m.span(), entries))
+            for command, is_trigger in entries:
+                # Vários comandos na mesma frase: vale o registrado primeiro
+                if is_trigger and (best is None or command.order < best.order):
+                    best = command
+        if best is None:
+            return None
+
+        # Parâmetro: o texto sem as frases de ativação e as palavras de preenchimento do comando
+        pieces = []
+        last = 0
+        for (start, end), entries in found:
+            if any(command is best for command, _ in entries):
+                pieces.append(s[last:start])
+                last = end
+        pieces.append(s[last:])
+        query = " ".join("".join(pieces).split())
+        return CommandMatch(best, query)
+
+    def dispatch(self, text: str) -> Optional[CommandResult]:
+        match = self.match(text)
+        return match.run() if match is not None else None
+
+
+# Comandos padrão
+
+def search_wikipedia(query: str) -> CommandResult:
+    if not query:
+        return CommandResult(False, "O que devo pesquisar na Wikipedia?")
+    url = "https://pt.wikipedia.org/wiki/Special:Search?search=" + urllib.parse.quote_plus(query)
+    webbrowser.open(url)
+    return CommandResult(True, f"Pesquisando '{query}' na Wikipedia.")
+
+
+def search_youtube(query: str) -> CommandResult:
+    if not query:
+        return CommandResult(False, "O que devo pesquisar no YouTube?")
+    url = "https://www.youtube.com/results?search_query=" + urllib.parse.quote_plus(query)
+    webbrowser.open(url)
+    return CommandResult(True, f"Pesquisando '{query}' no YouTube.")
+
+
+def open_pharmacy_map(query: str) -> CommandResult:
+    webbrowser.open("https://www.google.com/maps/search/farmacia+perto+de+mim")
+    return CommandResult(True, "Abrindo mapa de farmácias próximas.")
+
+
+def default_registry() -> CommandRegistry:
+    registry = CommandRegistry()
+    registry.register("wikipedia", ["wikipedia"], search_wikipedia, fillers=["pesquisar"])
+    registry.register("youtube", ["youtube", "vídeo", "vídeos"], search_youtube, fillers=["pesquisar"])
+    registry.register("farmacia", ["farmácia", "farmácias"], open_pharmacy_map)
+    return registry
+
+
+def load_plugins(registry: CommandRegistry, modules: Optional[Iterable[str]] = None) -> List[str]:
+    # Cada módulo de plugin expõe register(registry); a lista padrão vem de COMMAND_PLUGINS
+    if modules is None:
+        modules = [m.strip() for m in os.getenv("COMMAND_PLUGINS", "").split(",") if m.strip()]
+    loaded = []
+    for module_name in modules:
+        try:
+            module = importlib.import_module(module_name)
+            module.register(registry)
+            loaded.append(module_name)
+        except Exception as e:
+            print(f"[Comandos] Não foi possível carregar o plugin '{module_name}': {e}")
+    return loaded
+
+
+# Registro compartilhado por app.py, assistente_ai.py e assistente.py. Os plugins
+# (COMMAND_PLUGINS) são carregados por cada programa depois de ler o .env.
+registry = default_registry()
@@ -0,0 +1,146 @@
+# Contexto de várias rodadas para o LLM, limitado por um orçamento de tokens.
+#
+# As mensagens enviadas são: prompt do sistema (fixo), resumo das rodadas antigas,
+# rodadas recentes e a pergunta atual. Quando as rodadas recentes passam do orçamento,
+# as mais antigas são incorporadas ao resumo em blocos (até metade do orçamento), de
+# modo que o início do prompt só muda de tempos em tempos e o cache de prefixo do
+# provedor continua valendo entre as perguntas.
+#
+# O contexto é recalculado a partir do histórico do Gradio a cada pergunta; os resumos
+# já feitos ficam em cache, então um resumidor caro (ex.: o próprio LLM) só é chamado
+# uma vez por bloco. No app, cada sessão tem o seu ConversationContext (gr.State).
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from text_utils import split_sentences
+
+DEFAULT_MAX_TOKENS = 1500
+DEFAULT_SUMMARY_TOKENS = 200
+
+Turn = Tuple[str, str]
+Summarizer = Callable[[str, Sequence[Turn], int], str]
+
+
+def estimate_tokens(text: str) -> int:
+    # Aproximação sem tokenizador: ~4 caracteres por token em português
+    return (len(text) + 3) // 4 + 1 if text else 0
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+
+def history_turns(history: Optional[List[Dict[str, str]]]) -> List[Turn]:
+    # Histórico do Gradio (mensagens role/content) -> pares (pergunta, resposta) completos
+    turns = []
+    question = None
+    for message in history or []:
+        role, content = message.get("role"), message.get("content")
+        if not isinstance(content, str):
+            continue
+        if role == "user":
+            question = content
+        elif role == "assistant" and question is not None and content:
+            turns.append((question, content))
+            question = None
+    return turns
+
+
+def summarize_turns(summary: str, turns: Sequence[Turn], max_tokens: int) -> str:
+    """Resumo extrativo: pergunta e primeira frase da resposta de cada rodada."""
+    lines = summary.splitlines() if summary else []
+    for question, answer in turns:
+        sentences = split_sentences(answer)
+        first = sentences[0] if sentences else answer
+        lines.append(f"- Usuário: {_clip(question, 120)} | Assistente: {_clip(first, 160)}")
+    # Mantém as linhas mais recentes dentro do limite
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationContext:
+    def __init__(self, system_prompt: str, max_tokens: Optional[int] = None,
+                 summary_tokens: Optional[int] = None, low_watermark: float = 0.5,
+                 summarizer: Summarizer = summarize_turns, cache_size: int = 256):
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens or int(os.getenv("CONTEXT_MAX_TOKENS", DEFAULT_MAX_TOKENS))
+        self.summary_tokens = summary_tokens or int(os.getenv("CONTEXT_SUMMARY_TOKENS", DEFAULT_SUMMARY_TOKENS))
+        self.low_watermark = low_watermark
+        self._summarizer = summarizer
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # O Gradio copia (deepcopy) o valor do gr.State a cada evento; o lock não é copiável
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def turn_budget(self) -> int:
+        # Espaço das rodadas recentes; o resumo e o prompt do sistema têm reserva fixa
+        return max(0, self.max_tokens - estimate_tokens(self.system_prompt) - self.summary_tokens)
+
+    @staticmethod
+    def _turn_tokens(turn: Turn) -> int:
+        return estimate_tokens(turn[0]) + estimate_tokens(turn[1]) + 8
+
+    def _summarize(self, summary: str, turns: Sequence[Turn]) -> str:
+        key = hashlib.sha256(json.dumps([summary, list(turns)], ensure_ascii=False).encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._summaries:
+                self._summaries.move_to_end(key)
+                return self._summaries[key]
+        result = self._summarizer(summary, turns, self.summary_tokens)
+        with self._lock:
+            self._summaries[key] = result
+            while len(self._summaries) > self._cache_size:
+                self._summaries.popitem(last=False)
+        return result
+
+    def window(self, turns: Sequence[Turn]) -> Tuple[str, List[Turn]]:
+        # Repete a evolução rodada a rodada: o início da janela só avança quando o
+        # orçamento estoura, e então de uma vez até a marca inferior
+        budget = self.turn_budget
+        summary, start, used = "", 0, 0
+        for i, turn in enumerate(turns):
+            used += self._turn_tokens(turn)
+            if used <= budget:
+                continue
+            fold_end = start
+            while fold_end <= i and used > budget * self.low_watermark:
+                used -= self._turn_tokens(turns[fold_end])
+                fold_end += 1
+            summary = self._summarize(summary, turns[start:fold_end])
+            start = fold_end
+        return summary, list(turns[start:])
+
+    def build_messages(self, history: Optional[List[Dict[str, str]]], text: str) -> List[Dict[str, str]]:
+        summary, recent = self.window(history_turns(history))
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": f"Resumo da conversa até aqui:\n{summary}"})
+        for question, answer in recent:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        messages.append({"role": "user", "content": text})
+        return messages
+
+    def cache_prefix(self, messages: List[Dict[str, str]]) -> str:
+        # Chave do cache de respostas: sem rodadas anteriores é só o prompt do sistema (as
+        # mesmas entradas de antes); com contexto, a resposta depende de toda a conversa
+        if len(messages) <= 2:
+            return self.system_prompt
+        return json.dumps(messages[:-1], ensure_ascii=False, sort_keys=True)
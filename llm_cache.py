@@ -0,0 +1,180 @@
+# Cache de respostas do LLM.
+#
+# Perguntas que se repetem ("bom dia", perguntas frequentes) são respondidas sem a
+# chamada remota. A chave é (modelo, prompt de sistema, texto normalizado); cada
+# entrada tem seu próprio TTL, a memória é limitada por bytes com remoção LRU e o
+# conteúdo pode ser persistido em disco (SQLite) para sobreviver a reinícios.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from text_utils import normalize_query
+
+DEFAULT_TTL = 24 * 3600.0
+SHORT_TTL = 60.0
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+# Perguntas cuja resposta muda com o tempo ficam pouco no cache
+_TIME_SENSITIVE = {"hora", "horas", "hoje", "agora", "amanha", "ontem", "data", "clima", "previsao", "noticias"}
+
+
+def default_ttl_for(text: str) -> float:
+    words = set(normalize_query(text).split())
+    return SHORT_TTL if words & _TIME_SENSITIVE else DEFAULT_TTL
+
+
+def is_cacheable_response(response: Optional[str]) -> bool:
+    # Mensagens de erro (que as implementações devolvem como texto) nunca são guardadas
+    return bool(response) and not response.startswith(("Erro", "❌", "⚠️"))
+
+
+@dataclass
+class _Entry:
+    response: str
+    expires_at: float
+    size: int
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl_for: Callable[[str], float] = default_ttl_for,
+                 path: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.max_bytes = max_bytes
+        self._ttl_for = ttl_for
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._open(path)
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(
+            max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024),
+            path=os.getenv("LLM_CACHE_PATH") or None,
+        )
+
+    @staticmethod
+    def key(model: str, system_prompt: str, text: str) -> str:
+        raw = "\0".join((model or "", system_prompt or "", normalize_query(text)))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _open(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, expires_at REAL, last_used REAL)"
+        )
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (self._clock(),))
+        self._db.commit()
+        # Recarrega as entradas mais usadas recentemente, dentro do limite de memória
+        rows = self._db.execute("SELECT key, response, expires_at FROM responses ORDER BY last_used DESC").fetchall()
+        for key, response, expires_at in reversed(rows):
+            self._store(key, response, expires_at)
+        self._db.commit()
+
+    def _store(self, key: str, response: str, expires_at: float) -> None:
+        evicted_keys = []
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        size = len(key) + len(response.encode("utf-8"))
+        self._entries[key] = _Entry(response, expires_at, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+            evicted_keys.append(evicted_key)
+        if self._db is not None and evicted_keys:
+            # O arquivo em disco segue o mesmo limite da memória
+            self._db.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in evicted_keys])
+
+    def get(self, model: str, system_prompt: str, text: str) -> Optional[str]:
+        key = self.key(model, system_prompt, text)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                if entry is not None:
+                    del self._entries[key]
+                    self._bytes -= entry.size
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if self._db is not None:
+                self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            return entry.response
+
+    def put(self, model: str, system_prompt: str, text: str, response: str, ttl: Optional[float] = None) -> None:
+        key = self.key(model, system_prompt, text)
+        now = self._clock()
+        expires_at = now + (ttl if ttl is not None else self._ttl_for(text))
+        with self._lock:
+            self._store(key, response, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, response, expires_at, now),
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class CachedIntelligence:
+    """Implementa o protocolo Intelligence consultando o cache antes do modelo remoto."""
+
+    def __init__(self, inner, cache: ResponseCache, model: Optional[str] = None, system_prompt: Optional[str] = None):
+        self._inner = inner
+        self._cache = cache
+        self._model = model if model is not None else getattr(inner, "model", "")
+        self._system_prompt = system_prompt if system_prompt is not None else getattr(inner, "system_prompt", "")
+
+    @property
+    def cache(self) -> ResponseCache:
+        return self._cache
+
+    def process(self, text: str) -> str:
+        # Com contexto de conversa, a chave inclui as rodadas anteriores (cache_prefix)
+        # e a resposta vinda do cache também entra no histórico (remember)
+        contextual = hasattr(type(self._inner), "cache_prefix")
+        prefix = self._inner.cache_prefix(text) if contextual else self._system_prompt
+        cached = self._cache.get(self._model, prefix, text)
+        if cached is not None:
+            if contextual:
+                self._inner.remember(text, cached)
+            return cached
+        response = self._inner.process(text)
+        if is_cacheable_response(response):
+            self._cache.put(self._model, prefix, text, response)
+        return response
@@ -0,0 +1,190 @@
+# Clientes HTTP persistentes para os backends de LLM compatíveis com a API da OpenAI.
+#
+# Um único cliente por (base_url, chave) é reutilizado entre chamadas e tentativas,
+# com pool de conexões keep-alive, HTTP/2 opcional e limites configuráveis. Assim
+# cada requisição não paga um novo handshake TCP + TLS.
+#
+# As requisições que podem ser canceladas no meio (cópias "hedged" do roteador) usam
+# clientes assíncronos num laço asyncio de fundo: cancelar a tarefa fecha a conexão.
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from dataclasses import dataclass
+from typing import Awaitable, Dict, Optional, Tuple
+
+HF_ROUTER_URL = "https://router.huggingface.co/v1"
+OPENAI_URL = "https://api.openai.com/v1"
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "sim", "on"}
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    timeout: float = 30.0
+    connect_timeout: float = 5.0
+    max_connections: int = 20
+    max_keepalive: int = 10
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+
+    @classmethod
+    def from_env(cls) -> "ClientConfig":
+        return cls(
+            timeout=float(os.getenv("LLM_TIMEOUT", cls.timeout)),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", cls.connect_timeout)),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", cls.max_connections)),
+            max_keepalive=int(os.getenv("LLM_MAX_KEEPALIVE", cls.max_keepalive)),
+            keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", cls.keepalive_expiry)),
+            http2=_env_bool("LLM_HTTP2", cls.http2),
+        )
+
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, str], object] = {}
+_http_clients: Dict[Tuple[str, str], object] = {}
+_async_clients: Dict[Tuple[str, str], object] = {}
+_async_http_clients: Dict[Tuple[str, str], object] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2
+        return True
+    except ImportError:
+        return False
+
+
+def _build_http_client(config: ClientConfig, asynchronous: bool = False):
+    import httpx
+
+    http2 = config.http2
+    if http2 and not _http2_available():
+        print("[LLM] HTTP/2 solicitado, mas o pacote 'h2' não está instalado. Usando HTTP/1.1.")
+        http2 = False
+
+    client_class = httpx.AsyncClient if asynchronous else httpx.Client
+    return client_class(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+    )
+
+
+def get_client(api_key: str, base_url: str = OPENAI_URL, config: Optional[ClientConfig] = None):
+    key = (base_url, api_key)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            import openai
+
+            config = config or ClientConfig.from_env()
+            http_client = _build_http_client(config)
+            client = openai.OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                timeout=config.timeout,
+                # Novas tentativas ficam com resilience.py e com o roteador (llm_router.py)
+                max_retries=0,
+                http_client=http_client,
+            )
+            _http_clients[key] = http_client
+            _clients[key] = client
+    return client
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    # Laço asyncio numa thread própria, compartilhado pelas requisições canceláveis
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-async", daemon=True).start()
+        return _loop
+
+
+def run_async(coroutine: Awaitable) -> concurrent.futures.Future:
+    # Agenda no laço de fundo; future.cancel() cancela a tarefa (e fecha a conexão dela)
+    return asyncio.run_coroutine_threadsafe(coroutine, background_loop())
+
+
+def get_async_client(api_key: str, base_url: str = OPENAI_URL, config: Optional[ClientConfig] = None):
+    # Cliente openai.AsyncOpenAI; só deve ser usado dentro do laço de background_loop()
+    key = (base_url, api_key)
+    client = _async_clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None:
+            import openai
+
+            config = config or ClientConfig.from_env()
+            http_client = _build_http_client(config, asynchronous=True)
+            client = openai.AsyncOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                timeout=config.timeout,
+                max_retries=0,
+                http_client=http_client,
+            )
+            _async_http_clients[key] = http_client
+            _async_clients[key] = client
+    return client
+
+
+def prewarm(api_key: str, base_url: str = OPENAI_URL, config: Optional[ClientConfig] = None) -> bool:
+    # Abre a conexão (DNS + TCP + TLS) antes da primeira pergunta do usuário;
+    # ela fica no pool keep-alive para a próxima requisição.
+    get_client(api_key, base_url, config)
+    http_client = _http_clients.get((base_url, api_key))
+    if http_client is None:
+        return False
+    try:
+        http_client.head(base_url.rstrip("/") + "/models", headers={"Authorization": f"Bearer {api_key}"})
+        return True
+    except Exception as e:
+        print(f"[LLM] Não foi possível pré-aquecer a conexão com {base_url}: {e}")
+        return False
+
+
+def prewarm_async(api_key: str, base_url: str = OPENAI_URL, config: Optional[ClientConfig] = None) -> threading.Thread:
+    thread = threading.Thread(target=prewarm, args=(api_key, base_url, config), name="llm-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def close_clients() -> None:
+    with _lock:
+        for http_client in _http_clients.values():
+            try:
+                http_client.close()
+            except Exception:
+                pass
+        _http_clients.clear()
+        _clients.clear()
+        async_http_clients = list(_async_http_clients.values())
+        _async_http_clients.clear()
+        _async_clients.clear()
+    # Os clientes assíncronos são fechados no laço em que foram usados
+    for http_client in async_http_clients:
+        try:
+            run_async(http_client.aclose()).result(timeout=5)
+        except Exception:
+            pass
@@ -0,0 +1,484 @@
+# Roteamento entre vários backends de LLM compatíveis com a API da OpenAI.
+#
+# Cada backend (roteador da Hugging Face, OpenAI, um servidor local...) tem a sua
+# latência acompanhada (média móvel e janela para percentis) separadamente por modo:
+# em streaming, o tempo até o primeiro token; sem streaming, o da resposta inteira.
+# Também tem a sua taxa de erro e um disjuntor próprio. Cada pergunta vai para o
+# backend saudável mais rápido naquele modo; se ele falhar antes de responder, o
+# próximo assume na hora.
+#
+# Com requisições "hedged" (LLM_HEDGE=true), se o backend escolhido não responder
+# dentro do percentil LLM_HEDGE_QUANTILE da sua latência, uma cópia da requisição
+# vai para o segundo colocado. Fica a resposta que chegar primeiro; a outra é
+# cancelada na hora, com a conexão fechada (as cópias rodam em clientes assíncronos
+# no laço de fundo de llm_client). Assim um provedor degradado não estica o p99.
+
+import asyncio
+import concurrent.futures
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from llm_client import HF_ROUTER_URL, OPENAI_URL, get_async_client, get_client, run_async
+from resilience import CLIENT, CircuitBreaker, CircuitOpen, classify_error
+
+# Backends conhecidos: (URL, variável com a chave, modelo padrão)
+KNOWN_BACKENDS = {
+    "hf": (HF_ROUTER_URL, "HF_TOKEN", "zai-org/GLM-4.7-Flash"),
+    "openai": (OPENAI_URL, "OPENAI_API_KEY", "gpt-3.5-turbo"),
+}
+PLACEHOLDER_KEYS = {"seu_token_hf_aqui", "sua_chave_api_aqui"}
+ERROR_PENALTY = 4.0  # peso da taxa de erro na pontuação (latência * (1 + peso * taxa))
+
+# Modos medidos separadamente
+STREAM = "stream"      # tempo até o primeiro token
+COMPLETE = "complete"  # tempo da resposta inteira
+MODES = (STREAM, COMPLETE)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "sim", "on"}
+
+
+@dataclass(frozen=True)
+class Backend:
+    name: str
+    base_url: str
+    api_key: str
+    model: str
+
+
+def backends_from_env(default: Sequence[str] = ("hf", "openai")) -> List[Backend]:
+    # LLM_BACKENDS=hf,openai,local; para cada nome: LLM_<NOME>_URL, LLM_<NOME>_MODEL e
+    # LLM_<NOME>_API_KEY (os conhecidos também leem HF_TOKEN / OPENAI_API_KEY)
+    names = [n.strip().lower() for n in os.getenv("LLM_BACKENDS", ",".join(default)).split(",") if n.strip()]
+    backends = []
+    for name in names:
+        prefix = f"LLM_{name.upper()}_"
+        url, key_env, model = KNOWN_BACKENDS.get(name, (None, None, None))
+        url = os.getenv(prefix + "URL", url)
+        model = os.getenv(prefix + "MODEL", model)
+        key = os.getenv(prefix + "API_KEY") or (os.getenv(key_env) if key_env else "local")
+        if not url or not model:
+            print(f"[LLM] Backend '{name}' ignorado: defina {prefix}URL e {prefix}MODEL.")
+            continue
+        if not key or key in PLACEHOLDER_KEYS:
+            continue
+        backends.append(Backend(name, url, key, model))
+    return backends
+
+
+class LatencyStats:
+    """Média móvel e janela recente (para percentis) de uma medida de latência."""
+
+    def __init__(self, window: int = 100, alpha: float = 0.2):
+        self._alpha = alpha
+        self._samples: deque = deque(maxlen=window)
+        self.mean: Optional[float] = None
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.mean = seconds if self.mean is None else self.mean + self._alpha * (seconds - self.mean)
+
+    def percentile(self, q: float) -> Optional[float]:
+        samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class BackendState:
+    """Latência (por modo), taxa de erro e disjuntor de um backend."""
+
+    def __init__(self, backend: Backend, breaker: CircuitBreaker, window: int = 100, alpha: float = 0.2):
+        self.backend = backend
+        self.breaker = breaker
+        self._alpha = alpha
+        self._latency = {mode: LatencyStats(window, alpha) for mode in MODES}
+        self._lock = threading.Lock()
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+        self.wins = 0
+
+    def record_success(self, seconds: float, mode: str) -> None:
+        with self._lock:
+            self.requests += 1
+            self._latency[mode].add(seconds)
+            self.error_rate *= 1 - self._alpha
+        self.breaker.record_success()
+
+    def record_failure(self, error: BaseException) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+            self.error_rate += self._alpha * (1 - self.error_rate)
+        # Requisição inválida (4xx) é problema da pergunta, não do backend
+        if classify_error(error) == CLIENT:
+            self.breaker.release_probe()
+        else:
+            self.breaker.record_failure()
+
+    def record_hedge(self) -> None:
+        with self._lock:
+            self.hedges += 1
+
+    def record_win(self) -> None:
+        with self._lock:
+            self.wins += 1
+
+    def latency(self, mode: str) -> Optional[float]:
+        with self._lock:
+            return self._latency[mode].mean
+
+    def percentile(self, q: float, mode: str) -> Optional[float]:
+        with self._lock:
+            return self._latency[mode].percentile(q)
+
+    def samples(self, mode: str) -> int:
+        with self._lock:
+            return len(self._latency[mode])
+
+    def score(self, mode: str) -> float:
+        # Backend ainda sem medidas no modo vem primeiro, para ser medido
+        with self._lock:
+            latency = self._latency[mode].mean
+            if latency is None:
+                return 0.0
+            return latency * (1 + ERROR_PENALTY * self.error_rate)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "model": self.backend.model,
+                "state": self.breaker.state,
+                "latency": {mode: stats.mean for mode, stats in self._latency.items()},
+                "p95": {mode: stats.percentile(0.95) for mode, stats in self._latency.items()},
+                "error_rate": self.error_rate,
+                "requests": self.requests,
+                "errors": self.errors,
+                "hedges": self.hedges,
+                "wins": self.wins,
+            }
+
+
+def _deltas(stream) -> Iterator[str]:
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+async def _async_deltas(stream):
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+async def _next_delta(deltas, default: str = ""):
+    try:
+        return await deltas.__anext__()
+    except StopAsyncIteration:
+        return default
+
+
+class _BackgroundStream:
+    """Restante de uma resposta em streaming lida no laço de fundo, vista como iterador síncrono."""
+
+    _END = object()
+
+    def __init__(self, deltas, response):
+        self._deltas = deltas
+        self._response = response
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            delta = run_async(_next_delta(self._deltas, self._END)).result()
+            if delta is self._END:
+                return
+            yield delta
+
+    def close(self) -> None:
+        try:
+            run_async(self._response.close()).result(timeout=5)
+        except Exception:
+            pass
+
+
+class LLMRouter:
+    def __init__(self, backends: Sequence[Backend], hedge: bool = False, hedge_quantile: float = 0.95,
+                 hedge_delay: float = 2.0, min_hedge_delay: float = 0.05, min_samples: int = 10,
+                 explore: float = 0.05, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 client_factory: Callable = get_client, async_client_factory: Callable = get_async_client,
+                 rng: Optional[random.Random] = None, clock: Callable[[], float] = time.perf_counter,
+                 on_retry: Optional[Callable[[str, BaseException], None]] = None):
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.explore = explore
+        self._client_factory = client_factory
+        # Clientes das requisições hedged: rodam no laço de fundo e podem ser canceladas
+        self._async_client_factory = async_client_factory
+        self._rng = rng or random.Random()
+        self._clock = clock
+        # Chamado com (nome do backend, erro) quando um backend falha e a pergunta segue para outro
+        self._on_retry = on_retry
+        self._states = [
+            BackendState(b, CircuitBreaker(f"LLM {b.name}", failure_threshold, reset_timeout))
+            for b in backends
+        ]
+
+    @classmethod
+    def from_env(cls, default: Sequence[str] = ("hf", "openai"), **kwargs) -> "LLMRouter":
+        return cls(
+            backends_from_env(default),
+            hedge=_env_bool("LLM_HEDGE", False),
+            hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+            hedge_delay=float(os.getenv("LLM_HEDGE_DELAY", "2.0")),
+            **kwargs,
+        )
+
+    @property
+    def backends(self) -> List[Backend]:
+        return [s.backend for s in self._states]
+
+    @property
+    def model(self) -> str:
+        # Chave do cache de respostas: o conjunto de modelos que pode responder
+        return "+".join(s.backend.model for s in self._states)
+
+    def __bool__(self) -> bool:
+        return bool(self._states)
+
+    def state(self, name: str) -> BackendState:
+        return next(s for s in self._states if s.backend.name == name)
+
+    def ranked(self, mode: str = STREAM) -> List[BackendState]:
+        # Saudáveis do mais rápido ao mais lento; de vez em quando um outro vai na frente,
+        # para as medidas dos demais não envelhecerem
+        states = [s for s in self._states if s.breaker.state != CircuitBreaker.OPEN]
+        states.sort(key=lambda s: s.score(mode))
+        if len(states) > 1 and self._rng.random() < self.explore:
+            states.insert(0, states.pop(self._rng.randrange(1, len(states))))
+        return states
+
+    def _admitted(self, mode: str) -> Iterator[BackendState]:
+        admitted = False
+        for state in self.ranked(mode):
+            try:
+                state.breaker.before_call()
+            except CircuitOpen:
+                continue
+            admitted = True
+            yield state
+        if not admitted:
+            raise CircuitOpen("IA", min((s.breaker.reset_timeout for s in self._states), default=0.0))
+
+    def hedge_after(self, state: BackendState, mode: str) -> float:
+        # Espera antes da cópia: percentil da latência do backend no modo (padrão enquanto há poucas medidas)
+        if state.samples(mode) < self.min_samples:
+            return self.hedge_delay
+        return max(self.min_hedge_delay, state.percentile(self.hedge_quantile, mode))
+
+    def _open(self, state: BackendState, messages: List[dict], mode: str):
+        # Faz a requisição até o primeiro pedaço de texto: (primeiro, restante, resposta)
+        backend = state.backend
+        started = self._clock()
+        try:
+            client = self._client_factory(backend.api_key, backend.base_url)
+            response = client.chat.completions.create(model=backend.model, messages=messages,
+                                                      stream=mode == STREAM)
+            if mode == STREAM:
+                rest = _deltas(response)
+                first = next(rest, "")
+            else:
+                first, rest = response.choices[0].message.content or "", iter(())
+        except Exception as e:
+            state.record_failure(e)
+            _tag(e, backend.name)
+            raise
+        state.record_success(self._clock() - started, mode)
+        return first, rest, response
+
+    async def _open_async(self, state: BackendState, messages: List[dict], mode: str,
+                          release_probe: Callable[[], None]):
+        # Mesmo que _open, no laço de fundo: cancelar a tarefa aborta a requisição
+        backend = state.backend
+        started = self._clock()
+        response = None
+        try:
+            client = self._async_client_factory(backend.api_key, backend.base_url)
+            response = await client.chat.completions.create(model=backend.model, messages=messages,
+                                                            stream=mode == STREAM)
+            if mode == STREAM:
+                rest = _async_deltas(response)
+                first = await _next_delta(rest)
+            else:
+                first, rest = response.choices[0].message.content or "", None
+        except asyncio.CancelledError:
+            # Perdeu a corrida: não é sucesso nem falha do backend
+            release_probe()
+            if mode == STREAM and response is not None:
+                await response.close()
+            raise
+        except Exception as e:
+            state.record_failure(e)
+            _tag(e, backend.name)
+            raise
+        state.record_success(self._clock() - started, mode)
+        return first, rest, response
+
+    def _retrying(self, state: BackendState, error: BaseException) -> None:
+        if self._on_retry is not None:
+            self._on_retry(state.backend.name, error)
+
+    def _sequential(self, messages: List[dict], mode: str):
+        failed, last_error = None, None
+        for state in self._admitted(mode):
+            if failed is not None:
+                self._retrying(failed, last_error)
+            try:
+                return state, self._open(state, messages, mode)
+            except Exception as e:
+                print(f"[LLM] {state.backend.name} falhou: {e}")
+                failed, last_error = state, e
+        raise last_error
+
+    def _hedged(self, messages: List[dict], mode: str):
+        candidates = self._admitted(mode)
+        running: Dict[concurrent.futures.Future, Tuple[BackendState, "_ProbeRelease"]] = {}
+
+        def launch(hedge=False) -> Optional[BackendState]:
+            state = next(candidates, None)
+            if state is not None:
+                if hedge:
+                    state.record_hedge()
+                release = _ProbeRelease(state.breaker)
+                running[run_async(self._open_async(state, messages, mode, release))] = (state, release)
+            return state
+
+        primary = launch()
+        last_error = None
+        wait: Optional[float] = self.hedge_after(primary, mode)
+        try:
+            while running:
+                done, _ = concurrent.futures.wait(running, timeout=wait,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+                if not done:
+                    # O primeiro está demorando mais que o normal: manda uma cópia ao próximo
+                    wait = None
+                    launch(hedge=True)
+                    continue
+                for future in done:
+                    state, _ = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        return state, _synchronous(future.result())
+                    print(f"[LLM] {state.backend.name} falhou: {error}")
+                    last_error = error
+                    if launch() is not None:
+                        self._retrying(state, error)
+            raise last_error
+        finally:
+            # A perdedora é cancelada (a conexão é fechada); se já tinha respondido, é descartada
+            for future, (_, release) in running.items():
+                if future.cancel():
+                    # Cancelada antes de começar, a tarefa nem chega ao próprio except: o teste
+                    # do disjuntor (meio-aberto) que ela ocupava é liberado aqui
+                    release()
+                elif not future.exception():
+                    _, rest, response = future.result()
+                    if rest is not None:
+                        _BackgroundStream(rest, response).close()
+
+    def _route(self, messages: List[dict], mode: str):
+        if self.hedge and len(self._states) > 1:
+            return self._hedged(messages, mode)
+        return self._sequential(messages, mode)
+
+    def _generate(self, messages: List[dict], mode: str) -> Iterator[str]:
+        state, (first, rest, response) = self._route(messages, mode)
+        state.record_win()
+        try:
+            if first:
+                yield first
+            for delta in rest:
+                yield delta
+        except GeneratorExit:
+            _close(response)
+            raise
+        except Exception as e:
+            # Falha no meio da resposta também conta contra o backend
+            state.record_failure(e)
+            raise
+
+    def stream(self, messages: List[dict]) -> Iterator[str]:
+        # Pedaços da resposta conforme chegam (stream=True)
+        return self._generate(messages, STREAM)
+
+    def complete(self, messages: List[dict]) -> str:
+        return "".join(self._generate(messages, COMPLETE))
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        return {s.backend.name: s.stats() for s in self._states}
+
+
+class _ProbeRelease:
+    """Libera uma única vez o teste do disjuntor de uma requisição hedged cancelada."""
+
+    def __init__(self, breaker: CircuitBreaker):
+        self._breaker = breaker
+        self._lock = threading.Lock()
+        self._released = False
+
+    def __call__(self) -> None:
+        # Chamado pela tarefa (se chegou a começar) e por quem a cancelou: vale o primeiro
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._breaker.release_probe()
+
+
+def _synchronous(opened):
+    # Resultado de _open_async no formato de _open: (primeiro, restante, resposta)
+    first, rest, response = opened
+    if rest is None:
+        return first, iter(()), response
+    stream = _BackgroundStream(rest, response)
+    return first, iter(stream), stream
+
+
+def _tag(error: BaseException, backend: str) -> None:
+    # Nome do backend no erro, para quem trata a falha fora do roteador (métricas, logs)
+    try:
+        error.llm_backend = backend
+    except AttributeError:
+        pass
+
+
+def _close(response) -> None:
+    close = getattr(response, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
@@ -0,0 +1,263 @@
+# Métricas do serviço no formato de texto do Prometheus.
+#
+# Contadores, gauges e histogramas simples, sem dependência externa, expostos pela
+# rota /metrics do app.py. Com as métricas desativadas (METRICS_ENABLED=false) cada
+# chamada retorna logo na primeira linha, sem lock nem alocação.
+#
+# A rota só responde à própria máquina: o link público do Gradio (share=True) chega
+# por um túnel local, então pedidos encaminhados ou para outro host são recusados.
+# Para coletar de fora, defina METRICS_TOKEN e envie "Authorization: Bearer <token>".
+
+import hmac
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from stage_timing import recorder
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Limites dos histogramas de latência (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _env_enabled() -> bool:
+    return os.getenv("METRICS_ENABLED", "true").strip().lower() in {"1", "true", "yes", "sim", "on"}
+
+
+LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+FORWARDING_HEADERS = ("forwarded", "x-forwarded-for", "x-forwarded-host", "x-real-ip")
+
+
+def _hostname(host: str) -> str:
+    # "127.0.0.1:7860" -> "127.0.0.1"; "[::1]:7860" -> "::1"
+    if host.startswith("["):
+        return host[1:].split("]", 1)[0]
+    return host.rsplit(":", 1)[0]
+
+
+def is_local_request(request) -> bool:
+    # Cliente na própria máquina, pedindo pelo endereço local e sem passar por proxy
+    client = request.client.host if request.client is not None else ""
+    if client not in LOCAL_HOSTS or any(h in request.headers for h in FORWARDING_HEADERS):
+        return False
+    return _hostname(request.headers.get("host", "")) in LOCAL_HOSTS
+
+
+def is_authorized(request, token: Optional[str] = None) -> bool:
+    if token and hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        return True
+    return is_local_request(request)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labelnames: Iterable[str] = ()):
+        self._registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"] + self.samples()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not self._registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        # Conta as requisições em andamento enquanto o bloco executa
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, registry, name, help, labelnames=(), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not self._registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*s[0]], s[1], s[2])) for key, s in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Valores lidos na hora da coleta (ex.: acertos de cache, tamanho de fila)."""
+
+    def __init__(self, registry, name, help, type: str, labelnames=(),
+                 collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]] = lambda: ()):
+        super().__init__(registry, name, help, labelnames)
+        self.type = type
+        self._collect = collect
+
+    def samples(self) -> List[str]:
+        try:
+            items = list(self._collect())
+        except Exception as e:
+            print(f"[Métricas] Falha ao coletar {self.name}: {e}")
+            return []
+        return [f"{self.name}{_format_labels(self.labelnames, self._key(labels))} {_format_value(value)}"
+                for labels, value in items]
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: Optional[bool] = None):
+        # None: METRICS_ENABLED é lido no primeiro uso, depois do .env carregado
+        self._enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        if self._enabled is None:
+            self._enabled = _env_enabled()
+        return self._enabled
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Registrar de novo o mesmo nome substitui a métrica (útil ao recarregar módulos)
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(self, name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._add(Gauge(self, name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self, name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, type: str, labelnames: Iterable[str],
+                 collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]) -> CallbackMetric:
+        return self._add(CallbackMetric(self, name, help, type, labelnames, collect))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def route(self, path: str = "/metrics", token: Optional[str] = None):
+        # Rota Starlette para ser adicionada ao servidor do Gradio (FastAPI)
+        from starlette.responses import Response
+        from starlette.routing import Route
+
+        def endpoint(request):
+            if not is_authorized(request, token):
+                return Response("Acesso negado.\n", status_code=403, media_type=CONTENT_TYPE)
+            return Response(self.render(), media_type=CONTENT_TYPE)
+
+        return Route(path, endpoint, methods=["GET"])
+
+
+# Métricas padrão do pipeline
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "assistente_stage_seconds", "Duração de cada etapa do turno (decode, transcribe, route, llm, tts).", ["stage"])
+LLM_RETRIES = registry.counter("assistente_llm_retries_total", "Novas tentativas de chamada ao LLM.", ["backend"])
+ERRORS = registry.counter("assistente_errors_total", "Erros por etapa.", ["stage"])
+IN_FLIGHT = registry.gauge("assistente_requests_in_flight", "Requisições em andamento.", ["handler"])
+SILENT_CLIPS = registry.counter("assistente_silent_clips_total", "Áudios sem fala respondidos sem chamar o Whisper.")
+
+
+def _observe_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=name)
+
+
+recorder.add_listener(_observe_stage)
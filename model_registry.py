@@ -0,0 +1,313 @@
+# Registro de modelos Whisper compartilhado entre requisições.
+#
+# Carrega cada tamanho de modelo uma única vez (protegido por lock), executa uma
+# inferência de aquecimento com um clipe sintético e informa quando está pronto,
+# para que a primeira requisição real já rode na latência normal.
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from audio_utils import WHISPER_SAMPLE_RATE
+
+DEFAULT_MODEL_SIZE = "base"
+
+# Quantização opcional: "base-int8" (ou WHISPER_QUANTIZE=int8) usa int8 dinâmico nas camadas lineares
+QUANTIZATIONS = ("int8",)
+
+
+def parse_model_spec(spec: str) -> Tuple[str, Optional[str]]:
+    # "base-int8" -> ("base", "int8"); "large-v3" -> ("large-v3", None)
+    size, _, suffix = spec.rpartition("-")
+    if size and suffix in QUANTIZATIONS:
+        return size, suffix
+    return spec, None
+
+
+def model_spec(model_size: str, quantize: Optional[str] = None) -> str:
+    # Aplica WHISPER_QUANTIZE quando o nome ainda não indica a quantização
+    quantize = quantize if quantize is not None else os.getenv("WHISPER_QUANTIZE", "").strip().lower()
+    size, current = parse_model_spec(model_size)
+    if current is not None or not quantize or quantize == "none":
+        return model_size
+    if quantize not in QUANTIZATIONS:
+        raise ValueError(f"Quantização não suportada: {quantize} (opções: {', '.join(QUANTIZATIONS)})")
+    return f"{size}-{quantize}"
+
+
+def default_model_size() -> str:
+    return model_spec(os.getenv("WHISPER_MODEL", DEFAULT_MODEL_SIZE))
+
+
+# Cópia dos pesos em formato mapeável em memória (torch.load(mmap=True)): o carregamento
+# lê só o cabeçalho e as páginas dos tensores vêm do disco sob demanda, sem cópia completa
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "assistente-virtual", "whisper")
+
+
+def snapshots_enabled() -> bool:
+    return os.getenv("WHISPER_SNAPSHOT", "true").strip().lower() in {"1", "true", "yes", "sim", "on"}
+
+
+def snapshot_path(model_size: str, directory: Optional[str] = None) -> str:
+    directory = directory or os.getenv("WHISPER_SNAPSHOT_DIR") or DEFAULT_SNAPSHOT_DIR
+    return os.path.join(directory, f"{model_size}.pt")
+
+
+def save_snapshot(model, path: str, meta: Dict[str, str]) -> None:
+    import dataclasses
+    import torch
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    # Formato zip do torch.save (requisito do mmap), gravado de forma atômica
+    torch.save({
+        "meta": meta,
+        "dims": dataclasses.asdict(model.dims),
+        "model_state_dict": model.state_dict(),
+    }, tmp)
+    os.replace(tmp, path)
+
+
+def default_device() -> str:
+    # Mesma escolha do whisper.load_model
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def load_snapshot(path: str, meta: Dict[str, str], model_size: Optional[str] = None,
+                  device: Optional[str] = None):
+    import torch
+    import whisper
+    from whisper.model import ModelDimensions, Whisper
+
+    checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    if checkpoint.get("meta") != meta:
+        raise ValueError(f"gerado para {checkpoint.get('meta')}, esperado {meta}")
+    dims = ModelDimensions(**checkpoint["dims"])
+    # Módulos criados sem memória (meta) e tensores do snapshot atribuídos diretamente
+    with torch.device("meta"):
+        model = Whisper(dims)
+    model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+
+    # Buffer não persistente: recriado como no construtor do Whisper
+    heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+    heads[dims.n_text_layer // 2:] = True
+    model.register_buffer("alignment_heads", heads.to_sparse(), persistent=False)
+    alignment = getattr(whisper, "_ALIGNMENT_HEADS", {}).get(model_size)
+    if alignment is not None:
+        model.set_alignment_heads(alignment)
+    # Na CPU os pesos continuam mapeados do arquivo; na GPU são copiados para ela
+    return model.to(device or default_device())
+
+
+def quantize_int8(model):
+    # Quantização dinâmica: pesos das camadas lineares em int8, ativações quantizadas em
+    # tempo de execução. O Whisper usa uma subclasse de nn.Linear (só converte o dtype do
+    # peso), que o quantize_dynamic não reconhece; volta para nn.Linear antes de quantizar.
+    import torch
+    from torch import nn
+
+    for module in model.modules():
+        if isinstance(module, nn.Linear) and type(module) is not nn.Linear:
+            module.__class__ = nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+# Cache do modelo quantizado: só o state_dict (pesos int8 empacotados), lido com
+# weights_only=True. Na carga, a estrutura do Whisper é criada e quantizada de novo e
+# recebe os pesos do cache; nada do arquivo é executado.
+
+def cache_meta(model_size: str, quantize: Optional[str] = None) -> Dict[str, str]:
+    # Versões do torch/whisper e hash do checkpoint original, gravados no snapshot e no
+    # cache quantizado: se algum mudar, o arquivo é refeito
+    import torch
+    import whisper
+
+    url = getattr(whisper, "_MODELS", {}).get(model_size, "")
+    return {
+        "model": model_size,
+        "quantize": quantize or "none",
+        "torch": torch.__version__,
+        "whisper": getattr(whisper, "__version__", ""),
+        "checkpoint": url.rsplit("/", 2)[-2] if url.count("/") >= 2 else "",
+    }
+
+
+def save_quantized(model, path: str, meta: Dict[str, str]) -> None:
+    import dataclasses
+    import torch
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    dims = getattr(model, "dims", None)
+    torch.save({
+        "meta": meta,
+        "dims": dataclasses.asdict(dims) if dims is not None else None,
+        "model_state_dict": model.state_dict(),
+    }, tmp)
+    os.replace(tmp, path)
+
+
+def load_quantized(path: str, meta: Dict[str, str], build: Callable):
+    # build(dims) cria o modelo em ponto flutuante (pesos quaisquer), que é quantizado
+    # e recebe os pesos int8 do cache
+    import torch
+
+    checkpoint = torch.load(path, map_location="cpu", weights_only=True)
+    if checkpoint.get("meta") != meta:
+        raise ValueError(f"gerado para {checkpoint.get('meta')}, esperado {meta}")
+    model = quantize_int8(build(checkpoint["dims"]))
+    model.load_state_dict(checkpoint["model_state_dict"])
+    return model
+
+
+def _build_whisper(model_size: str) -> Callable:
+    def build(dims):
+        import whisper
+        from whisper.model import ModelDimensions, Whisper
+
+        model = Whisper(ModelDimensions(**dims))
+        alignment = getattr(whisper, "_ALIGNMENT_HEADS", {}).get(model_size)
+        if alignment is not None:
+            model.set_alignment_heads(alignment)
+        return model
+    return build
+
+
+def _load_quantized(model_size: str, quantize: str):
+    spec = f"{model_size}-{quantize}"
+    path = snapshot_path(spec)
+    meta = cache_meta(model_size, quantize)
+    if snapshots_enabled() and os.path.exists(path):
+        try:
+            return load_quantized(path, meta, _build_whisper(model_size))
+        except Exception as e:
+            print(f"Cache do modelo quantizado inválido ({e}); quantizando de novo.")
+
+    start = time.perf_counter()
+    model = quantize_int8(_load_whisper(model_size))
+    print(f"Modelo Whisper '{model_size}' quantizado ({quantize}) em {time.perf_counter() - start:.1f}s.")
+    if snapshots_enabled():
+        try:
+            save_quantized(model, path, meta)
+        except Exception as e:
+            print(f"Não foi possível gravar o modelo quantizado: {e}")
+    return model
+
+
+def _load_whisper(model_size: str):
+    model_size, quantize = parse_model_spec(model_size)
+    if quantize is not None:
+        return _load_quantized(model_size, quantize)
+
+    # Usa o snapshot mapeável quando existe; senão (ou se estiver desatualizado) carrega o
+    # checkpoint e grava o snapshot
+    path = snapshot_path(model_size)
+    stale = False
+    if snapshots_enabled() and os.path.exists(path):
+        try:
+            return load_snapshot(path, cache_meta(model_size), model_size)
+        except Exception as e:
+            stale = True
+            print(f"Snapshot do Whisper inválido ({e}); carregando o checkpoint original.")
+
+    import whisper
+    model = whisper.load_model(model_size)
+    if snapshots_enabled() and (stale or not os.path.exists(path)):
+        try:
+            save_snapshot(model, path, cache_meta(model_size))
+        except Exception as e:
+            print(f"Não foi possível gravar o snapshot do Whisper: {e}")
+    return model
+
+
+def warm_up(model, language: str = "pt", seconds: float = 1.0) -> None:
+    # Ruído baixo em vez de silêncio puro: percorre o encoder e o decoder como uma fala real
+    rng = np.random.default_rng(0)
+    clip = (rng.standard_normal(int(seconds * WHISPER_SAMPLE_RATE)) * 0.01).astype(np.float32)
+    model.transcribe(clip, language=language, fp16=False)
+
+
+class WhisperModelRegistry:
+    def __init__(self, model_size: Optional[str] = None, language: str = "pt",
+                 loader: Callable = _load_whisper, warmup: bool = True):
+        self.model_size = model_size or default_model_size()
+        self._language = language
+        self._loader = loader
+        self._warmup = warmup
+        self._lock = threading.Lock()
+        self._size_locks: Dict[str, threading.Lock] = {}
+        self._models: Dict[str, object] = {}
+        self._errors: Dict[str, str] = {}
+        self._load_times: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def _size_lock(self, model_size: str) -> threading.Lock:
+        with self._lock:
+            return self._size_locks.setdefault(model_size, threading.Lock())
+
+    def get(self, model_size: Optional[str] = None):
+        model_size = model_size or self.model_size
+        model = self._models.get(model_size)
+        if model is not None:
+            return model
+
+        # Apenas uma thread carrega; as demais esperam pelo mesmo modelo
+        with self._size_lock(model_size):
+            model = self._models.get(model_size)
+            if model is not None:
+                return model
+
+            print(f"Carregando modelo Whisper '{model_size}' (Local e Gratuito)...")
+            start = time.perf_counter()
+            try:
+                model = self._loader(model_size)
+                if self._warmup:
+                    warm_up(model, self._language)
+            except Exception as e:
+                self._errors[model_size] = str(e)
+                raise
+            self._load_times[model_size] = time.perf_counter() - start
+            self._errors.pop(model_size, None)
+            self._models[model_size] = model
+            print(f"Modelo Whisper '{model_size}' pronto em {self._load_times[model_size]:.1f}s.")
+            return model
+
+    def start(self, model_size: Optional[str] = None) -> threading.Thread:
+        # Carregamento antecipado em segundo plano; requisições que chegarem antes esperam no lock
+        def _run():
+            try:
+                self.get(model_size)
+            except Exception as e:
+                print(f"Erro ao carregar modelo Whisper: {e}")
+
+        self._thread = threading.Thread(target=_run, name="whisper-loader", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.is_ready()
+
+    def is_ready(self, model_size: Optional[str] = None) -> bool:
+        return (model_size or self.model_size) in self._models
+
+    def status(self) -> Dict[str, object]:
+        size = self.model_size
+        if size in self._models:
+            state = "pronto"
+        elif size in self._errors:
+            state = "erro"
+        else:
+            state = "carregando"
+        return {
+            "model": size,
+            "state": state,
+            "load_seconds": self._load_times.get(size),
+            "error": self._errors.get(size),
+        }
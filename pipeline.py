@@ -0,0 +1,132 @@
+# Orquestrador da conversa em estágios assíncronos.
+#
+# Ouvir, responder (comandos locais / IA) e falar rodam como tarefas asyncio
+# independentes, ligadas por filas limitadas. Enquanto uma resposta é gerada e
+# falada, o microfone já captura a próxima fala; quando as filas enchem, o estágio
+# anterior espera (backpressure). As implementações de STT, TTS e IA continuam
+# síncronas e rodam em threads, sem mudança nos protocolos.
+
+import asyncio
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+EXIT_WORDS = {"sair", "encerrar", "exit", "tchau"}
+
+# Marca o fim da conversa ao passar de um estágio para o outro
+_STOP = object()
+
+
+def _run_in_thread(func: Callable, *args) -> "asyncio.Future":
+    # Thread daemon em vez do executor padrão: uma chamada bloqueada (input(),
+    # microfone) não impede o encerramento do programa depois do cancelamento
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _set(setter, value):
+        if not future.done():
+            setter(value)
+
+    def deliver(setter, value):
+        try:
+            loop.call_soon_threadsafe(_set, setter, value)
+        except RuntimeError:
+            # O loop já terminou (estágio cancelado); o resultado é descartado
+            pass
+
+    def target():
+        try:
+            result = func(*args)
+        except BaseException as e:
+            deliver(future.set_exception, e)
+        else:
+            deliver(future.set_result, result)
+
+    threading.Thread(target=target, name=f"pipeline-{getattr(func, '__name__', 'stage')}", daemon=True).start()
+    return future
+
+
+class ConversationPipeline:
+    """Executa ouvir -> responder -> falar em estágios sobrepostos."""
+
+    def __init__(self, stt, tts, respond: Callable[[Optional[str]], Optional[str]],
+                 greeting: Optional[str] = None, farewell: Optional[str] = "Até logo!",
+                 exit_words: Iterable[str] = EXIT_WORDS, queue_size: int = 2,
+                 skip_empty: bool = True):
+        # respond(texto) devolve o texto a ser falado (ou None para não falar nada)
+        self._stt = stt
+        self._tts = tts
+        self._respond = respond
+        self._greeting = greeting
+        self._farewell = farewell
+        self._exit_words = {w.lower() for w in exit_words}
+        self._queue_size = queue_size
+        self._skip_empty = skip_empty
+        self.turns = 0
+        self.turn_seconds = []
+
+    def run(self) -> None:
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            print("\n[Pipeline] Interrompido.")
+
+    async def run_async(self) -> None:
+        heard: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        replies: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+
+        if self._greeting:
+            await _run_in_thread(self._tts.speak, self._greeting)
+
+        tasks = [
+            asyncio.create_task(self._listen(heard), name="ouvir"),
+            asyncio.create_task(self._think(heard, replies), name="responder"),
+            asyncio.create_task(self._speak(replies), name="falar"),
+        ]
+        try:
+            # A conversa termina quando o estágio de fala recebe o fim; um erro em
+            # qualquer estágio cancela os demais
+            done, _pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _listen(self, heard: asyncio.Queue) -> None:
+        while True:
+            text = await _run_in_thread(self._stt.listen)
+            if not text and self._skip_empty:
+                continue
+            if text and text.lower().strip() in self._exit_words:
+                await heard.put(_STOP)
+                return
+            # Bloqueia aqui se as respostas anteriores ainda não foram consumidas
+            await heard.put((text, time.perf_counter()))
+
+    async def _think(self, heard: asyncio.Queue, replies: asyncio.Queue) -> None:
+        while True:
+            item = await heard.get()
+            if item is _STOP:
+                await replies.put(_STOP)
+                return
+            text, started = item
+            if text:
+                print(f"🎤 Você: {text}")
+            reply = await _run_in_thread(self._respond, text)
+            await replies.put((reply, started))
+
+    async def _speak(self, replies: asyncio.Queue) -> None:
+        while True:
+            item = await replies.get()
+            if item is _STOP:
+                if self._farewell:
+                    await _run_in_thread(self._tts.speak, self._farewell)
+                return
+            reply, started = item
+            if reply:
+                await _run_in_thread(self._tts.speak, reply)
+            self.turns += 1
+            self.turn_seconds.append(time.perf_counter() - started)
@@ -0,0 +1,123 @@
+# Reprodução de áudio em memória, interrompível.
+#
+# O áudio sintetizado é decodificado para PCM em memória e tocado por um stream de
+# saída com callback (sounddevice): nada de arquivo temporário nem de verificar
+# get_busy() a cada 100 ms. Cada reprodução devolve um PlaybackHandle, cujo stop()
+# pode ser chamado por outra thread, por exemplo pelo microfone quando o usuário
+# começa a falar por cima do assistente (barge-in).
+
+import io
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from audio_utils import decode_wav
+
+
+def decode_audio(data: bytes, format: str = "mp3") -> Tuple[np.ndarray, int]:
+    # Retorna (PCM float32 mono, taxa de amostragem)
+    if data[:4] == b"RIFF":
+        return decode_wav(io.BytesIO(data))
+
+    from pydub import AudioSegment
+
+    segment = AudioSegment.from_file(io.BytesIO(data), format=format)
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    if segment.channels > 1:
+        samples = samples.reshape(-1, segment.channels).mean(axis=1)
+    samples /= float(1 << (8 * segment.sample_width - 1))
+    return samples, segment.frame_rate
+
+
+class PlaybackHandle:
+    """Controle de uma reprodução em andamento."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._stream = None
+        self.interrupted = False
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def stop(self) -> None:
+        # Seguro para chamar de qualquer thread; o callback encerra no próximo bloco
+        if not self._done.is_set():
+            self.interrupted = True
+            self._stop.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        # True se a reprodução terminou (até o fim ou interrompida)
+        finished = self._done.wait(timeout)
+        if finished and self._stream is not None:
+            stream, self._stream = self._stream, None
+            stream.close()
+        return finished
+
+    def _finish(self) -> None:
+        self._done.set()
+
+
+class AudioPlayer:
+    """Toca PCM em memória por um stream de saída orientado a eventos."""
+
+    def __init__(self, blocksize: int = 1024):
+        import sounddevice as sd
+        self._sd = sd
+        self._blocksize = blocksize
+        self._lock = threading.Lock()
+        self._current: Optional[PlaybackHandle] = None
+
+    def play(self, pcm: np.ndarray, sample_rate: int) -> PlaybackHandle:
+        pcm = np.asarray(pcm, dtype=np.float32)
+        if pcm.ndim == 1:
+            pcm = pcm.reshape(-1, 1)
+        handle = PlaybackHandle()
+        position = 0
+        sd = self._sd
+
+        def callback(outdata, frames, _time, _status):
+            nonlocal position
+            if handle.stopping:
+                outdata.fill(0)
+                raise sd.CallbackAbort
+            chunk = pcm[position:position + frames]
+            outdata[:len(chunk)] = chunk
+            outdata[len(chunk):] = 0
+            position += len(chunk)
+            if len(chunk) < frames:
+                raise sd.CallbackStop
+
+        with self._lock:
+            if self._current is not None:
+                self._current.stop()
+            self._current = handle
+
+        if len(pcm) == 0:
+            handle._finish()
+            return handle
+
+        stream = sd.OutputStream(
+            samplerate=sample_rate,
+            channels=pcm.shape[1],
+            dtype="float32",
+            blocksize=self._blocksize,
+            callback=callback,
+            finished_callback=handle._finish,
+        )
+        handle._stream = stream
+        stream.start()
+        return handle
+
+    def stop(self) -> None:
+        with self._lock:
+            current = self._current
+        if current is not None:
+            current.stop()
@@ -0,0 +1,255 @@
+# Novas tentativas e disjuntor (circuit breaker) para chamadas a serviços remotos.
+#
+# Os erros são classificados pelo tipo e pelo código HTTP (não pelo texto da mensagem).
+# Só falhas transitórias são repetidas, com espera exponencial limitada e aleatória
+# ("full jitter"), dentro de um tempo total máximo. Depois de várias falhas seguidas o
+# disjuntor abre: as chamadas falham na hora, sem ocupar o servidor com esperas, até
+# que uma chamada de teste (meio-aberto) dê certo.
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Iterator, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+# Classes de erro
+TRANSIENT = "transient"      # timeout, conexão, 5xx: vale repetir
+RATE_LIMITED = "rate_limited"  # 429: repetir com espera
+AUTH = "auth"                # 401/403: repetir não adianta
+CLIENT = "client"            # outros 4xx (requisição inválida)
+UNKNOWN = "unknown"
+
+RETRYABLE = {TRANSIENT, RATE_LIMITED}
+TRANSIENT_STATUS = {408, 425, 500, 502, 503, 504}
+# Nomes das exceções de rede da openai, do httpx e do requests (sem importar as bibliotecas)
+TRANSIENT_TYPES = {
+    "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "TimeoutException", "ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout",
+    "ConnectError", "ReadError", "RemoteProtocolError", "NetworkError",
+    "Timeout", "ConnectionError",
+}
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def classify_error(error: BaseException) -> str:
+    code = status_code(error)
+    if code is not None:
+        if code == 429:
+            return RATE_LIMITED
+        if code in TRANSIENT_STATUS or code >= 500:
+            return TRANSIENT
+        if code in (401, 403):
+            return AUTH
+        if 400 <= code < 500:
+            return CLIENT
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return TRANSIENT
+    if any(cls.__name__ in TRANSIENT_TYPES for cls in type(error).__mro__):
+        return TRANSIENT
+    if any(cls.__name__ == "RateLimitError" for cls in type(error).__mro__):
+        return RATE_LIMITED
+    return UNKNOWN
+
+
+class Backoff:
+    """Espera exponencial com teto e jitter completo: uniforme em [0, min(teto, base * 2^n)]."""
+
+    def __init__(self, base: float = 0.5, cap: float = 8.0, rng: Optional[random.Random] = None):
+        self.base = base
+        self.cap = cap
+        self._rng = rng or random.Random()
+
+    def delay(self, attempt: int) -> float:
+        return self._rng.uniform(0, min(self.cap, self.base * (2 ** attempt)))
+
+
+class CircuitOpen(Exception):
+    """Disjuntor aberto: o serviço remoto está indisponível e a chamada nem foi feita."""
+
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"{name} indisponível; nova tentativa em {retry_in:.0f}s")
+
+
+class CircuitBreaker:
+    CLOSED = "fechado"
+    OPEN = "aberto"
+    HALF_OPEN = "meio-aberto"
+
+    def __init__(self, name: str = "llm", failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_call(self) -> None:
+        # Levanta CircuitOpen se a chamada não deve ser feita agora
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            waited = self._clock() - self._opened_at
+            if self._state == self.OPEN and waited >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            # Meio-aberto: só uma chamada de teste por vez
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpen(self.name, max(0.0, self.reset_timeout - waited))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                    print(f"[Disjuntor] {self.name} aberto após {self._failures} falha(s).")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        # Chamada de teste terminou sem veredito (ex.: erro do cliente, não do serviço)
+        with self._lock:
+            self._probing = False
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 3, backoff: Optional[Backoff] = None,
+                 max_elapsed: float = 15.0, breaker: Optional[CircuitBreaker] = None,
+                 on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+                 passthrough: Tuple[Type[BaseException], ...] = (),
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_attempts = max_attempts
+        self.backoff = backoff or Backoff()
+        self.max_elapsed = max_elapsed
+        self.breaker = breaker
+        self.on_retry = on_retry
+        # Erros que não dizem nada sobre o serviço sobem direto, sem nova tentativa e sem
+        # contar no disjuntor: CircuitOpen de um disjuntor interno (ex.: todos os backends
+        # do roteador fora) e os passados por quem chama (ex.: recusa da admissão local)
+        self.passthrough = (CircuitOpen,) + tuple(passthrough)
+        self._clock = clock
+
+    @classmethod
+    def from_env(cls, name: str = "llm", **kwargs) -> "RetryPolicy":
+        breaker = CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+        )
+        return cls(
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "3")),
+            backoff=Backoff(float(os.getenv("LLM_BACKOFF_BASE", "0.5")), float(os.getenv("LLM_BACKOFF_CAP", "8"))),
+            max_elapsed=float(os.getenv("LLM_RETRY_BUDGET", "15")),
+            breaker=breaker,
+            **kwargs,
+        )
+
+    def now(self) -> float:
+        return self._clock()
+
+    def attempts(self) -> Iterator[int]:
+        # Números das tentativas; o disjuntor é consultado antes de cada uma
+        for attempt in range(self.max_attempts):
+            if self.breaker is not None:
+                self.breaker.before_call()
+            yield attempt
+
+    def record_success(self) -> None:
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def record_failure(self, error: BaseException) -> str:
+        # Erros do cliente (auth, 4xx) não dizem nada sobre a saúde do serviço
+        kind = classify_error(error)
+        if self.breaker is not None:
+            if kind in RETRYABLE or kind == UNKNOWN:
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_probe()
+        return kind
+
+    def abandon(self) -> None:
+        # Tentativa cancelada por quem chamou (ex.: streaming interrompido pelo usuário)
+        if self.breaker is not None:
+            self.breaker.release_probe()
+
+    def next_delay(self, attempt: int, error: BaseException, started: float) -> Optional[float]:
+        # Registra a falha e devolve a espera até a próxima tentativa (None: desistir)
+        kind = self.record_failure(error)
+        if kind not in RETRYABLE or attempt >= self.max_attempts - 1:
+            return None
+        delay = self.backoff.delay(attempt)
+        if self._clock() - started + delay > self.max_elapsed:
+            return None
+        if self.on_retry is not None:
+            self.on_retry(attempt, error, delay)
+        return delay
+
+    def call(self, fn: Callable[[], T], sleep: Callable[[float], None] = time.sleep) -> T:
+        started = self._clock()
+        for attempt in self.attempts():
+            try:
+                result = fn()
+            except self.passthrough:
+                self.abandon()
+                raise
+            except Exception as e:
+                delay = self.next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                sleep(delay)
+                continue
+            self.record_success()
+            return result
+        raise RuntimeError("sem tentativas configuradas")
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]],
+                         sleep: Callable[[float], Awaitable[None]] = asyncio.sleep) -> T:
+        # Mesma política, mas a espera é um asyncio.sleep: não prende nenhuma thread
+        started = self._clock()
+        for attempt in self.attempts():
+            try:
+                result = await fn()
+            except self.passthrough:
+                self.abandon()
+                raise
+            except Exception as e:
+                delay = self.next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                await sleep(delay)
+                continue
+            self.record_success()
+            return result
+        raise RuntimeError("sem tentativas configuradas")
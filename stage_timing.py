@@ -0,0 +1,92 @@
+# Tempo gasto em cada etapa de um turno (decodificação, transcrição, roteamento, IA, TTS).
+#
+# As etapas são marcadas com `with stage("nome"):` no código da aplicação; o custo é
+# uma leitura de relógio e um append. As amostras mais recentes de cada etapa ficam
+# em memória para o cálculo de percentis (benchmarks e métricas).
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+MAX_SAMPLES = 10000
+
+
+def percentile(values: List[float], q: float) -> float:
+    # Interpolação linear entre as amostras ordenadas (mesmo critério do numpy)
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class LatencyRecorder:
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self._max_samples = max_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._totals: Dict[str, float] = {}
+        self._listeners: List[Callable[[str, float], None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[str, float], None]) -> None:
+        # Chamado a cada amostra, fora do lock (ex.: histogramas do /metrics)
+        self._listeners.append(listener)
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self._max_samples)
+            samples.append(seconds)
+            # Contagem e soma acumuladas desde o início (não só da janela)
+            self._counts[name] = self._counts.get(name, 0) + 1
+            self._totals[name] = self._totals.get(name, 0.0) + seconds
+        for listener in self._listeners:
+            listener(name, seconds)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def samples(self, name: str) -> List[float]:
+        with self._lock:
+            return list(self._samples.get(name, ()))
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: {"count": self._counts[name], "sum": self._totals[name]} for name in self._counts}
+
+    def summary(self, stages: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            snapshot = {name: list(values) for name, values in self._samples.items()}
+        result = {}
+        for name in stages or sorted(snapshot):
+            values = snapshot.get(name, [])
+            result[name] = {
+                "count": len(values),
+                "mean": sum(values) / len(values) if values else 0.0,
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
+
+
+# Registro global usado pela aplicação
+recorder = LatencyRecorder()
+stage = recorder.stage
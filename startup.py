@@ -0,0 +1,102 @@
+# Inicialização rápida: importações adiadas e relatório de tempo por fase.
+#
+# Bibliotecas pesadas (Gradio, OpenAI, Whisper) só são importadas no primeiro uso,
+# e cada fase da inicialização (importações, TTS, STT, IA, interface) é cronometrada
+# para mostrar onde vai o tempo até o assistente ficar pronto.
+
+import importlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+# Marca o início da inicialização: este módulo é importado antes dos demais
+_PROCESS_START = time.perf_counter()
+
+
+class LazyModule:
+    """Módulo importado só no primeiro acesso a um atributo."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    with timer.phase(f"import {self._name}"):
+                        self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "carregado" if self._module is not None else "adiado"
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def preload(module: LazyModule) -> None:
+    # Força a importação agora (ex.: antes de montar a interface, para medir à parte)
+    module._load()
+
+
+class StartupTimer:
+    def __init__(self, start: Optional[float] = None):
+        self._start = time.perf_counter() if start is None else start
+        self._last = self._start
+        self._phases: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def mark(self, name: str) -> float:
+        # Tempo desde a marca anterior (ou desde o início), atribuído à fase `name`
+        now = time.perf_counter()
+        with self._lock:
+            seconds = now - self._last
+            self._last = now
+            self._phases.append((name, seconds))
+        return seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self._phases.append((name, end - start))
+                self._last = max(self._last, end)
+
+    def phases(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return list(self._phases)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def format_report(self) -> str:
+        lines = [f"[Inicialização] pronto em {self.elapsed():.2f}s"]
+        for name, seconds in self.phases():
+            lines.append(f"  {name:<24} {seconds * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+    def report(self) -> None:
+        if os.getenv("STARTUP_REPORT", "true").strip().lower() in {"0", "false", "no", "nao", "não", "off"}:
+            return
+        print(self.format_report())
+
+
+# Cronômetro global, iniciado na importação deste módulo
+timer = StartupTimer(_PROCESS_START)
@@ -0,0 +1,179 @@
+# Transcrição incremental com o Whisper.
+#
+# Enquanto o usuário fala, janelas sobrepostas do áudio acumulado são decodificadas
+# em segundo plano. As palavras que se repetem entre duas hipóteses seguidas são
+# consideradas estáveis, de modo que o texto final já está quase pronto quando o
+# fim da fala é detectado.
+
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+
+from audio_utils import WHISPER_SAMPLE_RATE
+
+
+@dataclass
+class PartialTranscript:
+    stable: str      # Prefixo confirmado por hipóteses consecutivas
+    unstable: str    # Restante da hipótese atual, ainda pode mudar
+    final: bool = False
+
+    @property
+    def text(self) -> str:
+        return " ".join(part for part in (self.stable, self.unstable) if part)
+
+
+def _common_prefix(a: List[str], b: List[str]) -> List[str]:
+    n = 0
+    for x, y in zip(a, b):
+        if x.lower().strip(".,!?") != y.lower().strip(".,!?"):
+            break
+        n += 1
+    return b[:n]
+
+
+def _merge_overlap(committed: List[str], words: List[str], max_overlap: int = 8) -> List[str]:
+    # Remove do início da nova hipótese as palavras que repetem o fim do texto já confirmado
+    for k in range(min(max_overlap, len(committed), len(words)), 0, -1):
+        if [w.lower() for w in committed[-k:]] == [w.lower() for w in words[:k]]:
+            return words[k:]
+    return words
+
+
+class StreamingTranscriber:
+    """Recebe blocos float32 16 kHz e emite hipóteses parciais estáveis."""
+
+    def __init__(self, model, language: str = "pt", step: float = 1.0, window: float = 30.0,
+                 overlap: float = 2.0, silence_rms: float = 0.01,
+                 on_partial: Optional[Callable[[PartialTranscript], None]] = None):
+        self._model = model
+        self._language = language
+        self._step = int(step * WHISPER_SAMPLE_RATE)
+        self._window = int(window * WHISPER_SAMPLE_RATE)
+        self._overlap = int(overlap * WHISPER_SAMPLE_RATE)
+        self._silence_rms = silence_rms
+        self._on_partial = on_partial
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper-stream")
+        self._pending: Optional[Future] = None
+        self._partials = deque(maxlen=64)
+        self._partials_cond = threading.Condition(self._lock)
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._chunks: List[np.ndarray] = []
+        self._buffered = 0            # Amostras na janela atual
+        self._decoded_upto = 0        # Amostras da janela atual já decodificadas
+        self._committed: List[str] = []  # Palavras de janelas anteriores
+        self._previous: List[str] = []   # Última hipótese da janela atual
+        self._stable: List[str] = []
+
+    def _audio(self) -> np.ndarray:
+        if len(self._chunks) > 1:
+            self._chunks = [np.concatenate(self._chunks)]
+        return self._chunks[0] if self._chunks else np.zeros(0, dtype=np.float32)
+
+    def feed(self, block: np.ndarray) -> None:
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._chunks.append(block)
+            self._buffered += len(block)
+            busy = self._pending is not None and not self._pending.done()
+            if busy or self._buffered - self._decoded_upto < self._step:
+                return
+            audio = self._audio()[:self._window]
+            self._decoded_upto = len(audio)
+            self._pending = self._executor.submit(self._decode, audio)
+
+    def _transcribe(self, audio: np.ndarray) -> List[str]:
+        prompt = " ".join(self._committed[-32:]) or None
+        result = self._model.transcribe(audio, language=self._language, fp16=False,
+                                        initial_prompt=prompt, condition_on_previous_text=False)
+        return result["text"].strip().split()
+
+    def _decode(self, audio: np.ndarray) -> None:
+        try:
+            words = _merge_overlap(self._committed, self._transcribe(audio))
+        except Exception as e:
+            print(f"[Streaming] Erro na transcrição parcial: {e}")
+            return
+
+        with self._lock:
+            self._stable = _common_prefix(self._previous, words)
+            self._previous = words
+            partial = self._snapshot(words)
+            if len(audio) >= self._window:
+                # Janela cheia: confirma a hipótese inteira (a parte instável também, pois o
+                # áudio dela sai da janela) e mantém só a sobreposição
+                self._committed += words
+                partial = PartialTranscript(" ".join(self._committed), "")
+                keep = self._audio()[len(audio) - self._overlap:]
+                self._chunks = [keep]
+                self._buffered = len(keep)
+                self._decoded_upto = 0
+                self._previous = []
+                self._stable = []
+            self._partials.append(partial)
+            self._partials_cond.notify_all()
+
+        if self._on_partial:
+            self._on_partial(partial)
+
+    def _snapshot(self, words: List[str], final: bool = False) -> PartialTranscript:
+        if final:
+            return PartialTranscript(" ".join(self._committed + words), "", True)
+        stable = self._committed + self._stable
+        return PartialTranscript(" ".join(stable), " ".join(words[len(self._stable):]))
+
+    def current(self) -> PartialTranscript:
+        with self._lock:
+            return self._snapshot(self._previous)
+
+    def finalize(self) -> str:
+        pending = self._pending
+        if pending is not None:
+            pending.result()
+
+        with self._lock:
+            audio = self._audio()
+            tail = audio[self._decoded_upto:]
+            previous = list(self._previous)
+
+        # Se o trecho ainda não decodificado é só silêncio (o hangover do VAD),
+        # a última hipótese já é o texto final.
+        tail_silent = tail.size == 0 or float(np.sqrt(np.mean(np.square(tail)))) < self._silence_rms
+        if previous and tail_silent:
+            words = previous
+        elif audio.size:
+            words = _merge_overlap(self._committed, self._transcribe(audio))
+        else:
+            words = []
+
+        with self._lock:
+            partial = self._snapshot(words, final=True)
+            self._partials.append(partial)
+            self._partials_cond.notify_all()
+            self._reset_state()
+
+        if self._on_partial:
+            self._on_partial(partial)
+        return partial.text
+
+    def partials(self) -> Iterator[PartialTranscript]:
+        # Gerador com as hipóteses parciais; termina após a hipótese final
+        while True:
+            with self._lock:
+                while not self._partials:
+                    self._partials_cond.wait()
+                partial = self._partials.popleft()
+            yield partial
+            if partial.final:
+                return
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
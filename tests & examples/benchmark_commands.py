@@ -0,0 +1,69 @@
+# Benchmark do roteamento de comandos: custo por frase conforme o número de comandos.
+#
+# Compara o registro compilado (uma única regex em trie) com o encadeamento antigo de
+# verificações "x in s", que cresce linearmente com a quantidade de comandos.
+#
+# Uso: python "tests & examples/benchmark_commands.py" [--sizes 3 100 1000 5000]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commands import CommandResult, default_registry
+
+UTTERANCES = [
+    "pesquisar wikipedia história do brasil",
+    "vídeo de receitas de bolo",
+    "farmácia",
+    "bom dia, tudo bem com você hoje?",
+]
+
+
+def build(size):
+    registry = default_registry()
+    triggers = []
+    for i in range(max(0, size - len(registry))):
+        trigger = f"acao{i} especial"
+        registry.register(f"plugin{i}", [trigger], lambda q: CommandResult(True, q))
+        triggers.append(trigger)
+    return registry, ["wikipedia", "youtube", "vídeo", "video", "farmácia", "farmacia"] + triggers
+
+
+def cascade(triggers, text):
+    s = text.lower()
+    for trigger in triggers:
+        if trigger in s:
+            return trigger
+    return None
+
+
+def measure(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in UTTERANCES:
+            func(text)
+    return (time.perf_counter() - start) / (repeat * len(UTTERANCES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'comandos':>9} {'compilar (ms)':>14} {'registro (µs)':>14} {'cascata (µs)':>13}")
+    for size in args.sizes:
+        registry, triggers = build(size)
+        start = time.perf_counter()
+        registry.match("aquecimento")  # a primeira chamada compila o autômato
+        compile_ms = (time.perf_counter() - start) * 1000
+        routed = measure(registry.match, args.repeat)
+        naive = measure(lambda text: cascade(triggers, text), args.repeat)
+        print(f"{len(registry):>9} {compile_ms:>14.1f} {routed:>14.2f} {naive:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# Benchmark de latência por etapa de um turno de conversa.
+#
+# Roda process_interaction (app.py) ou AIAssistant (assistente_ai.py) com entradas
+# sintéticas e substitutos locais, sem rede nem modelos reais:
+# - um servidor HTTP compatível com a API da OpenAI, com latência configurável, no
+#   lugar do roteador da Hugging Face / OpenAI;
+# - um Whisper falso (tempo proporcional à duração do áudio);
+# - um gTTS falso (tempo fixo + tempo por caractere).
+#
+# Mostra p50/p95/p99 de cada etapa (decode, transcribe, route, llm, tts, turn) e grava
+# os resultados em JSON. Com --baseline, compara o p95 com uma execução anterior e
+# termina com código 1 se alguma etapa piorou além de --max-regression.
+#
+# Uso:
+#   python "tests & examples/benchmark_latency.py" --turns 50 --output resultado.json
+#   python "tests & examples/benchmark_latency.py" --target assistant --llm-latency 0.3
+#   python "tests & examples/benchmark_latency.py" --baseline base.json --max-regression 0.2
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import webbrowser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(HERE))
+
+FIXTURES = os.path.join(HERE, "fixtures", "benchmark_turns.json")
+STAGES = ["decode", "transcribe", "route", "llm", "llm_first_token", "tts", "turn"]
+
+
+# Servidor falso compatível com a API da OpenAI
+
+class FakeLLMServer:
+    def __init__(self, latency: float = 0.2, token_delay: float = 0.01):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                self._json({"object": "list", "data": [{"id": "fake", "object": "model"}]})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                question = body.get("messages", [{}])[-1].get("content", "")
+                answer = (f"Resposta {server.requests} sobre '{question}'. "
+                          "Esta é a segunda frase da resposta, um pouco mais longa. Fim.")
+                time.sleep(server.latency)
+                if body.get("stream"):
+                    self._stream(body.get("model", "fake"), answer)
+                else:
+                    self._json({
+                        "id": f"cmpl-{server.requests}", "object": "chat.completion", "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": answer}}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                    })
+
+            def _json(self, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, model, answer):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(answer.split(" ")):
+                    if i:
+                        time.sleep(server.token_delay)
+                    chunk = {"id": "cmpl", "object": "chat.completion.chunk", "created": 0, "model": model,
+                             "choices": [{"index": 0, "delta": {"content": (" " if i else "") + token},
+                                          "finish_reason": None}]}
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n")
+                self._chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, text):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# Substitutos do Whisper e do TTS
+
+class FakeWhisper:
+    """Mesma interface de model.transcribe(); o texto é o da entrada atual."""
+
+    def __init__(self, realtime_factor: float = 0.05):
+        self.realtime_factor = realtime_factor
+        self.next_text = ""
+
+    def transcribe(self, audio, **options):
+        seconds = len(audio) / 16000 if hasattr(audio, "__len__") else 1.0
+        time.sleep(seconds * self.realtime_factor)
+        return {"text": f" {self.next_text} "}
+
+
+def fake_tts_writer(base: float, per_char: float):
+    def writer_for(text):
+        def write(path):
+            time.sleep(base + per_char * len(text))
+            with open(path, "wb") as f:
+                f.write(b"ID3" + text.encode("utf-8"))
+        return write
+    return writer_for
+
+
+class FakeTTS:
+    def __init__(self, base: float, per_char: float):
+        self.base = base
+        self.per_char = per_char
+
+    def speak(self, text):
+        from stage_timing import stage
+        with stage("tts"):
+            time.sleep(self.base + self.per_char * len(text))
+
+
+def synthetic_audio(seconds: float, sample_rate: int = 48000, seed: int = 0):
+    # Rajadas de tons com envelope, no formato do microfone do Gradio: (taxa, int16)
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3.0 * t)
+    signal = envelope * (0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 660 * t))
+    signal += 0.01 * rng.standard_normal(len(t))
+    return sample_rate, (signal * 32767).astype(np.int16)
+
+
+def load_fixtures(path: str = FIXTURES):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Execução
+
+def run_app(args, fixtures, server, recorder):
+    import app
+    from llm_cache import ResponseCache
+    from llm_router import Backend, LLMRouter
+    from tts_cache import TTSCache
+
+    whisper = FakeWhisper(args.stt_rtf)
+    app.whisper_pool = whisper
+    app.llm_router = LLMRouter([Backend("fake", server.url, "benchmark", "fake")])
+    app.gtts_writer = fake_tts_writer(args.tts_latency, args.tts_per_char)
+    if not args.keep_caches:
+        app.llm_cache = ResponseCache(max_bytes=0)
+
+    with tempfile.TemporaryDirectory(prefix="bench-tts-") as tmp:
+        app.tts_cache = TTSCache(tmp)
+        for turn in range(args.warmup + args.turns):
+            if turn == args.warmup:
+                recorder.reset()
+            fixture = fixtures[turn % len(fixtures)]
+            whisper.next_text = fixture["text"]
+            audio = synthetic_audio(fixture.get("seconds", 2.0), seed=turn)
+            # Sem cache de TTS entre turnos, a não ser que pedido
+            if not args.keep_caches:
+                app.tts_cache = TTSCache(os.path.join(tmp, str(turn)))
+            with recorder.stage("turn"):
+                if args.target == "app-stream":
+                    asyncio.run(drain(app.process_interaction_stream(audio, None, [])))
+                else:
+                    asyncio.run(app.process_interaction(audio, None, []))
+        app.tts_cache = None
+
+
+async def drain(updates):
+    # Os handlers do app são assíncronos
+    async for _ in updates:
+        pass
+
+
+def run_assistant(args, fixtures, server, recorder):
+    import assistente_ai
+    from llm_cache import CachedIntelligence, ResponseCache
+
+    ai = assistente_ai.ChatGPTIntelligence(api_key="benchmark", model="fake", base_url=server.url)
+    if args.keep_caches:
+        ai = CachedIntelligence(ai, ResponseCache())
+    tts = FakeTTS(args.tts_latency, args.tts_per_char)
+    assistant = assistente_ai.AIAssistant(assistente_ai.TextInputSTT(), tts, ai)
+
+    for turn in range(args.warmup + args.turns):
+        if turn == args.warmup:
+            recorder.reset()
+        text = fixtures[turn % len(fixtures)]["text"]
+        with recorder.stage("turn"):
+            tts.speak(assistant.respond(text))
+
+
+def compare(results, baseline, max_regression, slack=0.005):
+    # slack: tolerância absoluta (s), para etapas de poucos milissegundos não acusarem ruído
+    regressions = []
+    for name, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if not previous or not current["count"] or not previous["count"]:
+            continue
+        limit = previous["p95"] * (1 + max_regression) + slack
+        if current["p95"] > limit:
+            regressions.append(f"{name}: p95 {current['p95'] * 1000:.1f} ms > {limit * 1000:.1f} ms "
+                               f"(antes {previous['p95'] * 1000:.1f} ms)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latência por etapa")
+    parser.add_argument("--target", choices=["app", "app-stream", "assistant"], default="app")
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=2, help="Turnos iniciais descartados (importações, conexões)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Atraso do servidor falso até a resposta (s)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Atraso entre tokens no streaming (s)")
+    parser.add_argument("--stt-rtf", type=float, default=0.05, help="Fator de tempo real do Whisper falso")
+    parser.add_argument("--tts-latency", type=float, default=0.05, help="Tempo fixo do TTS falso por frase (s)")
+    parser.add_argument("--tts-per-char", type=float, default=0.0005, help="Tempo do TTS falso por caractere (s)")
+    parser.add_argument("--keep-caches", action="store_true", help="Manter os caches de resposta e de TTS entre turnos")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--output", help="Arquivo JSON com os resultados")
+    parser.add_argument("--baseline", help="Resultados anteriores para comparar (JSON)")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Piora máxima aceita no p95 (fração)")
+    args = parser.parse_args()
+
+    # Os comandos locais não devem abrir o navegador durante o benchmark
+    webbrowser.open = lambda *a, **k: True
+
+    from stage_timing import recorder
+
+    fixtures = load_fixtures(args.fixtures)
+    server = FakeLLMServer(args.llm_latency, args.token_delay)
+    try:
+        if args.target == "assistant":
+            run_assistant(args, fixtures, server, recorder)
+        else:
+            run_app(args, fixtures, server, recorder)
+    finally:
+        server.close()
+
+    stages = [name for name in STAGES if recorder.samples(name)]
+    results = {
+        "target": args.target,
+        "turns": args.turns,
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": recorder.summary(stages),
+    }
+
+    print(f"\n{'etapa':<16} {'n':>5} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}")
+    for name, s in results["stages"].items():
+        print(f"{name:<16} {s['count']:>5} {s['p50'] * 1000:>10.1f} {s['p95'] * 1000:>10.1f} {s['p99'] * 1000:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print("\nRegressões de latência:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\nSem regressões em relação à linha de base.")
+
+
+if __name__ == "__main__":
+    main()
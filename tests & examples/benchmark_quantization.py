@@ -0,0 +1,148 @@
+# Comparação de precisão e latência entre modelos Whisper (float32 x int8 dinâmico).
+#
+# Transcreve um conjunto fixo de frases em português (fixtures/quantization_pt.json)
+# com cada modelo e mostra a taxa de erro de palavras (WER), a latência média/p95 e o
+# fator de tempo real. O objetivo do modo int8 é ficar próximo da precisão do modelo
+# "base" com velocidade próxima à do "tiny".
+#
+# O áudio vem de --audio-dir (arquivos <id>.wav gravados) ou, se ausente, é sintetizado
+# uma única vez com o gTTS e guardado no cache (precisa de rede só na primeira execução).
+#
+# Uso:
+#   python "tests & examples/benchmark_quantization.py"
+#   python "tests & examples/benchmark_quantization.py" --models tiny base base-int8 --output quant.json
+#   python "tests & examples/benchmark_quantization.py" --audio-dir gravacoes/ --runs 3
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(HERE))
+
+from audio_utils import WHISPER_SAMPLE_RATE, load_audio_array, resample
+from stage_timing import percentile
+from text_utils import normalize_query
+
+FIXTURES = os.path.join(HERE, "fixtures", "quantization_pt.json")
+AUDIO_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "assistente-virtual", "benchmark_pt")
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    # Distância de edição entre palavras (sem acentos, pontuação nem maiúsculas)
+    ref = normalize_query(reference).split()
+    hyp = normalize_query(hypothesis).split()
+    if not ref:
+        return float(bool(hyp))
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def load_test_set(path: str, audio_dir: str = None):
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    clips = []
+    for item in items:
+        audio = None
+        if audio_dir:
+            wav = os.path.join(audio_dir, f"{item['id']}.wav")
+            if os.path.exists(wav):
+                audio = load_audio_array(wav)
+        if audio is None:
+            audio = synthesize(item["id"], item["text"])
+        clips.append((item["id"], item["text"], audio))
+    return clips
+
+
+def synthesize(clip_id: str, text: str):
+    from playback import decode_audio
+
+    os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+    path = os.path.join(AUDIO_CACHE_DIR, f"{clip_id}.mp3")
+    if not os.path.exists(path):
+        from gtts import gTTS
+        print(f"Sintetizando {clip_id} com o gTTS...")
+        gTTS(text=text, lang="pt").save(path)
+    with open(path, "rb") as f:
+        pcm, sr = decode_audio(f.read())
+    return resample(pcm, sr)
+
+
+def evaluate(spec: str, clips, runs: int):
+    from model_registry import _load_whisper, warm_up
+
+    start = time.perf_counter()
+    model = _load_whisper(spec)
+    load_seconds = time.perf_counter() - start
+    warm_up(model)
+
+    latencies, errors, audio_seconds = [], [], 0.0
+    for clip_id, reference, audio in clips:
+        for _ in range(runs):
+            start = time.perf_counter()
+            text = model.transcribe(audio, language="pt", fp16=False)["text"].strip()
+            latencies.append(time.perf_counter() - start)
+        audio_seconds += runs * len(audio) / WHISPER_SAMPLE_RATE
+        wer = word_error_rate(reference, text)
+        errors.append(wer)
+        if wer > 0:
+            print(f"  [{spec}] {clip_id}: '{text}' (esperado: '{reference}')")
+
+    return {
+        "load_seconds": load_seconds,
+        "wer": sum(errors) / len(errors),
+        "mean": sum(latencies) / len(latencies),
+        "p95": percentile(latencies, 95),
+        "rtf": sum(latencies) / audio_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisão e latência do Whisper float32 x int8")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "base-int8"])
+    parser.add_argument("--runs", type=int, default=1, help="Transcrições por clipe (latência)")
+    parser.add_argument("--threads", type=int, help="Threads do PyTorch (padrão: todas)")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--audio-dir", help="Pasta com <id>.wav gravados (senão usa o gTTS)")
+    parser.add_argument("--output", help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    clips = load_test_set(args.fixtures, args.audio_dir)
+    print(f"{len(clips)} clipes em português.")
+
+    results = {}
+    for spec in args.models:
+        print(f"\nAvaliando '{spec}'...")
+        results[spec] = evaluate(spec, clips, args.runs)
+
+    print(f"\n{'modelo':<14} {'WER':>7} {'média (ms)':>11} {'p95 (ms)':>10} {'RTF':>7} {'carga (s)':>10}")
+    for spec, r in results.items():
+        print(f"{spec:<14} {r['wer'] * 100:>6.1f}% {r['mean'] * 1000:>11.1f} {r['p95'] * 1000:>10.1f} "
+              f"{r['rtf']:>7.3f} {r['load_seconds']:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "clips": len(clips),
+                "runs": args.runs,
+                "models": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
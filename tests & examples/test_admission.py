@@ -0,0 +1,93 @@
+import asyncio
+import sys
+import os
+import threading
+import time
+import pytest
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionController, Overloaded, StageLimiter
+
+def test_limits_concurrency():
+    limiter = StageLimiter("llm", concurrency=2, max_queue=10, timeout=5)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with limiter.slot():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+    assert limiter.stats()["admitted"] == 8
+    assert limiter.stats()["active"] == 0 and limiter.stats()["waiting"] == 0
+
+def test_full_queue_rejects_immediately():
+    limiter = StageLimiter("transcribe", concurrency=1, max_queue=1, timeout=5)
+    limiter.acquire()
+    waiter = threading.Thread(target=lambda: limiter.slot().__enter__())
+    waiter.start()
+    while limiter.stats()["waiting"] < 1:
+        time.sleep(0.001)
+
+    start = time.perf_counter()
+    with pytest.raises(Overloaded) as info:
+        limiter.acquire()
+    assert time.perf_counter() - start < 0.5
+    assert "transcrição" in str(info.value) and "fila cheia" in str(info.value)
+    assert limiter.stats()["rejected"] == 1
+
+    limiter.release()
+    waiter.join()
+
+def test_wait_deadline():
+    limiter = StageLimiter("tts", concurrency=1, max_queue=5, timeout=0.05)
+    limiter.acquire()
+    with pytest.raises(Overloaded) as info:
+        limiter.acquire()
+    assert info.value.reason == "tempo de espera esgotado"
+    assert limiter.stats()["timeouts"] == 1 and limiter.stats()["waiting"] == 0
+    limiter.release()
+    # Vaga liberada: a próxima entra sem esperar
+    with limiter.slot(timeout=0):
+        pass
+
+def test_controller_from_env(monkeypatch):
+    monkeypatch.setenv("LLM_CONCURRENCY", "3")
+    monkeypatch.setenv("LLM_QUEUE", "7")
+    monkeypatch.setenv("LLM_QUEUE_TIMEOUT", "1.5")
+    controller = AdmissionController.from_env()
+    llm = controller.limiter("llm")
+    assert (llm.concurrency, llm.max_queue, llm.timeout) == (3, 7, 1.5)
+    with controller.stage("tts"):
+        assert controller.stats()["tts"]["active"] == 1
+    assert set(controller.stats()) == {"transcribe", "llm", "tts"}
+
+def test_async_slot_returned_when_cancelled_in_queue():
+    limiter = StageLimiter("llm", concurrency=1, max_queue=1, timeout=5)
+
+    async def main():
+        async with limiter.slot_async():
+            waiter = asyncio.create_task(limiter.slot_async().__aenter__())
+            while limiter.stats()["waiting"] < 1:
+                await asyncio.sleep(0.01)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        # A vaga liberada chega ao cancelado, que a devolve
+        while limiter.stats()["active"]:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(asyncio.wait_for(main(), 2))
+    assert limiter.stats()["active"] == 0 and limiter.stats()["admitted"] == 2
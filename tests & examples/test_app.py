@@ -1,3 +1,4 @@
+import asyncio
 import sys
 import os
 import pytest
@@ -12,7 +13,19 @@ sys.modules["torch"] = MagicMock()
 # Adicionar diretório pai ao path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import try_local_commands, process_interaction
+from app import try_local_commands, process_interaction, stream_transcription, finish_transcription, process_interaction_stream
+
+# Os handlers do chat são assíncronos
+run = asyncio.run
+
+def collect(updates):
+    async def gather():
+        return [update async for update in updates]
+    return asyncio.run(gather())
+
+async def as_deltas(items):
+    for item in items:
+        yield item
 
 def test_try_local_commands_wikipedia():
     with patch("webbrowser.open") as mock_open:
@@ -43,7 +56,7 @@ def test_process_interaction_text(mock_tts, mock_whisper):
     history = []
     
     # Test text input
-    new_history, text_out, audio_out = process_interaction(None, "Oi", history)
+    new_history, text_out, audio_out = run(process_interaction(None, "Oi", history))
     
     assert len(new_history) == 2
     assert new_history[0]["role"] == "user"
@@ -63,8 +76,227 @@ def test_process_interaction_audio(mock_tts, mock_whisper_model_func):
     
     # Test audio input
     with patch("webbrowser.open"):
-        new_history, text_out, audio_out = process_interaction("audio.wav", None, history)
+        new_history, text_out, audio_out = run(process_interaction("audio.wav", None, history))
         
         assert len(new_history) == 2
         assert "Wikipedia" in new_history[1]["content"]
         assert audio_out == "temp.mp3"
+
+@patch("app.get_whisper_model")
+@patch("app.text_to_speech")
+def test_live_transcription_flow(mock_tts, mock_whisper_model_func):
+    import numpy as np
+    mock_tts.return_value = "temp.mp3"
+    mock_model = MagicMock()
+    mock_model.transcribe.return_value = {"text": " bom dia"}
+    mock_whisper_model_func.return_value = mock_model
+
+    chunk = (48000, np.full(48000, 8000, dtype=np.int16))
+    live_text, transcriber = stream_transcription(chunk, None)
+    transcriber._pending.result()
+    live_text, transcriber = stream_transcription(chunk, transcriber)
+    assert live_text == "bom dia"
+
+    history, text_out, audio_out, state = run(finish_transcription(transcriber, []))
+    assert history[0]["content"] == "bom dia"
+    assert audio_out == "temp.mp3"
+    assert state is None
+
+@patch("app.get_llm_router")
+@patch("app.text_to_speech")
+def test_process_interaction_stream_tokens_and_sentences(mock_tts, mock_router):
+    mock_tts.side_effect = lambda text: f"{len(text)}.mp3"
+    tokens = ["A capital", " do Brasil é Brasília", ". Fica no", " Centro-Oeste."]
+
+    async def contents():
+        # O histórico é o mesmo objeto em todas as atualizações: lê o texto de cada uma na hora
+        return [(h[-1]["content"], audio) async for h, _, audio in process_interaction_stream(None, "capital do brasil", [])]
+
+    with patch("app.stream_glm_response", side_effect=lambda *args: as_deltas(tokens)):
+        updates = run(contents())
+
+    # O texto cresce token a token no chat
+    texts = [text for text, _ in updates]
+    assert texts[0] == "A capital"
+    assert texts[-1] == "A capital do Brasil é Brasília. Fica no Centro-Oeste."
+    # Um áudio por frase, na ordem
+    audios = [audio for _, audio in updates if audio]
+    assert audios == ["31.mp3", "21.mp3"]
+    assert mock_tts.call_args_list[0][0][0] == "A capital do Brasil é Brasília."
+
+@patch("app.text_to_speech", return_value="temp.mp3")
+def test_process_interaction_stream_without_ai(mock_tts):
+    with patch("app.get_llm_router", return_value=None):
+        updates = collect(process_interaction_stream(None, "Oi", []))
+    history = updates[-1][0]
+    assert history[0]["content"] == "Oi"
+    assert "Você disse: Oi" in history[1]["content"]
+    assert mock_tts.call_args_list[0][0][0] == "Você disse: Oi."
+
+def test_get_glm_response_sends_previous_turns():
+    import app
+    from llm_cache import ResponseCache
+    from llm_router import Backend, LLMRouter
+
+    client = MagicMock()
+    client.chat.completions.create.return_value.choices[0].message.content = "Cerca de 2,2 milhões."
+    history = [
+        {"role": "user", "content": "Qual é a capital da França?"},
+        {"role": "assistant", "content": "Paris."},
+    ]
+    router = LLMRouter([Backend("hf", "http://exemplo/v1", "token", "glm")], client_factory=lambda *a: client)
+    with patch("app.get_llm_router", return_value=router), patch("app.llm_cache", ResponseCache()):
+        assert run(app.get_glm_response("E a população?", history)) == "Cerca de 2,2 milhões."
+        messages = client.chat.completions.create.call_args.kwargs["messages"]
+        assert [m["content"] for m in messages[1:]] == ["Qual é a capital da França?", "Paris.", "E a população?"]
+
+        # A mesma pergunta sem a conversa anterior não reaproveita a resposta
+        client.chat.completions.create.return_value.choices[0].message.content = "De qual lugar?"
+        assert run(app.get_glm_response("E a população?", [])) == "De qual lugar?"
+
+@patch("app.text_to_speech", return_value="temp.mp3")
+def test_each_session_uses_its_own_conversation_context(mock_tts):
+    import app
+
+    first, second = app.new_conversation(), app.new_conversation()
+    contexts = []
+    with patch("app.get_llm_router", return_value=MagicMock()), \
+            patch("app.get_glm_response", side_effect=lambda text, history, context: contexts.append(context) or "ok"):
+        run(process_interaction(None, "Oi", [], first))
+        run(process_interaction(None, "Olá", [], second))
+    # Nada é compartilhado entre visitantes: cada sessão passa o contexto do seu gr.State
+    assert contexts == [first, second]
+    assert not hasattr(app, "conversation")
+
+@patch("app.text_to_speech", return_value="temp.mp3")
+def test_saturated_llm_stage_rejects_with_message(mock_tts):
+    import app
+    from admission import AdmissionController
+    from llm_cache import ResponseCache
+    from resilience import CircuitBreaker
+
+    saturated = AdmissionController({"transcribe": (1, 1, 1.0), "llm": (1, 0, 0.0), "tts": (1, 1, 1.0)})
+    saturated.limiter("llm").acquire()
+    router = MagicMock(model="glm")
+    with patch("app.admission", saturated), patch("app.get_llm_router", return_value=router), \
+            patch("app.llm_cache", ResponseCache()):
+        history, _, _ = run(process_interaction(None, "Qual a capital da Itália?", []))
+        updates = collect(process_interaction_stream(None, "Qual a capital da Itália?", []))
+    router.complete.assert_not_called()
+    router.stream.assert_not_called()
+    assert "ocupado" in history[-1]["content"]
+    assert updates[-1][0][-1]["content"].startswith("O assistente está ocupado (IA")
+    # A recusa é local: não conta como falha da IA
+    assert app.llm_retry.breaker.state == CircuitBreaker.CLOSED
+
+def test_llm_slot_is_free_while_waiting_to_retry():
+    import app
+    from admission import AdmissionController
+    from llm_cache import ResponseCache
+    from resilience import Backoff, RetryPolicy
+
+    limits = AdmissionController({"transcribe": (1, 1, 1.0), "llm": (1, 0, 0.0), "tts": (1, 1, 1.0)})
+    active_while_waiting = []
+
+    def on_retry(attempt, error, delay):
+        # Chamado logo antes da espera entre tentativas
+        active_while_waiting.append(limits.limiter("llm").stats()["active"])
+
+    class Down(Exception):
+        status_code = 503
+
+    router = MagicMock(model="glm")
+    router.complete.side_effect = [Down(), "Roma"]
+    router.stream.side_effect = [Down(), iter(["Roma"])]
+    policy = RetryPolicy(max_attempts=2, backoff=Backoff(base=0.01, cap=0.01), on_retry=on_retry,
+                         passthrough=(app.Overloaded,))
+    with patch("app.admission", limits), patch("app.get_llm_router", return_value=router), \
+            patch("app.llm_cache", ResponseCache()), patch("app.llm_retry", policy):
+        assert run(app.get_glm_response("Qual a capital da Itália?")) == "Roma"
+        assert collect(app.stream_glm_response("E a da Itália antiga?")) == ["Roma"]
+    assert active_while_waiting == [0, 0]
+
+def test_llm_backoff_does_not_hold_a_thread():
+    import app
+    from concurrent.futures import ThreadPoolExecutor
+    from llm_cache import ResponseCache
+    from resilience import Backoff, RetryPolicy
+
+    class Down(Exception):
+        status_code = 503
+
+    failures = {"Primeira": 1}
+
+    def complete(messages):
+        question = messages[-1]["content"]
+        if failures.get(question):
+            failures[question] -= 1
+            raise Down()
+        return question.upper()
+
+    router = MagicMock(model="glm")
+    router.complete.side_effect = complete
+    policy = RetryPolicy(max_attempts=2, backoff=Backoff(base=0.3, cap=0.3), max_elapsed=10)
+    policy.backoff.delay = lambda attempt: 0.3
+    finished = []
+
+    async def ask(text):
+        finished.append(await app.get_glm_response(text))
+
+    async def main():
+        # Uma única thread para o trabalho bloqueante: se a espera a ocupasse, a segunda
+        # pergunta só andaria depois dela
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=1))
+        first = asyncio.create_task(ask("Primeira"))
+        await asyncio.sleep(0.05)
+        await ask("Segunda")
+        finished.append("segunda pronta")
+        await first
+
+    with patch("app.get_llm_router", return_value=router), patch("app.llm_cache", ResponseCache()), \
+            patch("app.llm_retry", policy):
+        run(main())
+    assert finished == ["SEGUNDA", "segunda pronta", "PRIMEIRA"]
+
+def test_inner_circuit_open_does_not_trip_app_breaker():
+    import app
+    from llm_cache import ResponseCache
+    from resilience import CircuitBreaker, CircuitOpen, RetryPolicy
+
+    router = MagicMock(model="glm")
+    router.complete.side_effect = CircuitOpen("IA", 30)
+    router.stream.side_effect = CircuitOpen("IA", 30)
+    policy = RetryPolicy(breaker=CircuitBreaker("IA", failure_threshold=1))
+    with patch("app.get_llm_router", return_value=router), patch("app.llm_cache", ResponseCache()), \
+            patch("app.llm_retry", policy):
+        assert run(app.get_glm_response("Oi")) == app.LLM_UNAVAILABLE_MESSAGE
+        assert collect(app.stream_glm_response("Olá")) == [app.LLM_UNAVAILABLE_MESSAGE]
+    # Todos os backends fora já é o disjuntor do roteador; o do app não conta de novo
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+    assert router.complete.call_count == 1 and router.stream.call_count == 1
+
+def test_open_llm_breaker_answers_without_calling_ai():
+    import app
+    from llm_cache import ResponseCache
+    from llm_router import Backend, LLMRouter
+    from resilience import CircuitBreaker, RetryPolicy
+
+    breaker = CircuitBreaker("IA", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    client = MagicMock()
+    router = LLMRouter([Backend("hf", "http://exemplo/v1", "token", "glm")], client_factory=lambda *a: client)
+    with patch("app.get_llm_router", return_value=router), patch("app.llm_cache", ResponseCache()), \
+            patch("app.llm_retry", RetryPolicy(breaker=breaker)):
+        assert run(app.get_glm_response("Qual a capital da Itália?")) == app.LLM_UNAVAILABLE_MESSAGE
+        assert collect(app.stream_glm_response("Qual a capital da Itália?")) == [app.LLM_UNAVAILABLE_MESSAGE]
+    client.chat.completions.create.assert_not_called()
+
+@patch("app.get_whisper_model")
+def test_silent_clip_skips_whisper(mock_whisper_model_func):
+    import numpy as np
+    from app import transcribe_audio
+
+    assert transcribe_audio((48000, np.zeros(48000 * 3, dtype=np.int16))) == ""
+    mock_whisper_model_func.return_value.transcribe.assert_not_called()
+    history, _, _ = run(process_interaction((48000, np.zeros(48000, dtype=np.int16)), None, []))
+    assert history == []
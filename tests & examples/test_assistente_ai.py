@@ -16,7 +16,8 @@ sys.modules["openai"] = MagicMock()
 # Adicionar diretório pai ao path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from assistente_ai import try_local_commands, ChatGPTIntelligence, GTTSTTS, WhisperSTT
+from assistente_ai import try_local_commands, AIAssistant, ChatGPTIntelligence, GTTSTTS, WhisperSTT, parse_args
+from audio_utils import EndpointConfig
 
 def test_try_local_commands_wikipedia():
     with patch("webbrowser.open") as mock_open:
@@ -53,19 +54,217 @@ def test_whisper_stt_init():
     stt = WhisperSTT(model_size="tiny")
     mock_whisper.load_model.assert_called_with("tiny")
 
+class FakePlayer:
+    """Substitui o AudioPlayer: registra o que foi tocado sem abrir dispositivo de áudio."""
+
+    def __init__(self, on_play=None):
+        self.played = []
+        self.stopped = 0
+        self._on_play = on_play
+
+    def play(self, pcm, sample_rate):
+        self.played.append(pcm)
+        if self._on_play:
+            self._on_play(len(self.played))
+        handle = MagicMock()
+        handle.wait.return_value = True
+        return handle
+
+    def stop(self):
+        self.stopped += 1
+
+def fake_decode(data):
+    import numpy as np
+    return np.zeros(10, dtype=np.float32), 24000
+
 def test_gtts_tts_speak():
     mock_gtts_mod = sys.modules['gtts']
-    mock_pygame = sys.modules['pygame']
     
     mock_tts_obj = MagicMock()
     mock_gtts_mod.gTTS.return_value = mock_tts_obj
+    player = FakePlayer()
     
-    mock_pygame.mixer.music.get_busy.side_effect = [True, False]
-    
-    with patch("os.remove"):
-        tts = GTTSTTS()
+    with patch("assistente_ai.decode_audio", side_effect=fake_decode):
+        tts = GTTSTTS(player=player)
         tts.speak("Olá")
         
         mock_gtts_mod.gTTS.assert_called()
-        mock_tts_obj.save.assert_called()
-        # mock_pygame.mixer.music.play.assert_called() # Removed as it's inside while loop now
+        # Síntese em memória, sem arquivo temporário
+        mock_tts_obj.write_to_fp.assert_called()
+        assert len(player.played) == 1
+
+def test_whisper_stt_listen_in_memory():
+    import numpy as np
+    mock_sd = sys.modules['sounddevice']
+    recording = np.zeros((16000, 1), dtype=np.float32)
+    recording[8000:12000] = 0.05
+    mock_sd.rec.return_value = recording
+
+    stt = WhisperSTT(model_size="tiny")
+    stt._model = MagicMock()
+    stt._model.transcribe.return_value = {"text": " bom dia "}
+
+    assert stt.listen(timeout=1) == "bom dia"
+    audio = stt._model.transcribe.call_args[0][0]
+    assert isinstance(audio, np.ndarray)
+    # Silêncio do início cortado (fica a margem de 0,3 s, arredondada ao quadro) e volume normalizado
+    assert audio.dtype == np.float32 and audio.ndim == 1
+    assert 16000 - 8000 + 4800 <= len(audio) < 16000
+    assert abs(audio.max() - 0.1) < 0.01
+    assert mock_sd.rec.call_args[1]["samplerate"] == 16000
+
+def test_whisper_stt_skips_silent_recording():
+    import numpy as np
+    mock_sd = sys.modules['sounddevice']
+    mock_sd.rec.return_value = np.zeros((16000, 1), dtype=np.float32)
+
+    stt = WhisperSTT(model_size="tiny")
+    stt._model = MagicMock()
+
+    assert stt.listen(timeout=1) is None
+    stt._model.transcribe.assert_not_called()
+
+def test_whisper_stt_listen_vad_stops_on_silence():
+    import numpy as np
+    cfg = EndpointConfig(hangover=0.3)
+    blocks = [np.zeros((cfg.block_size, 1), np.float32)] * 5 \
+        + [np.full((cfg.block_size, 1), 0.2, np.float32)] * 20 \
+        + [np.zeros((cfg.block_size, 1), np.float32)] * 100
+
+    mock_sd = sys.modules['sounddevice']
+    stream = mock_sd.InputStream.return_value.__enter__.return_value
+    stream.read.side_effect = [(b, False) for b in blocks]
+
+    stt = WhisperSTT(model_size="tiny", endpointing=cfg)
+    stt._model = MagicMock()
+    stt._model.transcribe.return_value = {"text": "que horas são"}
+
+    assert stt.listen() == "que horas são"
+    # Parou logo após o hangover, sem consumir todo o silêncio restante
+    assert stream.read.call_count == 5 + 20 + cfg.blocks(0.3)
+
+def test_whisper_stt_listen_from_continues_on_open_microphone():
+    import numpy as np
+    cfg = EndpointConfig(hangover=0.3)
+    # Começo do comando já lido pelo portão da palavra de ativação
+    prefix = np.full(cfg.block_size * 4, 0.2, np.float32)
+    blocks = iter([np.full(cfg.block_size, 0.2, np.float32)] * 10 + [np.zeros(cfg.block_size, np.float32)] * 50)
+
+    mock_sd = sys.modules['sounddevice']
+    mock_sd.InputStream.reset_mock()
+    stt = WhisperSTT(model_size="tiny", endpointing=cfg)
+    stt._model = MagicMock()
+    stt._model.transcribe.return_value = {"text": "que horas são"}
+
+    assert stt.listen_from(lambda: next(blocks), prefix) == "que horas são"
+    mock_sd.InputStream.assert_not_called()
+    audio = stt._model.transcribe.call_args.args[0]
+    assert len(audio) >= len(prefix) + 10 * cfg.block_size - cfg.block_size
+
+def test_gtts_tts_synthesizes_next_sentence_while_playing():
+    import threading
+    mock_gtts_mod = sys.modules['gtts']
+    events = []
+    second_saved = threading.Event()
+
+    def make_tts(text, lang, slow):
+        obj = MagicMock()
+        def write_to_fp(fp):
+            events.append(("sintetizou", text))
+            if len(events) > 1:
+                second_saved.set()
+        obj.write_to_fp.side_effect = write_to_fp
+        return obj
+    mock_gtts_mod.gTTS.side_effect = make_tts
+
+    def on_play(count):
+        events.append(("tocou", count))
+        # A primeira frase "toca" até a segunda ficar pronta
+        if count == 1:
+            second_saved.wait(timeout=5)
+        events.append(("terminou", count))
+
+    try:
+        with patch("assistente_ai.decode_audio", side_effect=fake_decode):
+            tts = GTTSTTS(player=FakePlayer(on_play))
+            tts.speak("Primeira frase da resposta. Segunda frase da resposta.")
+    finally:
+        mock_gtts_mod.gTTS.side_effect = None
+
+    assert second_saved.is_set()
+    assert events[0] == ("sintetizou", "Primeira frase da resposta.")
+    assert ("tocou", 2) in events
+    # A segunda frase foi sintetizada antes de a primeira terminar de tocar
+    assert events.index(("sintetizou", "Segunda frase da resposta.")) < events.index(("terminou", 1))
+
+def test_gtts_tts_stop_skips_remaining_sentences():
+    mock_gtts_mod = sys.modules['gtts']
+    mock_gtts_mod.gTTS.side_effect = None
+    tts = None
+
+    def on_play(count):
+        # O usuário começa a falar durante a primeira frase
+        tts.stop()
+
+    player = FakePlayer(on_play)
+    with patch("assistente_ai.decode_audio", side_effect=fake_decode):
+        tts = GTTSTTS(player=player)
+        tts.speak("Primeira frase da resposta. Segunda frase da resposta. Terceira frase da resposta.")
+        assert len(player.played) == 1
+        assert player.stopped == 1
+
+        # A próxima fala não herda a interrupção
+        tts.speak("Outra resposta curta.")
+        assert len(player.played) == 2
+
+def test_gtts_tts_uses_cache(tmp_path):
+    from tts_cache import TTSCache
+    mock_gtts_mod = sys.modules['gtts']
+    mock_gtts_mod.gTTS.reset_mock()
+    mock_gtts_mod.gTTS.return_value.save.side_effect = lambda path: open(path, "wb").write(b"mp3")
+    decoded = []
+
+    try:
+        with patch("assistente_ai.decode_audio", side_effect=lambda data: decoded.append(data) or fake_decode(data)):
+            tts = GTTSTTS(cache=TTSCache(str(tmp_path)), player=FakePlayer())
+            tts.speak("Olá! Como posso ajudar?")
+            tts.speak("Olá! Como posso ajudar?")
+    finally:
+        mock_gtts_mod.gTTS.return_value.save.side_effect = None
+
+    # Segunda vez vem do cache, e o arquivo do cache continua disponível
+    assert mock_gtts_mod.gTTS.call_count == 1
+    assert decoded == [b"mp3", b"mp3"]
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_whisper_stt_calls_on_speech_start_once():
+    import numpy as np
+    cfg = EndpointConfig(hangover=0.3)
+    blocks = [np.zeros((cfg.block_size, 1), np.float32)] * 5 \
+        + [np.full((cfg.block_size, 1), 0.2, np.float32)] * 20 \
+        + [np.zeros((cfg.block_size, 1), np.float32)] * 100
+
+    mock_sd = sys.modules['sounddevice']
+    stream = mock_sd.InputStream.return_value.__enter__.return_value
+    stream.read.side_effect = [(b, False) for b in blocks]
+    barge_in = MagicMock()
+
+    stt = WhisperSTT(model_size="tiny", endpointing=cfg, on_speech_start=barge_in)
+    stt._model = MagicMock()
+    stt._model.transcribe.return_value = {"text": "espera"}
+
+    assert stt.listen() == "espera"
+    barge_in.assert_called_once()
+
+
+def test_overlap_is_opt_in():
+    # Sem supressão de eco, ouvir durante a fala só com --overlap
+    assert parse_args([]).overlap is False
+    assert parse_args(["--overlap"]).overlap is True
+
+    stt, tts = MagicMock(), MagicMock()
+    stt.listen.side_effect = ["sair"]
+    with patch("assistente_ai.ConversationPipeline") as pipeline:
+        AIAssistant(stt, tts, None).run()
+    pipeline.assert_not_called()
+    tts.speak.assert_called_with("Até logo!")
@@ -0,0 +1,118 @@
+import sys
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_store import AudioArtifactStore
+
+def _age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+def test_put_and_release_session(tmp_path):
+    store = AudioArtifactStore(str(tmp_path))
+    a = store.put("sessão/1", b"abc")
+    b = store.put("outra", b"defg", suffix=".wav")
+    # Nome da sessão é saneado e fica dentro do diretório
+    assert store.contains(a) and os.path.dirname(a) == store.session_dir("sessão/1")
+    assert b.endswith(".wav")
+    assert store.stats()["bytes"] == 7
+
+    store.release("sessão/1")
+    assert not os.path.exists(a) and os.path.exists(b)
+    assert store.stats()["bytes"] == 4
+
+def test_adopt_links_source_and_discard(tmp_path):
+    source = tmp_path / "cache.mp3"
+    source.write_bytes(b"ID3" + b"x" * 10)
+    store = AudioArtifactStore(str(tmp_path / "spool"))
+
+    path = store.adopt("s", str(source))
+    assert open(path, "rb").read() == source.read_bytes()
+    assert os.path.exists(source)
+
+    assert store.discard(path) and not os.path.exists(path)
+    # Arquivos de fora do diretório nunca são apagados
+    assert not store.discard(str(source)) and os.path.exists(source)
+
+@pytest.fixture
+def real_gradio(monkeypatch):
+    # Outros testes trocam o gradio por um MagicMock; aqui vale o cache de verdade
+    monkeypatch.setenv("GRADIO_ANALYTICS_ENABLED", "False")
+    with patch.dict(sys.modules):
+        if isinstance(sys.modules.get("gradio"), MagicMock):
+            del sys.modules["gradio"]
+        yield pytest.importorskip("gradio")
+
+def test_gradio_serves_session_files_in_place(tmp_path, monkeypatch, real_gradio):
+    source = tmp_path / "cache.mp3"
+    source.write_bytes(b"ID3" + b"x" * 10)
+    store = AudioArtifactStore(str(tmp_path / "spool"))
+    monkeypatch.setenv("GRADIO_TEMP_DIR", store.gradio_dir)
+
+    path = store.adopt("s", str(source))
+    with real_gradio.Blocks():
+        audio = real_gradio.Audio()
+    # Dentro do GRADIO_TEMP_DIR o Gradio usa o próprio arquivo da sessão, sem copiá-lo
+    assert audio.move_resource_to_block_cache(path) == path
+    assert audio.move_resource_to_block_cache(str(source)) != str(source)
+
+def test_session_quota_drops_oldest(tmp_path):
+    store = AudioArtifactStore(str(tmp_path), session_max_bytes=10)
+    first = store.put("s", b"x" * 6)
+    _age(first, 5)
+    second = store.put("s", b"y" * 6)
+    assert not os.path.exists(first) and os.path.exists(second)
+
+def test_reap_by_age_and_bytes_leaves_gradio_files(tmp_path):
+    store = AudioArtifactStore(str(tmp_path), max_bytes=20, max_age=60)
+    # Arquivo do Gradio (fora das sessões), mesmo antigo: é o Gradio quem o apaga
+    gradio_dir = tmp_path / "gradio" / "abc123"
+    gradio_dir.mkdir(parents=True)
+    upload = gradio_dir / "audio.wav"
+    upload.write_bytes(b"z" * 5)
+    _age(upload, 120)
+
+    files = []
+    for i in range(4):
+        path = store.put(f"s{i}", b"w" * 8)
+        _age(path, 40 - i)
+        files.append(path)
+
+    store.reap()
+    assert upload.exists()
+    assert not store.discard(str(upload)) and upload.exists()
+    # 4 x 8 bytes > 20: os mais antigos saem até caber no limite
+    assert [os.path.exists(f) for f in files] == [False, False, True, True]
+    # Parte já sai nas gravações (cota global), o restante na coleta
+    assert store.stats()["files_removed"] == 2
+    assert store.stats()["bytes"] == 16
+
+def test_global_quota_reaps_on_put(tmp_path):
+    store = AudioArtifactStore(str(tmp_path), max_bytes=10)
+    first = store.put("a", b"1" * 8)
+    _age(first, 5)
+    store.put("b", b"2" * 8)
+    assert not os.path.exists(first)
+    assert store.stats()["bytes"] <= 10
+
+def test_reaper_thread_cleans_leftovers(tmp_path):
+    leftover = tmp_path / "gradio" / "sessions" / "velha" / "x.mp3"
+    leftover.parent.mkdir(parents=True)
+    leftover.write_bytes(b"x")
+    _age(leftover, 7200)
+
+    store = AudioArtifactStore(str(tmp_path), max_age=3600, reap_interval=0.05)
+    store.start_reaper()
+    try:
+        deadline = time.time() + 2
+        while leftover.exists() and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        store.stop()
+    assert not leftover.exists()
@@ -0,0 +1,154 @@
+import sys
+import os
+import wave
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_utils import WHISPER_SAMPLE_RATE, EndpointConfig, Endpointer, to_float32_mono, resample, load_audio_array
+
+def _write_wav(path, data, sr, channels=1):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(data.astype(np.int16).tobytes())
+
+def test_to_float32_mono_int16_stereo():
+    data = np.array([[16384, 0], [-32768, -32768]], dtype=np.int16)
+    audio = to_float32_mono(data)
+    assert audio.dtype == np.float32
+    assert np.allclose(audio, [0.25, -1.0])
+
+def test_resample_integer_factor():
+    audio = np.ones(48000, dtype=np.float32)
+    out = resample(audio, 48000)
+    assert out.shape == (16000,)
+    assert np.allclose(out, 1.0)
+
+def test_resample_fractional():
+    t = np.arange(44100) / 44100
+    audio = np.sin(2 * np.pi * 440 * t).astype(np.float32)
+    out = resample(audio, 44100)
+    assert out.dtype == np.float32
+    assert abs(len(out) - WHISPER_SAMPLE_RATE) <= 1
+
+def test_load_audio_array_gradio_tuple():
+    data = np.zeros(44100, dtype=np.int16)
+    audio = load_audio_array((44100, data))
+    assert audio.dtype == np.float32
+    assert abs(len(audio) - WHISPER_SAMPLE_RATE) <= 1
+
+def test_load_audio_array_wav_file(tmp_path):
+    path = str(tmp_path / "fala.wav")
+    _write_wav(path, np.full(32000, 8192), 32000)
+    audio = load_audio_array(path)
+    assert audio.shape == (16000,)
+    assert np.allclose(audio, 0.25)
+
+def test_load_audio_array_fallback():
+    # Formatos não suportados (ou arquivos inexistentes) ficam para o FFmpeg
+    assert load_audio_array("resposta.mp3") is None
+    assert load_audio_array("inexistente.wav") is None
+
+def _blocks(cfg, seconds, amplitude):
+    n = cfg.blocks(seconds)
+    return [np.full(cfg.block_size, amplitude, dtype=np.float32) for _ in range(n)]
+
+def test_endpointer_ends_after_hangover():
+    cfg = EndpointConfig(pre_roll=0.09, hangover=0.3, max_length=10.0)
+    ep = Endpointer(cfg)
+    stream = _blocks(cfg, 0.6, 0.0) + _blocks(cfg, 0.9, 0.2) + _blocks(cfg, 1.0, 0.0)
+
+    utterance = None
+    fed = 0
+    for block in stream:
+        fed += 1
+        utterance = ep.feed(block)
+        if utterance is not None:
+            break
+
+    # Encerra logo após o silêncio de hangover, sem esperar o resto do fluxo
+    assert utterance is not None
+    assert fed == cfg.blocks(0.6) + cfg.blocks(0.9) + cfg.blocks(0.3)
+    # Pré-roll + fala + hangover
+    expected_blocks = cfg.blocks(0.09) + cfg.blocks(0.9) - cfg.onset_blocks + cfg.blocks(0.3)
+    assert len(utterance) == expected_blocks * cfg.block_size
+
+def test_endpointer_max_length():
+    cfg = EndpointConfig(max_length=0.6)
+    ep = Endpointer(cfg)
+    results = [ep.feed(b) for b in _blocks(cfg, 2.0, 0.3)]
+    first = next(r for r in results if r is not None)
+    assert len(first) <= cfg.blocks(0.6 + cfg.pre_roll) * cfg.block_size
+
+def test_endpointer_start_timeout():
+    cfg = EndpointConfig(start_timeout=0.3)
+    ep = Endpointer(cfg)
+    for block in _blocks(cfg, 0.3, 0.0):
+        assert ep.feed(block) is None
+    assert ep.timed_out
+
+def test_frame_energy_matches_per_frame_rms():
+    from audio_utils import frame_energy
+    audio = np.random.default_rng(0).standard_normal(1000).astype(np.float32)
+    energy = frame_energy(audio, 480)
+    expected = [np.sqrt(np.mean(audio[i:i + 480] ** 2)) for i in range(0, 1000, 480)]
+    assert np.allclose(energy, expected, atol=1e-6)
+
+def test_trim_speech_skips_silence_and_noise():
+    from audio_utils import trim_speech
+    rng = np.random.default_rng(1)
+    assert trim_speech(np.zeros(16000 * 5, np.float32)) is None
+    assert trim_speech(np.zeros(0, np.float32)) is None
+    # Ruído constante, mesmo acima do mínimo, não é fala
+    assert trim_speech((0.02 * rng.standard_normal(16000 * 3)).astype(np.float32)) is None
+    # Um clique curto também não
+    click = np.zeros(16000, np.float32)
+    click[8000:8100] = 0.5
+    assert trim_speech(click) is None
+
+def test_trim_speech_cuts_edges_and_normalizes():
+    from audio_utils import TrimConfig, trim_speech
+    rng = np.random.default_rng(2)
+    audio = (0.001 * rng.standard_normal(16000 * 10)).astype(np.float32)
+    t = np.arange(16000) / 16000
+    audio[16000 * 4:16000 * 5] += (0.02 * np.sin(2 * np.pi * 200 * t)).astype(np.float32)
+
+    speech = trim_speech(audio, TrimConfig(pad=0.2))
+    assert speech.dtype == np.float32
+    assert 1.4 <= len(speech) / 16000 <= 1.5
+    # Fala baixa sobe para ~target_rms
+    assert abs(np.sqrt(np.mean(speech[3200:-3200] ** 2)) - 0.1) < 0.01
+
+def test_trim_speech_keeps_continuous_voiced_audio():
+    from audio_utils import TrimConfig, trim_speech
+    rng = np.random.default_rng(3)
+    t = np.arange(16000 * 3) / 16000
+    tone = (0.14 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    # Ruído modulado em amplitude (sílabas a 4 Hz), sem nenhuma pausa
+    modulated = [(0.1 * (1 + depth * np.sin(2 * np.pi * 4 * t)) * rng.standard_normal(t.size)).astype(np.float32)
+                 for depth in (0.3, 0.5)]
+    # Fala contínua: harmônicos com entonação variando, sem silêncio entre as palavras
+    pitch = 120 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / 16000
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6)) * (0.6 + 0.4 * np.abs(np.sin(2 * np.pi * 3 * t)))
+    voiced = (0.08 * voiced).astype(np.float32)
+
+    for audio in [tone, *modulated, voiced]:
+        speech = trim_speech(audio)
+        assert speech is not None
+        assert len(speech) == len(audio)
+
+    # Mesmo com uma estimativa de ruído que engole tudo, um clipe alto não é descartado
+    speech = trim_speech(tone, TrimConfig(max_noise=1.0))
+    assert speech is not None and len(speech) == len(tone)
+    assert abs(np.sqrt(np.mean(speech ** 2)) - 0.1) < 0.01
+
+def test_normalize_loudness_limits_gain_and_peak():
+    from audio_utils import TrimConfig, normalize_loudness
+    quiet = np.full(100, 0.001, np.float32)
+    assert np.allclose(normalize_loudness(quiet, 0.001, TrimConfig(max_gain=10)), 0.01)
+    loud = np.array([0.5, -0.9, 0.1], np.float32)
+    assert np.abs(normalize_loudness(loud, 0.05)).max() <= 0.99 + 1e-6
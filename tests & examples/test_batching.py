@@ -0,0 +1,79 @@
+import sys
+import os
+import threading
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batching import BatchedWhisper
+
+def _result(text, avg_logprob=-0.2, compression_ratio=1.2, no_speech_prob=0.01):
+    return SimpleNamespace(text=text, avg_logprob=avg_logprob,
+                           compression_ratio=compression_ratio, no_speech_prob=no_speech_prob)
+
+class RecordingBatcher(BatchedWhisper):
+    def __init__(self, *args, results=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_sizes = []
+        self._results = results
+
+    def _decode_batch(self, model, language, clips):
+        self.batch_sizes.append(len(clips))
+        if self._results is not None:
+            return self._results
+        # O "texto" de cada clipe é o seu tamanho, para conferir a devolução ao chamador certo
+        return [_result(f" {len(c)}") for c in clips]
+
+def _submit_concurrently(batcher, clips):
+    results = [None] * len(clips)
+    barrier = threading.Barrier(len(clips))
+    def run(i):
+        barrier.wait()
+        results[i] = batcher.transcribe(clips[i], language="pt", fp16=False)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(clips))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+def test_concurrent_requests_are_batched():
+    model = MagicMock()
+    batcher = RecordingBatcher(lambda: model, max_batch=4, max_wait=0.2)
+    clips = [np.zeros(16000 + i, dtype=np.float32) for i in range(6)]
+
+    results = _submit_concurrently(batcher, clips)
+
+    assert [r["text"] for r in results] == [str(len(c)) for c in clips]
+    assert max(batcher.batch_sizes) == 4
+    assert sum(batcher.batch_sizes) + model.transcribe.call_count == 6
+
+def test_single_request_uses_full_transcribe():
+    model = MagicMock()
+    model.transcribe.return_value = {"text": "oi"}
+    batcher = RecordingBatcher(lambda: model, max_wait=0.0)
+
+    assert batcher.transcribe(np.zeros(16000, np.float32), language="pt")["text"] == "oi"
+    assert batcher.batch_sizes == []
+
+def test_long_clips_and_paths_bypass_batch():
+    model = MagicMock()
+    model.transcribe.return_value = {"text": "longo"}
+    batcher = RecordingBatcher(lambda: model, max_wait=0.1)
+
+    results = _submit_concurrently(batcher, [np.zeros(31 * 16000, np.float32), np.zeros(40 * 16000, np.float32)])
+    assert [r["text"] for r in results] == ["longo", "longo"]
+    assert batcher.transcribe("audio.mp3", language="pt")["text"] == "longo"
+    assert batcher.batch_sizes == []
+
+def test_suspicious_results_fall_back_to_transcribe():
+    model = MagicMock()
+    model.transcribe.return_value = {"text": "refeito"}
+    results = [_result(" ok"), _result(" la la la la", compression_ratio=3.0), _result(" ...", avg_logprob=-2.0, no_speech_prob=0.9)]
+    batcher = RecordingBatcher(lambda: model, max_batch=3, max_wait=0.5, results=results)
+
+    out = _submit_concurrently(batcher, [np.zeros(16000, np.float32)] * 3)
+    assert sorted(r["text"] for r in out) == ["", "ok", "refeito"]
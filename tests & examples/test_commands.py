@@ -0,0 +1,67 @@
+import sys
+import os
+from unittest.mock import patch
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commands import CommandRegistry, CommandResult, default_registry, load_plugins
+
+def test_slot_extraction_and_accents():
+    registry = default_registry()
+    match = registry.match("Pesquisar   Wikipedia história do Brasil")
+    assert match.name == "wikipedia"
+    assert match.query == "história do brasil"
+
+    assert registry.match("VIDEO de gatos").query == "de gatos"
+    assert registry.match("farmacia").name == "farmacia"
+
+def test_whole_words_and_priority():
+    registry = default_registry()
+    # "videogame" não ativa o YouTube
+    assert registry.match("videogame novo") is None
+    # Com dois comandos na frase vale o registrado primeiro (mesma ordem do encadeamento antigo)
+    match = registry.match("vídeo da wikipedia")
+    assert match.name == "wikipedia" and match.query == "vídeo da"
+
+def test_empty_query_does_not_open_browser():
+    registry = default_registry()
+    with patch("webbrowser.open") as mock_open:
+        result = registry.dispatch("youtube")
+        assert result.success is False
+        mock_open.assert_not_called()
+
+def test_plugin_registration_at_runtime():
+    registry = default_registry()
+    assert registry.match("qual a previsão do tempo amanhã") is None
+
+    @registry.command("clima", ["clima", "previsao do tempo"])
+    def clima(query):
+        return CommandResult(True, f"Clima: {query}")
+
+    match = registry.match("qual a Previsão  do tempo amanhã")
+    assert match.name == "clima"
+    assert match.run().message == "Clima: qual a amanhã"
+
+    registry.unregister("clima")
+    assert registry.match("clima") is None
+
+def test_many_commands():
+    registry = CommandRegistry()
+    for i in range(2000):
+        registry.register(f"cmd{i}", [f"comando {i}"], lambda q, i=i: CommandResult(True, str(i)))
+    assert registry.match("executar comando 1234 agora").name == "cmd1234"
+    # "comando 12" não casa dentro de "comando 123"
+    assert registry.match("comando 123").name == "cmd123"
+
+def test_plugins_from_env_are_loaded_on_request(monkeypatch, tmp_path):
+    (tmp_path / "plugin_clima.py").write_text(
+        "def register(registry):\n"
+        "    registry.register('clima', ['clima'], lambda q: None)\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setenv("COMMAND_PLUGINS", "plugin_clima, plugin_inexistente")
+    registry = default_registry()
+    # A variável é lida na chamada (depois do .env), não na importação do módulo
+    assert load_plugins(registry) == ["plugin_clima"]
+    assert registry.match("clima hoje").name == "clima"
@@ -0,0 +1,124 @@
+import copy
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation import ConversationContext, estimate_tokens, history_turns, summarize_turns
+
+SYSTEM = "Você é um assistente."
+
+def make_history(n, answer_words=30):
+    history = []
+    for i in range(n):
+        history.append({"role": "user", "content": f"Pergunta número {i} sobre o assunto {i}?"})
+        history.append({"role": "assistant", "content": f"Resposta {i}. " + "palavra " * answer_words})
+    return history
+
+def test_history_turns_skips_incomplete_and_empty():
+    history = make_history(2) + [{"role": "user", "content": "sem resposta"}, {"role": "assistant", "content": ""}]
+    turns = history_turns(history)
+    assert len(turns) == 2
+    assert turns[0][0].startswith("Pergunta número 0")
+
+def test_short_conversation_keeps_every_turn():
+    context = ConversationContext(SYSTEM, max_tokens=2000, summary_tokens=100)
+    messages = context.build_messages(make_history(2), "E agora?")
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "user", "assistant", "user"]
+    assert messages[0]["content"] == SYSTEM
+    assert messages[-1]["content"] == "E agora?"
+
+def test_long_conversation_stays_within_budget():
+    context = ConversationContext(SYSTEM, max_tokens=400, summary_tokens=80)
+    for n in (5, 50, 500):
+        messages = context.build_messages(make_history(n), "E agora?")
+        total = sum(estimate_tokens(m["content"]) for m in messages)
+        assert total <= 400 + 8 * n  # margem do custo fixo por rodada
+        assert sum(estimate_tokens(m["content"]) for m in messages[2:-1]) <= context.turn_budget
+        # As rodadas antigas aparecem no resumo, logo após o prompt do sistema
+        assert messages[1]["content"].startswith("Resumo da conversa até aqui:")
+        assert f"Pergunta número {n - 1}" in messages[-3]["content"]
+
+def test_prefix_is_stable_between_folds():
+    context = ConversationContext(SYSTEM, max_tokens=400, summary_tokens=80)
+    history = make_history(20)
+    prefixes = []
+    for n in range(10, 20):
+        messages = context.build_messages(history[:2 * n], "E agora?")
+        prefixes.append(messages[:-1])
+    # Na maioria das perguntas o prompt anterior continua sendo prefixo do seguinte
+    stable = sum(1 for a, b in zip(prefixes, prefixes[1:]) if b[:len(a)] == a)
+    assert stable >= len(prefixes) // 2
+
+def test_summarizer_runs_once_per_fold():
+    calls = []
+
+    def summarizer(summary, turns, max_tokens):
+        calls.append(len(turns))
+        return summarize_turns(summary, turns, max_tokens)
+
+    context = ConversationContext(SYSTEM, max_tokens=400, summary_tokens=80, summarizer=summarizer)
+    history = make_history(30)
+    context.build_messages(history, "a")
+    first = len(calls)
+    context.build_messages(history, "b")
+    assert first > 0 and len(calls) == first
+
+def test_summary_respects_its_own_limit():
+    turns = [(f"pergunta {i}", "Uma resposta longa. Segunda frase.") for i in range(100)]
+    summary = summarize_turns("", turns, max_tokens=60)
+    assert estimate_tokens(summary) <= 60
+    assert "pergunta 99" in summary and "Segunda frase" not in summary
+
+def test_cache_prefix_depends_on_context():
+    context = ConversationContext(SYSTEM)
+    first = context.build_messages([], "oi")
+    assert context.cache_prefix(first) == SYSTEM
+    follow_up = context.build_messages(make_history(1), "oi")
+    assert context.cache_prefix(follow_up) != SYSTEM
+
+def test_context_survives_deepcopy():
+    context = ConversationContext(SYSTEM, max_tokens=300, summary_tokens=60)
+    context.build_messages(make_history(20), "E agora?")
+    clone = copy.deepcopy(context)
+    assert clone._summaries == context._summaries
+    assert clone._lock is not context._lock
+    assert clone.build_messages(make_history(20), "E agora?") == context.build_messages(make_history(20), "E agora?")
+
+@pytest.fixture
+def real_gradio(monkeypatch):
+    # Outros testes trocam o gradio por um MagicMock; aqui o evento passa pelo servidor de verdade
+    monkeypatch.setenv("GRADIO_ANALYTICS_ENABLED", "False")
+    with patch.dict(sys.modules):
+        for name in ("gradio", "gradio_client"):
+            if isinstance(sys.modules.get(name), MagicMock):
+                del sys.modules[name]
+        gr = pytest.importorskip("gradio")
+        client = pytest.importorskip("gradio_client")
+        yield gr, client
+
+def test_gradio_state_copies_the_context(real_gradio):
+    gr, gradio_client = real_gradio
+    from app import build_messages, new_conversation
+
+    def ask(text, context):
+        context, messages = build_messages(text, [], context)
+        return f"{type(context).__name__}:{len(messages)}"
+
+    with gr.Blocks() as demo:
+        conversation_state = gr.State(new_conversation)
+        question = gr.Textbox()
+        answer = gr.Textbox()
+        question.submit(ask, [question, conversation_state], answer, api_name="ask")
+    demo.launch(prevent_thread_lock=True, server_name="127.0.0.1", quiet=True)
+    try:
+        client = gradio_client.Client(demo.local_url, verbose=False)
+        # Duas chamadas: o Gradio faz deepcopy do valor do gr.State em cada uma
+        assert client.predict("Oi", api_name="/ask") == "ConversationContext:2"
+        assert client.predict("Tudo bem?", api_name="/ask") == "ConversationContext:2"
+    finally:
+        demo.close()
@@ -0,0 +1,101 @@
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_cache import ResponseCache, CachedIntelligence, default_ttl_for
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+def test_normalized_hit_and_counters():
+    cache = ResponseCache()
+    cache.put("glm", "sistema", "Bom dia!", "Bom dia! Como posso ajudar?")
+
+    assert cache.get("glm", "sistema", "  bom   DIA ") == "Bom dia! Como posso ajudar?"
+    # Modelo ou prompt de sistema diferentes não compartilham respostas
+    assert cache.get("gpt", "sistema", "bom dia") is None
+    assert cache.get("glm", "outro", "bom dia") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_ttl_per_entry():
+    clock = FakeClock()
+    cache = ResponseCache(clock=clock)
+    cache.put("glm", "s", "Que horas são?", "São 10h.")
+    cache.put("glm", "s", "Qual a capital do Brasil?", "Brasília.")
+
+    clock.now += 120
+    # Perguntas dependentes do tempo expiram rápido
+    assert default_ttl_for("que horas sao") < default_ttl_for("capital do brasil")
+    assert cache.get("glm", "s", "que horas são") is None
+    assert cache.get("glm", "s", "qual a capital do brasil") == "Brasília."
+
+def test_lru_eviction_by_bytes():
+    cache = ResponseCache(max_bytes=3 * (64 + 10))
+    for i in range(3):
+        cache.put("m", "s", f"pergunta {i}", "x" * 10)
+    cache.get("m", "s", "pergunta 0")
+    cache.put("m", "s", "pergunta 3", "x" * 10)
+
+    assert cache.get("m", "s", "pergunta 1") is None
+    assert cache.get("m", "s", "pergunta 0") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_persistence(tmp_path):
+    path = str(tmp_path / "respostas.db")
+    cache = ResponseCache(path=path)
+    cache.put("glm", "s", "bom dia", "Bom dia!")
+    cache.close()
+
+    reopened = ResponseCache(path=path)
+    assert reopened.get("glm", "s", "Bom dia") == "Bom dia!"
+    reopened.close()
+
+def test_cached_intelligence_skips_errors():
+    inner = MagicMock()
+    inner.model = "gpt-3.5-turbo"
+    inner.system_prompt = "sistema"
+    inner.process.side_effect = ["Erro na IA: timeout", "Olá!", "outra"]
+    ai = CachedIntelligence(inner, ResponseCache())
+
+    assert ai.process("oi") == "Erro na IA: timeout"
+    assert ai.process("oi") == "Olá!"
+    assert ai.process("Oi!") == "Olá!"
+    assert inner.process.call_count == 2
+
+def test_cached_intelligence_keys_on_conversation_context():
+    class ContextualAI:
+        model = "gpt"
+        system_prompt = "sistema"
+
+        def __init__(self):
+            self.history = []
+            self.calls = 0
+
+        def cache_prefix(self, text):
+            return "sistema|" + "|".join(self.history)
+
+        def remember(self, text, response):
+            self.history += [text, response]
+
+        def process(self, text):
+            self.calls += 1
+            response = f"resposta {self.calls}"
+            self.remember(text, response)
+            return response
+
+    inner = ContextualAI()
+    ai = CachedIntelligence(inner, ResponseCache())
+    assert ai.process("e a população?") == "resposta 1"
+    # Mesma pergunta, mas com outra conversa antes: não pode vir do cache
+    assert ai.process("e a população?") == "resposta 2"
+
+    fresh = ContextualAI()
+    cached = CachedIntelligence(fresh, ai.cache)
+    assert cached.process("e a população?") == "resposta 1"
+    assert fresh.calls == 0 and fresh.history == ["e a população?", "resposta 1"]
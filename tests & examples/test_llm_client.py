@@ -0,0 +1,76 @@
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_client
+from llm_client import ClientConfig, get_client, prewarm, close_clients
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    peers = set()
+
+    def _reply(self):
+        KeepAliveHandler.peers.add(self.client_address)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._reply()
+
+    def do_GET(self):
+        self._reply()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+def test_client_is_cached_and_pooled():
+    mock_openai = MagicMock()
+    with patch.dict(sys.modules, {"openai": mock_openai}):
+        close_clients()
+        config = ClientConfig(max_connections=7, max_keepalive=3, timeout=12.0)
+        a = get_client("chave", "http://exemplo/v1", config)
+        b = get_client("chave", "http://exemplo/v1", config)
+
+        assert a is b
+        mock_openai.OpenAI.assert_called_once()
+        kwargs = mock_openai.OpenAI.call_args[1]
+        http_client = kwargs["http_client"]
+        assert kwargs["timeout"] == 12.0
+        assert http_client._transport._pool._max_connections == 7
+        close_clients()
+
+def test_http2_falls_back_without_h2():
+    with patch.object(llm_client, "_http2_available", return_value=False):
+        http_client = llm_client._build_http_client(ClientConfig(http2=True))
+        http_client.close()
+
+def test_config_from_env(monkeypatch):
+    monkeypatch.setenv("LLM_MAX_CONNECTIONS", "50")
+    monkeypatch.setenv("LLM_HTTP2", "true")
+    config = ClientConfig.from_env()
+    assert config.max_connections == 50 and config.http2 is True
+
+def test_prewarm_connection_is_reused():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    KeepAliveHandler.peers.clear()
+    try:
+        with patch.dict(sys.modules, {"openai": MagicMock()}):
+            close_clients()
+            assert prewarm("chave", base_url)
+            http_client = llm_client._http_clients[(base_url, "chave")]
+            for _ in range(3):
+                http_client.get(base_url + "/models")
+            # Todas as requisições usaram a conexão aberta no pré-aquecimento
+            assert len(KeepAliveHandler.peers) == 1
+            close_clients()
+    finally:
+        server.shutdown()
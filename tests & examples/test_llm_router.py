@@ -0,0 +1,285 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import random
+import select
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import close_clients, get_async_client, run_async
+from llm_router import COMPLETE, STREAM, Backend, BackendState, LLMRouter, backends_from_env
+from resilience import CircuitBreaker, CircuitOpen
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Conexões da requisição perdedora são fechadas pelo cliente no meio da resposta
+        pass
+
+
+class StubLLMServer:
+    """Servidor local compatível com a API da OpenAI, com latência e status configuráveis."""
+
+    def __init__(self, answer: str, latency: float = 0.0, status: int = 200):
+        self.answer = answer
+        self.latency = latency
+        self.status = status
+        self.requests = 0
+        self.disconnected = 0  # requisições abandonadas pelo cliente antes da resposta
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                if not self._wait(server.latency):
+                    server.disconnected += 1
+                    return
+                if server.status != 200:
+                    self._send(server.status, "application/json", json.dumps({"error": {"message": "indisponível"}}))
+                elif body.get("stream"):
+                    events = "".join(
+                        "data: " + json.dumps({"id": "c", "object": "chat.completion.chunk", "created": 0,
+                                               "model": "stub", "choices": [{"index": 0, "delta": {"content": word},
+                                                                             "finish_reason": None}]}) + "\n\n"
+                        for word in server.answer.split(" ")
+                    )
+                    self._send(200, "text/event-stream", events + "data: [DONE]\n\n")
+                else:
+                    self._send(200, "application/json", json.dumps({
+                        "id": "c", "object": "chat.completion", "created": 0, "model": "stub",
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": server.answer}}],
+                    }))
+
+            def _wait(self, seconds):
+                # Espera a latência configurada; False se o cliente fechou a conexão antes
+                deadline = time.monotonic() + seconds
+                while True:
+                    remaining = deadline - time.monotonic()
+                    readable, _, _ = select.select([self.connection], [], [], max(0.0, min(0.01, remaining)))
+                    if readable and not self.connection.recv(1, socket.MSG_PEEK):
+                        return False
+                    if remaining <= 0:
+                        return True
+
+            def _send(self, status, content_type, text):
+                data = text.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._httpd = QuietHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+        threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture(scope="module")
+def real_openai():
+    # Outros testes trocam o openai por um MagicMock; aqui as requisições são de verdade
+    with patch.dict(sys.modules):
+        if isinstance(sys.modules.get("openai"), MagicMock):
+            del sys.modules["openai"]
+        close_clients()
+        yield
+        close_clients()
+
+
+@pytest.fixture
+def servers(real_openai):
+    created = []
+
+    def make(*args, **kwargs):
+        server = StubLLMServer(*args, **kwargs)
+        created.append(server)
+        return server
+
+    yield make
+    for server in created:
+        server.close()
+
+
+MESSAGES = [{"role": "user", "content": "Oi"}]
+
+
+def test_routes_to_fastest_backend(servers):
+    slow = servers("lento", latency=0.15)
+    fast = servers("rápido", latency=0.0)
+    router = LLMRouter([Backend("slow", slow.url, "k", "m"), Backend("fast", fast.url, "k", "m")], explore=0)
+
+    # Os dois são medidos primeiro; depois tudo vai para o mais rápido
+    answers = [router.complete(MESSAGES) for _ in range(6)]
+    assert answers[-4:] == ["rápido"] * 4
+    assert slow.requests == 1
+    assert router.stats()["fast"]["latency"][COMPLETE] < router.stats()["slow"]["latency"][COMPLETE]
+    assert router.stats()["fast"]["latency"][STREAM] is None
+
+
+def test_fails_over_and_opens_breaker(servers):
+    broken = servers("quebrado", status=503)
+    healthy = servers("ok")
+    retries = []
+    router = LLMRouter([Backend("broken", broken.url, "k", "m"), Backend("healthy", healthy.url, "k", "m")],
+                       explore=0, failure_threshold=2, on_retry=lambda name, error: retries.append(name))
+    for mode in (STREAM, COMPLETE):
+        router.state("healthy").record_success(1.0, mode)  # o quebrado parece o mais rápido
+
+    assert router.complete(MESSAGES) == "ok"
+    assert router.complete(MESSAGES) == "ok"
+    assert retries == ["broken", "broken"]
+    assert router.state("broken").breaker.state == CircuitBreaker.OPEN
+    # Com o disjuntor aberto, o backend quebrado nem é consultado
+    assert "".join(router.stream(MESSAGES)) == "ok"
+    assert broken.requests == 2
+
+
+def test_all_backends_down_raises_circuit_open(servers):
+    broken = servers("quebrado", status=502)
+    router = LLMRouter([Backend("broken", broken.url, "k", "m")], failure_threshold=1)
+    with pytest.raises(Exception) as failure:
+        router.complete(MESSAGES)
+    # O erro leva o nome do backend (rótulo das novas tentativas em /metrics)
+    assert failure.value.llm_backend == "broken"
+    with pytest.raises(CircuitOpen):
+        router.complete(MESSAGES)
+
+
+def _wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+async def _create_client(backend):
+    get_async_client(backend.api_key, backend.base_url)
+
+
+def test_hedged_request_beats_degraded_backend(servers):
+    degraded = servers("lento", latency=1.0)
+    backup = servers("cópia", latency=0.0)
+    router = LLMRouter([Backend("degraded", degraded.url, "k", "m"), Backend("backup", backup.url, "k", "m")],
+                       hedge=True, hedge_delay=0.05, explore=0)
+    for mode in (STREAM, COMPLETE):
+        router.state("backup").record_success(5.0, mode)  # pelas medidas, o degradado seria o melhor
+    for backend in router.backends:
+        # Importação do openai e criação dos clientes fora da medida
+        run_async(_create_client(backend)).result()
+
+    started = time.perf_counter()
+    assert router.complete(MESSAGES) == "cópia"
+    assert time.perf_counter() - started < 0.8
+    assert router.stats()["backup"]["hedges"] == 1
+    # A requisição perdedora foi cancelada: o servidor lento viu a conexão fechar antes de responder
+    assert _wait_for(lambda: degraded.disconnected == 1, timeout=0.5)
+
+    started = time.perf_counter()
+    assert "".join(router.stream(MESSAGES)) == "cópia"
+    assert time.perf_counter() - started < 0.8
+    assert _wait_for(lambda: degraded.disconnected == 2, timeout=0.5)
+    # A demora do perdedor não entra nas medidas de nenhum modo
+    assert router.stats()["degraded"]["latency"] == {STREAM: None, COMPLETE: None}
+
+
+def _answering_client(answer, latency):
+    async def create(**kwargs):
+        await asyncio.sleep(latency)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))])
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_hedge_cancelled_before_starting_releases_probe():
+    clients = {"http://a": _answering_client("a", 0.2), "http://b": _answering_client("b", 0.0)}
+    router = LLMRouter([Backend("a", "http://a", "k", "m"), Backend("b", "http://b", "k", "m")],
+                       hedge=True, hedge_delay=0.05, explore=0, reset_timeout=0.05,
+                       async_client_factory=lambda key, url: clients[url])
+    router.state("a").record_success(0.1, COMPLETE)
+    router.state("b").record_success(0.5, COMPLETE)
+    breaker = router.state("b").breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert _wait_for(lambda: breaker.state == CircuitBreaker.HALF_OPEN)
+
+    def never_started(coro):
+        # A cópia para o b fica na fila do laço e é cancelada antes de rodar
+        if coro.cr_frame.f_locals["state"].backend.name == "b":
+            coro.close()
+            return concurrent.futures.Future()
+        return run_async(coro)
+
+    with patch("llm_router.run_async", never_started):
+        assert router.complete(MESSAGES) == "a"
+    assert router.stats()["b"]["hedges"] == 1
+    # O teste do disjuntor meio-aberto foi devolvido: a próxima requisição pode usá-lo
+    breaker.before_call()
+
+
+def test_hedge_delay_follows_latency_percentile():
+    router = LLMRouter([], hedge_delay=2.0, min_samples=10, hedge_quantile=0.9)
+    state = BackendState(Backend("a", "http://a", "k", "m"), CircuitBreaker())
+    for _ in range(5):
+        state.record_success(0.1, STREAM)
+    assert router.hedge_after(state, STREAM) == 2.0
+    for seconds in [0.1] * 14 + [0.5] * 1:
+        state.record_success(seconds, STREAM)
+    assert router.hedge_after(state, STREAM) == pytest.approx(0.1)
+    # Respostas inteiras têm medidas próprias: as do primeiro token não valem para elas
+    assert router.hedge_after(state, COMPLETE) == 2.0
+    for _ in range(10):
+        state.record_success(3.0, COMPLETE)
+    assert router.hedge_after(state, COMPLETE) == pytest.approx(3.0)
+    assert router.hedge_after(state, STREAM) == pytest.approx(0.1)
+
+
+def test_errors_lower_the_ranking():
+    a = BackendState(Backend("a", "http://a", "k", "m"), CircuitBreaker(failure_threshold=100))
+    b = BackendState(Backend("b", "http://b", "k", "m"), CircuitBreaker(failure_threshold=100))
+    a.record_success(0.2, STREAM)
+    b.record_success(0.3, STREAM)
+    assert a.score(STREAM) < b.score(STREAM)
+    a.record_failure(TimeoutError())
+    a.record_failure(TimeoutError())
+    assert a.score(STREAM) > b.score(STREAM)
+
+
+def test_exploration_sometimes_tries_other_backend():
+    router = LLMRouter([Backend("a", "http://a", "k", "m"), Backend("b", "http://b", "k", "m")],
+                       explore=0.5, rng=random.Random(3))
+    router.state("a").record_success(0.1, STREAM)
+    router.state("b").record_success(0.5, STREAM)
+    firsts = {router.ranked()[0].backend.name for _ in range(50)}
+    assert firsts == {"a", "b"}
+
+
+def test_backends_from_env(monkeypatch):
+    monkeypatch.setenv("HF_TOKEN", "hf_x")
+    monkeypatch.setenv("OPENAI_API_KEY", "sua_chave_api_aqui")
+    monkeypatch.setenv("LLM_BACKENDS", "hf,openai,local")
+    monkeypatch.setenv("LLM_LOCAL_URL", "http://127.0.0.1:8080/v1")
+    monkeypatch.setenv("LLM_LOCAL_MODEL", "qwen")
+    backends = backends_from_env()
+    assert [(b.name, b.model) for b in backends] == [("hf", "zai-org/GLM-4.7-Flash"), ("local", "qwen")]
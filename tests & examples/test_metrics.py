@@ -0,0 +1,108 @@
+import sys
+import os
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from metrics import MetricsRegistry
+from stage_timing import LatencyRecorder
+
+def test_render_counter_and_gauge():
+    registry = MetricsRegistry(enabled=True)
+    errors = registry.counter("x_errors_total", "Erros.", ["stage"])
+    in_flight = registry.gauge("x_in_flight", "Em andamento.", ["handler"])
+
+    errors.inc(stage="llm")
+    errors.inc(2, stage='t"ts')
+    with in_flight.track(handler="chat"):
+        assert in_flight.value(handler="chat") == 1
+    assert in_flight.value(handler="chat") == 0
+
+    text = registry.render()
+    assert "# TYPE x_errors_total counter" in text
+    assert 'x_errors_total{stage="llm"} 1' in text
+    # Aspas nos rótulos são escapadas
+    assert 'x_errors_total{stage="t\\"ts"} 2' in text
+    assert 'x_in_flight{handler="chat"} 0' in text
+    assert text.endswith("\n")
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry(enabled=True)
+    hist = registry.histogram("x_seconds", "Duração.", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        hist.observe(value, stage="llm")
+
+    text = registry.render()
+    assert 'x_seconds_bucket{stage="llm",le="0.1"} 1' in text
+    assert 'x_seconds_bucket{stage="llm",le="1"} 3' in text
+    assert 'x_seconds_bucket{stage="llm",le="+Inf"} 4' in text
+    assert 'x_seconds_count{stage="llm"} 4' in text
+    assert 'x_seconds_sum{stage="llm"} 4.25' in text
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    errors = registry.counter("x_errors_total", "Erros.")
+    hist = registry.histogram("x_seconds", "Duração.")
+    errors.inc()
+    hist.observe(1.0)
+    assert errors.value() == 0
+    assert "x_seconds_count" not in registry.render()
+
+def test_callback_metric_reads_at_collection():
+    registry = MetricsRegistry(enabled=True)
+    state = {"hits": 0}
+    registry.callback("x_cache_total", "Cache.", "counter", ["result"],
+                      lambda: [({"result": "hit"}, state["hits"])])
+    state["hits"] = 5
+    assert 'x_cache_total{result="hit"} 5' in registry.render()
+
+    # Falha na coleta não derruba o /metrics
+    registry.callback("x_broken", "Quebrada.", "gauge", [], lambda: 1 / 0)
+    assert "# TYPE x_broken gauge" in registry.render()
+
+def test_recorder_listener_feeds_stage_histogram():
+    recorder = LatencyRecorder()
+    seen = []
+    recorder.add_listener(lambda name, seconds: seen.append((name, seconds)))
+    recorder.record("tts", 0.2)
+    assert seen == [("tts", 0.2)]
+
+    before = metrics.STAGE_SECONDS._values.get(("decode",), [None, 0.0, 0])[2]
+    metrics.recorder.record("decode", 0.01)
+    after = metrics.STAGE_SECONDS._values[("decode",)][2]
+    assert after == before + (1 if metrics.registry.enabled else 0)
+
+def test_metrics_route_serves_prometheus_text():
+    from starlette.applications import Starlette
+    from starlette.testclient import TestClient
+
+    registry = MetricsRegistry(enabled=True)
+    registry.counter("x_total", "Total.").inc()
+    app = Starlette(routes=[registry.route()])
+    client = TestClient(app, base_url="http://127.0.0.1:7860", client=("127.0.0.1", 50000))
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "x_total 1" in response.text
+
+def test_metrics_route_refuses_remote_and_tunneled_requests():
+    from starlette.applications import Starlette
+    from starlette.testclient import TestClient
+
+    registry = MetricsRegistry(enabled=True)
+    app = Starlette(routes=[registry.route(token="segredo")])
+    remote = TestClient(app, base_url="http://192.168.0.10:7860", client=("192.168.0.20", 50000))
+    assert remote.get("/metrics").status_code == 403
+    assert remote.get("/metrics", headers={"Authorization": "Bearer segredo"}).status_code == 200
+
+    # O link público chega pelo túnel local: cliente 127.0.0.1, mas outro host
+    local = TestClient(app, base_url="http://127.0.0.1:7860", client=("127.0.0.1", 50000))
+    assert local.get("/metrics").status_code == 200
+    assert local.get("/metrics", headers={"Host": "abc123.gradio.live"}).status_code == 403
+    assert local.get("/metrics", headers={"X-Forwarded-For": "203.0.113.5"}).status_code == 403
+
+def test_enabled_flag_is_read_on_first_use(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setenv("METRICS_ENABLED", "false")  # como se viesse do .env, depois da importação
+    assert registry.enabled is False
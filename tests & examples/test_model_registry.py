@@ -0,0 +1,145 @@
+import sys
+import os
+import threading
+import time
+from unittest.mock import MagicMock
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from model_registry import (WhisperModelRegistry, default_model_size, load_quantized, load_snapshot, model_spec,
+                            parse_model_spec, quantize_int8, save_quantized, save_snapshot)
+
+def _slow_loader(calls):
+    def loader(model_size):
+        calls.append(model_size)
+        time.sleep(0.05)
+        model = MagicMock()
+        model.transcribe.return_value = {"text": ""}
+        return model
+    return loader
+
+def test_concurrent_get_loads_once():
+    calls = []
+    registry = WhisperModelRegistry("tiny", loader=_slow_loader(calls))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ["tiny"]
+    assert all(m is results[0] for m in results)
+
+def test_start_warms_up_and_reports_ready():
+    calls = []
+    registry = WhisperModelRegistry("small", loader=_slow_loader(calls))
+    assert registry.status()["state"] == "carregando"
+
+    registry.start()
+    assert registry.wait_ready(timeout=5)
+    status = registry.status()
+    assert status["state"] == "pronto" and status["model"] == "small"
+
+    # Aquecimento com um clipe sintético antes da primeira requisição
+    model = registry.get()
+    model.transcribe.assert_called_once()
+    assert model.transcribe.call_args[1]["language"] == "pt"
+
+def test_model_size_from_env(monkeypatch):
+    monkeypatch.setenv("WHISPER_MODEL", "medium")
+    assert WhisperModelRegistry(loader=MagicMock()).model_size == "medium"
+
+def test_load_error_is_reported():
+    registry = WhisperModelRegistry("base", loader=MagicMock(side_effect=RuntimeError("sem memória")))
+    registry.start()
+    assert not registry.wait_ready(timeout=5)
+    assert registry.status()["state"] == "erro"
+    assert "sem memória" in registry.status()["error"]
+
+def test_parse_model_spec():
+    assert parse_model_spec("base") == ("base", None)
+    assert parse_model_spec("base-int8") == ("base", "int8")
+    assert parse_model_spec("large-v3") == ("large-v3", None)
+    assert parse_model_spec("large-v3-int8") == ("large-v3", "int8")
+
+def test_model_spec_from_config(monkeypatch):
+    monkeypatch.delenv("WHISPER_QUANTIZE", raising=False)
+    assert model_spec("base") == "base"
+    monkeypatch.setenv("WHISPER_QUANTIZE", "int8")
+    assert model_spec("base") == "base-int8"
+    # O sufixo explícito no nome tem prioridade
+    assert model_spec("tiny-int8") == "tiny-int8"
+    monkeypatch.setenv("WHISPER_MODEL", "small")
+    assert default_model_size() == "small-int8"
+    with pytest.raises(ValueError):
+        model_spec("base", quantize="int4")
+
+def test_registry_passes_quantized_spec_to_loader():
+    calls = []
+    registry = WhisperModelRegistry("base-int8", loader=_slow_loader(calls), warmup=False)
+    registry.get()
+    assert calls == ["base-int8"]
+
+def test_quantize_int8_replaces_linear_subclasses():
+    if isinstance(sys.modules.get("torch"), MagicMock):
+        pytest.skip("torch substituído por mock em outro teste")
+    torch = pytest.importorskip("torch")
+    from torch import nn
+
+    class Linear(nn.Linear):
+        # Como whisper.model.Linear: só converte o dtype do peso
+        def forward(self, x):
+            return nn.functional.linear(x, self.weight.to(x.dtype), self.bias)
+
+    model = nn.Sequential(Linear(16, 8), nn.ReLU(), nn.Linear(8, 4))
+    x = torch.randn(2, 16)
+    expected = model(x)
+    quantized = quantize_int8(model)
+    assert all(type(m).__module__.startswith("torch.ao.nn.quantized") for m in (quantized[0], quantized[2]))
+    assert torch.allclose(quantized(x), expected, atol=0.1)
+
+def test_quantized_cache_stores_weights_only(tmp_path):
+    if isinstance(sys.modules.get("torch"), MagicMock):
+        pytest.skip("torch substituído por mock em outro teste")
+    torch = pytest.importorskip("torch")
+    from torch import nn
+
+    build = lambda dims: nn.Sequential(nn.Linear(16, 8), nn.ReLU(), nn.Linear(8, 4))
+    model = quantize_int8(build(None))
+    x = torch.randn(2, 16)
+    path = str(tmp_path / "m-int8.pt")
+    meta = {"torch": torch.__version__, "checkpoint": "abc"}
+    save_quantized(model, path, meta)
+
+    # Arquivo lido com weights_only=True: só tensores, sem objetos serializados
+    loaded = load_quantized(path, meta, build)
+    assert torch.allclose(loaded(x), model(x))
+    with pytest.raises(ValueError):
+        load_quantized(path, dict(meta, checkpoint="outro"), build)
+
+def test_snapshot_checks_versions_and_device(tmp_path):
+    if isinstance(sys.modules.get("torch"), MagicMock) or isinstance(sys.modules.get("whisper"), MagicMock):
+        pytest.skip("torch/whisper substituídos por mock em outro teste")
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("whisper")
+    from whisper.model import ModelDimensions, Whisper
+
+    dims = ModelDimensions(n_mels=80, n_audio_ctx=16, n_audio_state=8, n_audio_head=2, n_audio_layer=1,
+                           n_vocab=64, n_text_ctx=8, n_text_state=8, n_text_head=2, n_text_layer=1)
+    model = Whisper(dims)
+    path = str(tmp_path / "tiny.pt")
+    meta = {"torch": torch.__version__, "checkpoint": "abc"}
+    save_snapshot(model, path, meta)
+
+    loaded = load_snapshot(path, meta, device="cpu")
+    assert all(torch.equal(a, b) for a, b in zip(loaded.parameters(), model.parameters()))
+    # Snapshot de outra versão do torch/whisper ou de outro checkpoint é recusado
+    with pytest.raises(ValueError):
+        load_snapshot(path, dict(meta, checkpoint="outro"), device="cpu")
+    # Sem device explícito, o modelo vai para onde o whisper.load_model o colocaria
+    expected = "cuda" if torch.cuda.is_available() else "cpu"
+    assert load_snapshot(path, meta).device.type == expected
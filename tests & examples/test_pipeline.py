@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+import threading
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import ConversationPipeline
+
+class ScriptedSTT:
+    def __init__(self, inputs, delay=0.0):
+        self._inputs = list(inputs)
+        self._delay = delay
+        self.listen_times = []
+    def listen(self, timeout=None):
+        time.sleep(self._delay)
+        self.listen_times.append(time.perf_counter())
+        return self._inputs.pop(0) if self._inputs else "sair"
+
+class RecordingTTS:
+    def __init__(self, delay=0.0):
+        self.spoken = []
+        self._delay = delay
+        self.speaking = threading.Event()
+    def speak(self, text):
+        self.speaking.set()
+        time.sleep(self._delay)
+        self.spoken.append(text)
+        self.speaking.clear()
+
+def test_replies_in_order_with_greeting_and_farewell():
+    stt = ScriptedSTT(["um", None, "dois", "tchau", "nunca ouvido"])
+    tts = RecordingTTS()
+    pipeline = ConversationPipeline(stt, tts, lambda text: text.upper(), greeting="Olá")
+    pipeline.run()
+
+    assert tts.spoken == ["Olá", "UM", "DOIS", "Até logo!"]
+    assert pipeline.turns == 2
+    # Depois da palavra de saída o microfone não é mais usado
+    assert len(stt.listen_times) == 4
+
+def test_stages_overlap():
+    # 3 falas: ouvir 0.1 s, responder 0.1 s, falar 0.1 s. Em sequência seriam ~0.9 s.
+    stt = ScriptedSTT(["a", "b", "c"], delay=0.1)
+    tts = RecordingTTS(delay=0.1)
+
+    def respond(text):
+        time.sleep(0.1)
+        return text
+
+    start = time.perf_counter()
+    ConversationPipeline(stt, tts, respond, farewell=None).run()
+    elapsed = time.perf_counter() - start
+
+    assert tts.spoken == ["a", "b", "c"]
+    assert elapsed < 0.75
+
+def test_error_in_stage_stops_pipeline():
+    stt = ScriptedSTT(["ok", "falha", "depois"])
+    tts = RecordingTTS()
+
+    def respond(text):
+        if text == "falha":
+            raise RuntimeError("erro no estágio")
+        return text
+
+    try:
+        ConversationPipeline(stt, tts, respond).run()
+        assert False, "o erro deveria ser propagado"
+    except RuntimeError as e:
+        assert "erro no estágio" in str(e)
+    assert "depois" not in tts.spoken
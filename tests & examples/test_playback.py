@@ -0,0 +1,82 @@
+import sys
+import os
+import io
+import wave
+import numpy as np
+from unittest.mock import MagicMock
+
+# Mock do sounddevice com as exceções reais usadas pelo callback
+mock_sd = MagicMock()
+class CallbackStop(Exception):
+    pass
+class CallbackAbort(Exception):
+    pass
+mock_sd.CallbackStop = CallbackStop
+mock_sd.CallbackAbort = CallbackAbort
+sys.modules["sounddevice"] = mock_sd
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playback import AudioPlayer, decode_audio
+
+def start_player(pcm, sr=24000):
+    mock_sd.reset_mock()
+    sys.modules["sounddevice"] = mock_sd
+    player = AudioPlayer(blocksize=4)
+    player._sd = mock_sd
+    handle = player.play(pcm, sr)
+    kwargs = mock_sd.OutputStream.call_args[1]
+    return player, handle, kwargs["callback"], kwargs["finished_callback"]
+
+def test_plays_until_end():
+    pcm = np.arange(10, dtype=np.float32)
+    _player, handle, callback, finished = start_player(pcm)
+    out = []
+    try:
+        while True:
+            buf = np.full((4, 1), -1, dtype=np.float32)
+            callback(buf, 4, None, None)
+            out.append(buf.copy())
+    except CallbackStop:
+        out.append(buf.copy())
+    finished()
+
+    played = np.concatenate(out).reshape(-1)
+    assert np.array_equal(played[:10], pcm)
+    assert np.all(played[10:] == 0)
+    assert handle.wait(timeout=1) and not handle.interrupted
+    mock_sd.OutputStream.return_value.close.assert_called_once()
+
+def test_stop_aborts_on_next_block():
+    player, handle, callback, finished = start_player(np.ones(100, dtype=np.float32))
+    buf = np.zeros((4, 1), dtype=np.float32)
+    callback(buf, 4, None, None)
+
+    player.stop()
+    buf = np.ones((4, 1), dtype=np.float32)
+    try:
+        callback(buf, 4, None, None)
+        assert False, "o callback deveria abortar"
+    except CallbackAbort:
+        pass
+    assert np.all(buf == 0)
+    assert not handle.done
+    finished()
+    assert handle.wait(timeout=1) and handle.interrupted
+
+def test_new_playback_stops_previous():
+    player, first, _callback, _finished = start_player(np.ones(100, dtype=np.float32))
+    player.play(np.ones(10, dtype=np.float32), 24000)
+    assert first.interrupted
+
+def test_decode_wav_in_memory():
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(22050)
+        w.writeframes(np.array([0, 16384, -16384], dtype=np.int16).tobytes())
+    pcm, sr = decode_audio(buf.getvalue())
+    assert sr == 22050
+    assert np.allclose(pcm, [0, 0.5, -0.5])
@@ -0,0 +1,205 @@
+import asyncio
+import os
+import random
+import sys
+
+import pytest
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resilience import (AUTH, CLIENT, RATE_LIMITED, TRANSIENT, UNKNOWN, Backoff, CircuitBreaker,
+                        CircuitOpen, RetryPolicy, classify_error)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+def test_classify_by_status_and_type():
+    assert classify_error(StatusError(503)) == TRANSIENT
+    assert classify_error(StatusError(504)) == TRANSIENT
+    assert classify_error(StatusError(429)) == RATE_LIMITED
+    assert classify_error(StatusError(401)) == AUTH
+    assert classify_error(StatusError(400)) == CLIENT
+    assert classify_error(APITimeoutError("lento")) == TRANSIENT
+    assert classify_error(TimeoutError()) == TRANSIENT
+    # O texto da mensagem não decide: "504" num erro qualquer não é transitório
+    assert classify_error(ValueError("resposta 504")) == UNKNOWN
+
+
+def test_backoff_is_capped_full_jitter():
+    backoff = Backoff(base=0.5, cap=4.0, rng=random.Random(1))
+    for attempt in range(10):
+        for _ in range(50):
+            delay = backoff.delay(attempt)
+            assert 0 <= delay <= min(4.0, 0.5 * 2 ** attempt)
+    # Jitter: esperas diferentes para a mesma tentativa
+    assert len({round(backoff.delay(3), 6) for _ in range(20)}) > 1
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker("IA", failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 1
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    # Depois do prazo, só uma chamada de teste passa
+    clock.now = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker("IA", failure_threshold=1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 5
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 2
+
+
+def test_call_retries_transient_errors():
+    clock = FakeClock()
+    retries = []
+    policy = RetryPolicy(max_attempts=3, backoff=Backoff(rng=random.Random(0)), clock=clock,
+                         on_retry=lambda attempt, error, delay: retries.append(attempt))
+    results = iter([StatusError(503), APITimeoutError(), "ok"])
+
+    def flaky():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert policy.call(flaky, sleep=clock.sleep) == "ok"
+    assert retries == [0, 1]
+
+
+def test_call_does_not_retry_auth_errors():
+    clock = FakeClock()
+    calls = []
+
+    def unauthorized():
+        calls.append(1)
+        raise StatusError(401)
+
+    breaker = CircuitBreaker(failure_threshold=1, clock=clock)
+    policy = RetryPolicy(max_attempts=3, breaker=breaker, clock=clock)
+    with pytest.raises(StatusError):
+        policy.call(unauthorized, sleep=clock.sleep)
+    assert len(calls) == 1
+    # Erro do cliente não abre o disjuntor
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_call_respects_total_budget():
+    clock = FakeClock()
+    calls = []
+
+    def down():
+        calls.append(1)
+        clock.now += 4  # cada tentativa leva 4 s até o timeout
+        raise APITimeoutError()
+
+    policy = RetryPolicy(max_attempts=10, backoff=Backoff(base=1, cap=1, rng=random.Random(0)),
+                         max_elapsed=6, clock=clock)
+    with pytest.raises(APITimeoutError):
+        policy.call(down, sleep=clock.sleep)
+    assert len(calls) == 2
+
+
+def test_open_breaker_skips_the_call():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    policy = RetryPolicy(max_attempts=2, backoff=Backoff(base=0.1, cap=0.1), breaker=breaker, clock=clock)
+
+    def down():
+        raise StatusError(502)
+
+    with pytest.raises(StatusError):
+        policy.call(down, sleep=clock.sleep)
+    calls = []
+    with pytest.raises(CircuitOpen):
+        policy.call(lambda: calls.append(1), sleep=clock.sleep)
+    assert calls == []
+
+
+def test_passthrough_errors_skip_retries_and_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    policy = RetryPolicy(max_attempts=3, breaker=breaker, passthrough=(LookupError,), clock=clock)
+    calls = []
+
+    def refused():
+        calls.append(1)
+        raise KeyError("ocupado")
+
+    with pytest.raises(KeyError):
+        policy.call(refused, sleep=clock.sleep)
+    assert calls == [1]
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_call_async_retries_without_blocking():
+    attempts = []
+    waits = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise StatusError(503)
+        return "ok"
+
+    async def sleep(seconds):
+        waits.append(seconds)
+
+    policy = RetryPolicy(max_attempts=3, backoff=Backoff(base=0.001, cap=0.001))
+    assert asyncio.run(policy.call_async(flaky, sleep=sleep)) == "ok"
+    assert len(attempts) == 2 and len(waits) == 1
+
+
+def test_inner_circuit_open_is_not_a_failure():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    policy = RetryPolicy(max_attempts=3, breaker=breaker, clock=clock)
+    calls = []
+
+    def router_down():
+        calls.append(1)
+        raise CircuitOpen("roteador", 10)
+
+    with pytest.raises(CircuitOpen):
+        policy.call(router_down, sleep=clock.sleep)
+    assert calls == [1]
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,31 @@
+import sys
+import os
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stage_timing import LatencyRecorder, percentile
+
+def test_percentile_matches_numpy():
+    values = [0.3, 0.1, 0.7, 0.2, 0.9, 0.4, 0.5]
+    for q in (0, 50, 95, 99, 100):
+        assert abs(percentile(values, q) - np.percentile(values, q)) < 1e-12
+    assert percentile([], 50) == 0.0
+
+def test_recorder_summary_and_window():
+    recorder = LatencyRecorder(max_samples=3)
+    for seconds in (1.0, 2.0, 3.0, 4.0):
+        recorder.record("llm", seconds)
+    with recorder.stage("route"):
+        pass
+
+    summary = recorder.summary(["llm", "route", "tts"])
+    # Percentis sobre a janela recente; contagem e soma acumuladas desde o início
+    assert summary["llm"]["count"] == 3 and summary["llm"]["p50"] == 3.0
+    assert recorder.totals()["llm"] == {"count": 4, "sum": 10.0}
+    assert summary["route"]["count"] == 1
+    assert summary["tts"]["count"] == 0
+
+    recorder.reset()
+    assert recorder.summary() == {}
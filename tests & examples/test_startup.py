@@ -0,0 +1,80 @@
+import sys
+import os
+import json
+import subprocess
+import time
+
+# Adicionar diretório pai ao path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from startup import LazyModule, StartupTimer, lazy_import, preload
+
+# Orçamento de importação dos caminhos leves (segundos); ajustável em máquinas lentas
+IMPORT_BUDGET = float(os.getenv("IMPORT_BUDGET_SECONDS", "1.5"))
+HEAVY_MODULES = ["gradio", "requests", "openai", "httpx", "whisper", "torch", "sounddevice", "gtts", "pydub"]
+
+def test_lazy_module_imports_on_first_use(tmp_path, monkeypatch):
+    (tmp_path / "modulo_adiado.py").write_text("VALOR = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    module = lazy_import("modulo_adiado")
+    assert isinstance(module, LazyModule)
+    assert not module.loaded
+    assert "modulo_adiado" not in sys.modules
+
+    assert module.VALOR == 42
+    assert module.loaded and "modulo_adiado" in sys.modules
+    preload(module)
+    sys.modules.pop("modulo_adiado", None)
+
+def test_startup_timer_report():
+    timer = StartupTimer()
+    with timer.phase("stt"):
+        time.sleep(0.01)
+    timer.mark("ui")
+
+    names = [name for name, _ in timer.phases()]
+    assert names == ["stt", "ui"]
+    assert timer.phases()[0][1] >= 0.01
+    # A marca seguinte conta a partir do fim da fase anterior, sem somar de novo
+    assert timer.phases()[1][1] < 0.01
+    report = timer.format_report()
+    assert report.startswith("[Inicialização] pronto em")
+    assert "stt" in report and "ui" in report
+
+def run_isolated(code):
+    # Processo novo: mede a importação a frio, sem os mocks dos outros testes
+    env = dict(os.environ, STARTUP_REPORT="false", PYTHONDONTWRITEBYTECODE="1")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def test_text_mode_without_ai_import_budget():
+    result = run_isolated(
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import assistente_ai\n"
+        "args = assistente_ai.parse_args(['--mode', 'text', '--no-ai'])\n"
+        "stt = assistente_ai.build_stt(args, None)\n"
+        "ai = assistente_ai.build_ai(args)\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'seconds': elapsed, 'heavy': heavy, 'stt': type(stt).__name__, 'ai': ai}))\n"
+    )
+    assert result["stt"] == "TextInputSTT" and result["ai"] is None
+    assert result["heavy"] == []
+    assert result["seconds"] < IMPORT_BUDGET, f"importação levou {result['seconds']:.2f}s"
+
+def test_app_import_defers_gradio():
+    result = run_isolated(
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import app\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'seconds': elapsed, 'heavy': heavy}))\n"
+    )
+    assert result["heavy"] == []
+    assert result["seconds"] < IMPORT_BUDGET, f"importação levou {result['seconds']:.2f}s"
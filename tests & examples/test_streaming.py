@@ -0,0 +1,85 @@
+import sys
+import os
+import numpy as np
+from unittest.mock import MagicMock
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streaming import StreamingTranscriber, PartialTranscript
+
+WORDS = "pesquisar wikipedia sobre a história do brasil".split()
+
+def _fake_model():
+    # Cada segundo de áudio com voz "revela" mais uma palavra
+    model = MagicMock()
+    def transcribe(audio, **kwargs):
+        voiced = int(np.sum(np.abs(audio) > 0.05) // 16000)
+        return {"text": " " + " ".join(WORDS[:voiced])}
+    model.transcribe.side_effect = transcribe
+    return model
+
+def _feed_and_wait(transcriber, block):
+    transcriber.feed(block)
+    if transcriber._pending is not None:
+        transcriber._pending.result()
+
+def test_partials_become_stable():
+    received = []
+    transcriber = StreamingTranscriber(_fake_model(), step=1.0, on_partial=received.append)
+    for _ in range(4):
+        _feed_and_wait(transcriber, np.full(16000, 0.2, dtype=np.float32))
+
+    assert [p.text for p in received] == [" ".join(WORDS[:n]) for n in range(1, 5)]
+    # A palavra vista em duas hipóteses consecutivas passa a ser estável
+    assert received[-1].stable == " ".join(WORDS[:3])
+    assert received[-1].unstable == WORDS[3]
+
+def test_finalize_reuses_hypothesis_when_tail_is_silent():
+    model = _fake_model()
+    transcriber = StreamingTranscriber(model, step=1.0)
+    for _ in range(3):
+        _feed_and_wait(transcriber, np.full(16000, 0.2, dtype=np.float32))
+    calls = model.transcribe.call_count
+
+    # Hangover do VAD: só silêncio depois da última decodificação
+    transcriber.feed(np.zeros(8000, dtype=np.float32))
+    assert transcriber.finalize() == " ".join(WORDS[:3])
+    assert model.transcribe.call_count == calls
+
+def test_finalize_decodes_unseen_speech():
+    transcriber = StreamingTranscriber(_fake_model(), step=10.0)
+    transcriber.feed(np.full(2 * 16000, 0.2, dtype=np.float32))
+    assert transcriber.finalize() == " ".join(WORDS[:2])
+
+def test_partials_generator_ends_on_final():
+    transcriber = StreamingTranscriber(_fake_model(), step=1.0)
+    _feed_and_wait(transcriber, np.full(16000, 0.2, dtype=np.float32))
+    transcriber.finalize()
+    partials = list(transcriber.partials())
+    assert partials[-1].final
+    assert partials[-1].text == WORDS[0]
+
+def test_window_shift_keeps_committed_text():
+    transcriber = StreamingTranscriber(_fake_model(), step=1.0, window=3.0, overlap=1.0)
+    for _ in range(5):
+        _feed_and_wait(transcriber, np.full(16000, 0.2, dtype=np.float32))
+    text = transcriber.current().text
+    assert text.startswith(" ".join(WORDS[:2]))
+
+def test_window_shift_keeps_unstable_words():
+    # Fala longa em blocos de 3 s: cada janela cheia é decodificada uma única vez, então
+    # nenhuma palavra chega a ser estável antes de o áudio dela sair da janela
+    words = "abra o navegador e pesquise a previsão do tempo".split()
+    model = MagicMock()
+    def transcribe(audio, **kwargs):
+        # Cada segundo de áudio traz a palavra codificada na amplitude
+        seconds = audio[: len(audio) // 16000 * 16000].reshape(-1, 16000)
+        return {"text": " " + " ".join(words[int(round(s[0] * 100)) - 10] for s in seconds)}
+    model.transcribe.side_effect = transcribe
+
+    transcriber = StreamingTranscriber(model, step=1.0, window=3.0, overlap=1.0)
+    speech = [np.full(16000, (10 + i) / 100, dtype=np.float32) for i in range(len(words))]
+    for start in range(0, len(speech), 3):
+        _feed_and_wait(transcriber, np.concatenate(speech[start:start + 3]))
+    assert transcriber.finalize() == " ".join(words)
@@ -0,0 +1,25 @@
+import sys
+import os
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_utils import SentenceBuffer, split_sentences
+
+def test_split_sentences():
+    text = "Olá! O Brasil tem 26 estados. A capital é Brasília, criada em 1960."
+    assert split_sentences(text) == ["Olá! O Brasil tem 26 estados.", "A capital é Brasília, criada em 1960."]
+
+def test_split_sentences_keeps_abbreviations():
+    assert split_sentences("Falei com o Dr. Silva ontem à tarde. Ele confirmou.") == [
+        "Falei com o Dr. Silva ontem à tarde.", "Ele confirmou."]
+
+def test_sentence_buffer_incremental_tokens():
+    buffer = SentenceBuffer()
+    tokens = ["A cap", "ital do Brasil", " é Brasília", ". Ela fica", " no Centro-Oeste", "."]
+    released = []
+    for token in tokens:
+        released += buffer.push(token)
+    # A última frase ainda pode continuar: só sai no flush
+    assert released == ["A capital do Brasil é Brasília."]
+    assert buffer.flush() == ["Ela fica no Centro-Oeste."]
@@ -0,0 +1,40 @@
+import sys
+import os
+import numpy as np
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcription_pool import TranscriptionPool
+
+class FakeModel:
+    def transcribe(self, audio, **options):
+        if isinstance(audio, str):
+            return {"text": audio}
+        return {
+            "text": f"{len(audio)} {audio.dtype} {float(audio.sum()):.1f}",
+            "pid": os.getpid(),
+            "threads": os.environ.get("OMP_NUM_THREADS"),
+            "language": options.get("language"),
+        }
+
+def fake_loader(model_size):
+    # Executado dentro de cada processo do pool
+    return FakeModel()
+
+def test_pool_transcribes_through_shared_memory():
+    pool = TranscriptionPool("tiny", workers=2, threads_per_worker=3, loader=fake_loader)
+    try:
+        pool.start(wait=True)
+        assert pool.status()["state"] == "pronto"
+
+        audio = np.full(16000, 0.5, dtype=np.float32)
+        result = pool.transcribe(audio, language="pt", fp16=False)
+
+        assert result["text"] == "16000 float32 8000.0"
+        assert result["pid"] != os.getpid()
+        assert result["threads"] == "3"
+        assert result["language"] == "pt"
+        assert pool.transcribe("fala.mp3")["text"] == "fala.mp3"
+    finally:
+        pool.shutdown()
@@ -0,0 +1,77 @@
+import sys
+import os
+import threading
+import pytest
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_cache import TTSCache
+
+def _writer(calls, size=100):
+    def write_for(text):
+        def write(path):
+            calls.append(text)
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+        return write
+    return write_for
+
+def test_hit_skips_synthesis(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=10_000)
+    calls = []
+    first = cache.get_or_create("gtts", "pt", "Olá! Como posso ajudar?", _writer(calls)("a"))
+    second = cache.get_or_create("gtts", "pt", "  Olá!   Como posso ajudar? ", _writer(calls)("b"))
+
+    assert first == second
+    assert calls == ["a"]
+    assert cache.hits == 1
+    # Idioma ou motor diferentes são entradas diferentes
+    assert cache.get("gtts", "en", "Olá! Como posso ajudar?") is None
+
+def test_lru_eviction_under_byte_budget(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=250)
+    write_for = _writer([])
+    a = cache.put("gtts", "pt", "a", write_for("a"))
+    b = cache.put("gtts", "pt", "b", write_for("b"))
+    os.utime(a, (1, 1))
+    os.utime(b, (2, 2))
+    cache.get("gtts", "pt", "a")  # "a" passa a ser o mais recente
+
+    cache.put("gtts", "pt", "c", write_for("c"))
+
+    assert os.path.exists(a)
+    assert not os.path.exists(b)
+    assert cache.get("gtts", "pt", "c") is not None
+
+def test_failed_write_leaves_nothing(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    def broken(path):
+        with open(path, "wb") as f:
+            f.write(b"meio arquivo")
+        raise IOError("rede caiu")
+
+    with pytest.raises(IOError):
+        cache.put("gtts", "pt", "Olá", broken)
+    assert cache.get("gtts", "pt", "Olá") is None
+    assert not any(name.endswith(".tmp") for _, _, files in os.walk(tmp_path) for name in files)
+
+def test_concurrent_writers_same_phrase(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(cache.put("gtts", "pt", "Até logo!", _writer([])("x"))))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(paths)) == 1
+    assert os.path.getsize(paths[0]) == 100
+
+def test_precompute_system_phrases(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    calls = []
+    phrases = ["Abrindo mapa de farmácias próximas.", "O que devo pesquisar na Wikipedia?"]
+    assert cache.precompute("gtts", "pt", phrases, _writer(calls)) == 2
+    assert cache.precompute("gtts", "pt", phrases, _writer(calls)) == 0
+    assert sorted(calls) == sorted(phrases)
@@ -0,0 +1,128 @@
+import sys
+import os
+import numpy as np
+from unittest.mock import MagicMock
+
+# Adicionar diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_utils import EndpointConfig
+import pytest
+
+from wake_word import CpuMeter, TemplateSpotter, WakeWordGate, WakeWordSTT, WakeWordUnavailable, build_gate
+
+SR = 16000
+rng = np.random.default_rng(0)
+
+def sweep(f0=300.0, seconds=0.6, amp=0.3):
+    # "Palavra" sintética: duas varreduras de frequência em sentidos opostos
+    t = np.arange(int(SR * seconds)) / SR
+    f = f0 + 800 * t / t[-1]
+    x = amp * np.sin(2 * np.pi * np.cumsum(f) / SR) + amp * np.sin(2 * np.pi * np.cumsum(2.5 * f[::-1]) / SR)
+    return (x + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+def test_template_spotter_detects_word_and_rejects_others(tmp_path):
+    spotter = TemplateSpotter.from_examples([sweep(seconds=s) for s in (0.6, 0.66, 0.54)])
+    silence = 0.005 * rng.standard_normal(4000).astype(np.float32)
+
+    # Mais baixo, um pouco mais lento e cercado de ruído
+    said = np.concatenate([silence, sweep(seconds=0.63, amp=0.1), silence])
+    assert spotter(said)
+    assert not spotter(np.concatenate([silence, sweep(f0=900)[::-1].copy()]))
+    assert not spotter((0.2 * rng.standard_normal(SR)).astype(np.float32))
+
+    path = str(tmp_path / "wake.npz")
+    spotter.save(path)
+    loaded = TemplateSpotter.load(path)
+    assert len(loaded.templates) == 3 and loaded(said)
+
+def test_template_spotter_locates_end_of_word():
+    spotter = TemplateSpotter.from_examples([sweep(seconds=s) for s in (0.6, 0.66, 0.54)])
+    silence = 0.005 * rng.standard_normal(8000).astype(np.float32)
+    said = np.concatenate([silence[:4000], sweep(seconds=0.6), silence])
+
+    # A palavra vai de 0,25 s a 0,85 s; o que vem depois é o começo do comando
+    end = spotter.match_end(said)
+    assert abs(end - int(0.85 * SR)) < int(0.1 * SR)
+    assert spotter.match_end(silence) is None
+
+def test_gate_only_runs_detector_on_voiced_segments():
+    cfg = EndpointConfig(hangover=0.09, max_length=1.0)
+    detector = MagicMock(side_effect=[False, True])
+    gate = WakeWordGate(detector, cfg)
+    silence = np.zeros(cfg.block_size, np.float32)
+    voice = np.full(cfg.block_size, 0.2, np.float32)
+
+    blocks = [silence] * 50 + [voice] * 5 + [silence] * 5 + [silence] * 50 + [voice] * 5 + [silence] * 5
+    results = [gate.process_block(b) for b in blocks]
+
+    assert detector.call_count == 2
+    assert results.count(True) == 1 and gate.detections == 1
+
+class FakeMicrophone:
+    def __init__(self, blocks):
+        self.blocks = iter(blocks)
+        self.opened = 0
+        self.closed = 0
+
+    def __call__(self, block_size):
+        self.opened += 1
+        return self
+
+    def read(self):
+        return next(self.blocks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed += 1
+
+def test_wake_word_stt_wakes_inner_only_after_detection():
+    inner = MagicMock()
+    inner.listen_from.return_value = "que horas são"
+    tail = np.ones(10, np.float32)
+    gate = MagicMock(block_size=480)
+    gate.wait.side_effect = [None, tail]
+    on_wake = MagicMock()
+    mic = FakeMicrophone([])
+    stt = WakeWordSTT(inner, gate, on_wake=on_wake, microphone=mic)
+
+    assert stt.listen(timeout=1) is None
+    inner.listen_from.assert_not_called()
+    assert stt.listen() == "que horas são"
+    on_wake.assert_called_once()
+    # O comando continua no mesmo stream, a partir do que veio depois da palavra
+    read_block, prefix, _timeout = inner.listen_from.call_args.args
+    assert read_block == mic.read and prefix is tail
+    inner.listen.assert_not_called()
+    assert mic.opened == mic.closed == 2
+
+def test_gate_hands_over_audio_after_the_word():
+    cfg = EndpointConfig(hangover=0.09, max_length=1.0)
+    gate = WakeWordGate(MagicMock(return_value=True), cfg)
+    silence = np.zeros(cfg.block_size, np.float32)
+    voice = np.full(cfg.block_size, 0.2, np.float32)
+    mic = FakeMicrophone([silence] * 5 + [voice] * 5 + [silence] * 5)
+
+    tail = gate.wait(read_block=mic.read)
+    assert tail is not None and gate.detections == 1
+    # Os blocos seguintes ficam no stream para o reconhecedor
+    assert next(mic.blocks, None) is not None
+
+def test_cpu_meter_reports_per_state():
+    ticks = iter([0.0, 10.0, 12.0])
+    cpu = iter([0.0, 0.1, 1.1])
+    meter = CpuMeter(clock=lambda: next(ticks), cpu_clock=lambda: next(cpu))
+    meter.switch("ocioso")
+    meter.switch("ativo")
+    meter.switch(None)
+
+    report = meter.report()
+    assert round(report["ocioso"]["cpu_percent"], 3) == 1.0
+    assert round(report["ativo"]["cpu_percent"], 3) == 50.0
+
+def test_build_gate_fails_loudly_without_templates(tmp_path):
+    missing = str(tmp_path / "nada.npz")
+    with pytest.raises(WakeWordUnavailable, match="--enroll-wake-word"):
+        build_gate("assistente", path=missing)
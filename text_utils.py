@@ -0,0 +1,64 @@
+# Utilidades de texto compartilhadas pelas respostas faladas.
+
+import re
+import unicodedata
+from typing import List
+
+# Fim de frase: pontuação final seguida de espaço (ou quebra de linha)
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+# Abreviações comuns que não encerram a frase
+_ABBREVIATIONS = {"sr.", "sra.", "dr.", "dra.", "prof.", "etc.", "ex.", "av.", "nº.", "obs."}
+
+
+def normalize_for_speech(text: str) -> str:
+    # Mesma fala, mesma chave: unifica a forma Unicode e os espaços (pontuação e
+    # maiúsculas são mantidas porque mudam a entonação)
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+def normalize_query(text: str) -> str:
+    # Para comparar perguntas: sem acentos, sem pontuação e sem diferença de maiúsculas
+    # ("Que horas são?" == "que horas sao")
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    cleaned = re.sub(r"[^\w\s]", " ", without_accents.casefold())
+    return " ".join(cleaned.split())
+
+
+def _is_complete(sentence: str, min_chars: int) -> bool:
+    # Frases muito curtas são juntadas à seguinte para não gerar áudios picotados
+    if len(sentence) < min_chars:
+        return False
+    return sentence.rsplit(" ", 1)[-1].lower() not in _ABBREVIATIONS
+
+
+class SentenceBuffer:
+    """Acumula texto recebido aos pedaços (tokens) e libera frases completas."""
+
+    def __init__(self, min_chars: int = 12):
+        self._buffer = ""
+        self._min_chars = min_chars
+
+    def push(self, text: str) -> List[str]:
+        self._buffer += text
+        sentences = []
+        start = 0
+        # O trecho depois do último fim de frase pode estar incompleto e fica no buffer
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            if _is_complete(candidate, self._min_chars):
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
+
+
+def split_sentences(text: str, min_chars: int = 12) -> List[str]:
+    buffer = SentenceBuffer(min_chars)
+    return buffer.push(text or "") + buffer.flush()
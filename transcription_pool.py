@@ -0,0 +1,143 @@
+# Serviço de transcrição em processos separados.
+#
+# Cada processo do pool carrega o seu próprio modelo Whisper com um número fixo de
+# threads do PyTorch (para que os processos não disputem os mesmos núcleos). O áudio
+# é entregue por memória compartilhada em vez de bytes serializados, e o trabalho
+# pesado de CPU deixa de competir com o servidor Gradio no mesmo interpretador.
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from model_registry import _load_whisper, warm_up
+
+# Estado de cada processo de trabalho
+_worker_model = None
+
+
+def _pin_threads(threads: int) -> None:
+    # Precisa acontecer antes de o PyTorch criar seus pools de threads
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Só pode ser chamado antes do primeiro uso do pool inter-op
+        pass
+
+
+def _init_worker(model_size: str, threads: int, language: str, loader: Callable) -> None:
+    global _worker_model
+    _pin_threads(threads)
+    _worker_model = loader(model_size)
+    warm_up(_worker_model, language)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _transcribe_shared(name: str, shape, dtype: str, options: Dict[str, object]) -> dict:
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        audio = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        result = _worker_model.transcribe(audio, **options)
+        del audio
+        return result
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # Algum tensor ainda aponta para o buffer; o SO libera ao desanexar no fim do processo
+            pass
+
+
+def _transcribe_path(path: str, options: Dict[str, object]) -> dict:
+    return _worker_model.transcribe(path, **options)
+
+
+class TranscriptionPool:
+    """Pool de processos com a mesma interface de model.transcribe()."""
+
+    def __init__(self, model_size: str, workers: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                 language: str = "pt", loader: Callable = _load_whisper):
+        cpus = os.cpu_count() or 1
+        self.model_size = model_size
+        self.workers = workers or max(1, cpus // 2)
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.workers)
+        self._started_at: Optional[float] = None
+        self._load_seconds: Optional[float] = None
+        self._error: Optional[str] = None
+        # "spawn": processos limpos, sem herdar threads nem o estado do PyTorch do processo principal
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_size, self.threads_per_worker, language, loader),
+        )
+
+    def start(self, wait: bool = False) -> None:
+        # Cria todos os processos já na inicialização (cada um carrega e aquece o modelo)
+        self._started_at = time.perf_counter()
+        pings = [self._executor.submit(_ping) for _ in range(self.workers)]
+
+        def _done(_future):
+            if all(p.done() for p in pings) and self._load_seconds is None:
+                errors = [p.exception() for p in pings if p.exception() is not None]
+                if errors:
+                    self._error = str(errors[0])
+                else:
+                    self._load_seconds = time.perf_counter() - self._started_at
+
+        for p in pings:
+            p.add_done_callback(_done)
+        if wait:
+            for p in pings:
+                p.exception()
+
+    def submit(self, audio, **options) -> Future:
+        options = {k: v for k, v in options.items() if v is not None}
+        if isinstance(audio, str):
+            return self._executor.submit(_transcribe_path, audio, options)
+
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+        np.ndarray(audio.shape, dtype=audio.dtype, buffer=shm.buf)[:] = audio
+        future = self._executor.submit(_transcribe_shared, shm.name, audio.shape, audio.dtype.str, options)
+
+        def _release(_future):
+            shm.close()
+            shm.unlink()
+
+        future.add_done_callback(_release)
+        return future
+
+    def transcribe(self, audio, **options) -> dict:
+        return self.submit(audio, **options).result()
+
+    def status(self) -> Dict[str, object]:
+        if self._error is not None:
+            state = "erro"
+        elif self._load_seconds is not None:
+            state = "pronto"
+        else:
+            state = "carregando"
+        return {
+            "model": f"{self.model_size} ({self.workers} processos x {self.threads_per_worker} threads)",
+            "state": state,
+            "load_seconds": self._load_seconds,
+            "error": self._error,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
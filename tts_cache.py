@@ -0,0 +1,127 @@
+# Cache persistente de áudios de TTS endereçado por conteúdo.
+#
+# A chave é um hash de (motor, idioma, texto normalizado). Frases repetidas, como
+# "Olá! Como posso ajudar?", voltam do disco sem chamada de rede. As gravações são
+# atômicas (arquivo temporário + os.replace), então vários processos podem usar o
+# mesmo diretório, e os arquivos menos usados são removidos quando o total passa do
+# limite de bytes.
+
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Callable, Iterable, Optional
+
+from text_utils import normalize_for_speech, split_sentences
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "assistente-virtual", "tts")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class TTSCache:
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None, suffix: str = ".mp3"):
+        self.directory = directory or os.getenv("TTS_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("TTS_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._suffix = suffix
+        self._lock = threading.Lock()
+        self._approx_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(engine: str, language: str, text: str) -> str:
+        raw = "\0".join((engine, language, normalize_for_speech(text)))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self._suffix)
+
+    def get(self, engine: str, language: str, text: str) -> Optional[str]:
+        path = self._path(self.key(engine, language, text))
+        try:
+            # Atualiza o mtime: é ele que define a ordem de remoção (LRU)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, engine: str, language: str, text: str, write: Callable[[str], None]) -> str:
+        # write(caminho) grava o áudio no arquivo temporário indicado
+        path = self._path(self.key(engine, language, text))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            size = os.path.getsize(tmp_path)
+            if size == 0:
+                raise ValueError("A síntese não gerou áudio.")
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes += size
+        if self._approx_bytes is None or self._approx_bytes > self.max_bytes:
+            self.evict()
+        return path
+
+    def get_or_create(self, engine: str, language: str, text: str, write: Callable[[str], None]) -> str:
+        path = self.get(engine, language, text)
+        if path is not None:
+            return path
+        return self.put(engine, language, text, write)
+
+    def _entries(self):
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(self._suffix):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def evict(self) -> int:
+        # Remove os arquivos menos usados até voltar ao limite; outro processo pode
+        # estar fazendo o mesmo, então arquivos já removidos são ignorados.
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _mtime, size, _path in entries)
+            removed = 0
+            for _mtime, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._approx_bytes = total
+            return removed
+
+    def precompute(self, engine: str, language: str, phrases: Iterable[str], write_for: Callable[[str], Callable[[str], None]]) -> int:
+        # Sintetiza antecipadamente as frases fixas (e cada frase delas, como no modo em streaming)
+        created = 0
+        for phrase in phrases:
+            for text in dict.fromkeys([phrase] + split_sentences(phrase)):
+                if self.get(engine, language, text) is None:
+                    try:
+                        self.put(engine, language, text, write_for(text))
+                        created += 1
+                    except Exception as e:
+                        print(f"[TTSCache] Não foi possível pré-calcular '{text}': {e}")
+        return created
@@ -0,0 +1,344 @@
+# Palavra de ativação ("assistente") na frente do reconhecimento de fala.
+#
+# O microfone fica aberto o tempo todo, mas em silêncio cada bloco custa apenas o
+# cálculo de energia do VAD. Só os trechos com voz curtos (até ~2 s) passam pelo
+# detector da palavra de ativação (TemplateSpotter: MFCC + DTW contra exemplos
+# gravados pelo usuário com enroll(), numpy puro, alguns milissegundos por trecho).
+# Depois da palavra, o mesmo stream do microfone segue para o Whisper (ou outro STT),
+# junto com o áudio que veio logo após a palavra: o começo do comando não se perde.
+
+import os
+import time
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from audio_utils import WHISPER_SAMPLE_RATE, EndpointConfig, Endpointer
+
+DEFAULT_TEMPLATES_PATH = os.path.join(os.path.expanduser("~"), ".cache", "assistente-virtual", "wake_word.npz")
+
+# Trechos de voz curtos: a palavra de ativação dura bem menos de 2 s
+GATE_CONFIG = EndpointConfig(pre_roll=0.2, hangover=0.3, max_length=2.0)
+
+# Janelas do MFCC (s)
+FRAME_LENGTH = 0.025
+FRAME_HOP = 0.010
+
+
+class WakeWordUnavailable(RuntimeError):
+    """--wake-word pedido, mas o portão não pode funcionar (sem exemplos gravados, sem microfone)."""
+
+
+# Extração de características (MFCC)
+
+_FILTERBANKS: Dict[tuple, np.ndarray] = {}
+
+
+def _mel_filterbank(sr: int, n_fft: int, n_mels: int) -> np.ndarray:
+    key = (sr, n_fft, n_mels)
+    if key not in _FILTERBANKS:
+        mel = lambda f: 2595.0 * np.log10(1.0 + f / 700.0)
+        hz = lambda m: 700.0 * (10 ** (m / 2595.0) - 1.0)
+        points = hz(np.linspace(mel(0), mel(sr / 2), n_mels + 2))
+        bins = np.floor((n_fft + 1) * points / sr).astype(int)
+        fb = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+        for m in range(1, n_mels + 1):
+            left, center, right = bins[m - 1], bins[m], bins[m + 1]
+            if center > left:
+                fb[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+            if right > center:
+                fb[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+        _FILTERBANKS[key] = fb
+    return _FILTERBANKS[key]
+
+
+def mfcc(audio: np.ndarray, sr: int = WHISPER_SAMPLE_RATE, n_mfcc: int = 13, n_mels: int = 26) -> np.ndarray:
+    # Janelas de 25 ms a cada 10 ms; retorna (quadros, n_mfcc)
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    frame_len, hop, n_fft = int(sr * FRAME_LENGTH), int(sr * FRAME_HOP), 512
+    if len(audio) < frame_len:
+        audio = np.pad(audio, (0, frame_len - len(audio)))
+    emphasized = np.append(audio[0], audio[1:] - 0.97 * audio[:-1])
+    frames = np.lib.stride_tricks.sliding_window_view(emphasized, frame_len)[::hop] * np.hamming(frame_len)
+    power = np.abs(np.fft.rfft(frames, n_fft)) ** 2 / n_fft
+    log_mel = np.log(power @ _mel_filterbank(sr, n_fft, n_mels).T + 1e-10)
+    # Faixa dinâmica limitada (~17 dB abaixo do pico): o ruído de fundo fraco não pesa na comparação
+    log_mel = np.maximum(log_mel, log_mel.max() - 4.0)
+    k = np.arange(n_mels)
+    dct = np.cos(np.pi / n_mels * (k + 0.5)[None, :] * np.arange(n_mfcc + 1)[:, None])
+    # O coeficiente 0 (energia) é descartado: o volume da voz não deve influenciar
+    # (sem normalização pela média: o silêncio ao redor da palavra mudaria a média)
+    return (log_mel @ dct.T)[:, 1:].astype(np.float32)
+
+
+def _dtw_last_row(template: np.ndarray, segment: np.ndarray) -> np.ndarray:
+    # Distância média do exemplo terminando em cada quadro do segmento. Cada linha
+    # depende só da anterior (passos: diagonal, repetir ou pular um quadro do segmento),
+    # então o cálculo é vetorizado por linha.
+    cost = np.sqrt(((template[:, None, :] - segment[None, :, :]) ** 2).sum(axis=2))
+    acc = cost[0].copy()
+    for i in range(1, len(template)):
+        prev = acc
+        best = prev.copy()
+        best[1:] = np.minimum(best[1:], prev[:-1])
+        best[2:] = np.minimum(best[2:], prev[:-2])
+        acc = cost[i] + best
+    return acc / len(template)
+
+
+def subsequence_dtw(template: np.ndarray, segment: np.ndarray) -> float:
+    # Menor distância média entre o exemplo e qualquer trecho do segmento
+    return float(_dtw_last_row(template, segment).min())
+
+
+class TemplateSpotter:
+    """Detecta a palavra comparando o trecho com exemplos gravados (MFCC + DTW)."""
+
+    def __init__(self, templates: List[np.ndarray], threshold: float):
+        self.templates = templates
+        self.threshold = threshold
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TEMPLATES_PATH) -> Optional["TemplateSpotter"]:
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        templates = [data[k] for k in sorted(data.files) if k != "threshold"]
+        return cls(templates, float(data["threshold"]))
+
+    def save(self, path: str = DEFAULT_TEMPLATES_PATH) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays = {f"t{i:02d}": t for i, t in enumerate(self.templates)}
+        np.savez(path, threshold=np.float32(self.threshold), **arrays)
+
+    @classmethod
+    def from_examples(cls, examples: List[np.ndarray], margin: float = 1.25) -> "TemplateSpotter":
+        # O limiar é calibrado pela distância entre os próprios exemplos
+        templates = [mfcc(e) for e in examples]
+        distances = [subsequence_dtw(a, b) for i, a in enumerate(templates) for j, b in enumerate(templates) if i != j]
+        threshold = max(distances) * margin if distances else 0.0
+        return cls(templates, threshold)
+
+    def score(self, audio: np.ndarray) -> float:
+        features = mfcc(audio)
+        return min(subsequence_dtw(t, features) for t in self.templates)
+
+    def match_end(self, audio: np.ndarray, sr: int = WHISPER_SAMPLE_RATE) -> Optional[int]:
+        # Amostra em que a palavra termina no trecho (None se não for a palavra)
+        if not self.templates:
+            return None
+        features = mfcc(audio, sr)
+        best = min((_dtw_last_row(t, features) for t in self.templates), key=lambda row: row.min())
+        if best.min() > self.threshold:
+            return None
+        return min(len(audio), int(best.argmin()) * int(sr * FRAME_HOP) + int(sr * FRAME_LENGTH))
+
+    def __call__(self, audio: np.ndarray) -> bool:
+        return self.match_end(audio) is not None
+
+
+# Medição de CPU por estado
+
+class CpuMeter:
+    """Acumula tempo de CPU do processo e tempo de relógio por estado ("ocioso", "ativo")."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter,
+                 cpu_clock: Callable[[], float] = time.process_time):
+        self._clock = clock
+        self._cpu_clock = cpu_clock
+        self._totals: Dict[str, List[float]] = {}
+        self._state: Optional[str] = None
+        self._wall_start = 0.0
+        self._cpu_start = 0.0
+
+    def switch(self, state: Optional[str]) -> None:
+        wall, cpu = self._clock(), self._cpu_clock()
+        if self._state is not None:
+            totals = self._totals.setdefault(self._state, [0.0, 0.0])
+            totals[0] += wall - self._wall_start
+            totals[1] += cpu - self._cpu_start
+        self._state, self._wall_start, self._cpu_start = state, wall, cpu
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        # cpu_percent: uso médio em porcentagem de um núcleo
+        return {
+            state: {"seconds": wall, "cpu_seconds": cpu, "cpu_percent": 100.0 * cpu / wall if wall > 0 else 0.0}
+            for state, (wall, cpu) in self._totals.items()
+        }
+
+    def format_report(self) -> str:
+        return ", ".join(f"{state}: {r['cpu_percent']:.1f}% CPU em {r['seconds']:.0f}s"
+                         for state, r in self.report().items())
+
+
+# Microfone compartilhado
+
+class MicrophoneInput:
+    """Stream do microfone aberto uma vez e lido em blocos pelo portão e, depois, pelo STT."""
+
+    def __init__(self, block_size: int = GATE_CONFIG.block_size):
+        self.block_size = block_size
+        self._stream = None
+
+    def read(self) -> np.ndarray:
+        if self._stream is None:
+            import sounddevice as sd
+            self._stream = sd.InputStream(samplerate=WHISPER_SAMPLE_RATE, channels=1, dtype="float32",
+                                          blocksize=self.block_size)
+            self._stream.start()
+        block, _overflowed = self._stream.read(self.block_size)
+        return np.asarray(block, dtype=np.float32).reshape(-1)
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def __enter__(self) -> "MicrophoneInput":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# Portão da palavra de ativação
+
+class WakeWordGate:
+    def __init__(self, detector: Callable[[np.ndarray], bool], config: EndpointConfig = GATE_CONFIG,
+                 meter: Optional[CpuMeter] = None):
+        self._detector = detector
+        self._config = config
+        self._endpointer = Endpointer(config)
+        self.meter = meter or CpuMeter()
+        self.detections = 0
+        self.segments = 0
+        # Áudio do último trecho detectado que veio depois da palavra (começo do comando)
+        self.tail = np.zeros(0, dtype=np.float32)
+
+    @property
+    def block_size(self) -> int:
+        return self._config.block_size
+
+    def _locate(self, segment: np.ndarray) -> Optional[int]:
+        if isinstance(self._detector, TemplateSpotter):
+            return self._detector.match_end(segment)
+        return len(segment) if self._detector(segment) else None
+
+    def process_block(self, block: np.ndarray) -> bool:
+        # Custo em silêncio: apenas o RMS do bloco
+        segment = self._endpointer.feed(block)
+        if segment is None:
+            return False
+        self.segments += 1
+        end = self._locate(segment)
+        if end is None:
+            return False
+        self.detections += 1
+        self.tail = segment[end:]
+        return True
+
+    def wait(self, timeout: Optional[float] = None,
+             read_block: Optional[Callable[[], np.ndarray]] = None) -> Optional[np.ndarray]:
+        # Bloqueia até ouvir a palavra de ativação e devolve o áudio que veio depois dela
+        # (None no timeout). Sem read_block, abre o próprio microfone.
+        if read_block is None:
+            with MicrophoneInput(self.block_size) as mic:
+                return self.wait(timeout, mic.read)
+
+        self.meter.switch("ocioso")
+        self._endpointer.reset()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                if self.process_block(read_block()):
+                    return self.tail
+            return None
+        finally:
+            self.meter.switch("ativo")
+
+
+class WakeWordSTT:
+    """Implementa SpeechToText: espera a palavra de ativação e só então chama o STT completo.
+
+    O STT interno precisa de listen_from(read_block, prefix, timeout): ele continua no
+    microfone já aberto pelo portão, começando pelo áudio lido depois da palavra.
+    """
+
+    def __init__(self, inner, gate: WakeWordGate, wake_word: str = "assistente",
+                 on_wake: Optional[Callable[[], None]] = None,
+                 microphone: Callable[[int], MicrophoneInput] = MicrophoneInput):
+        self._inner = inner
+        self._gate = gate
+        self._wake_word = wake_word
+        self._on_wake = on_wake
+        self._microphone = microphone
+
+    @property
+    def meter(self) -> CpuMeter:
+        return self._gate.meter
+
+    def listen(self, timeout: Optional[float] = None) -> Optional[str]:
+        print(f"\n[Palavra de ativação] Aguardando '{self._wake_word}'...")
+        # Um só stream para a palavra e o comando: fechar e reabrir cortaria o começo da fala.
+        # Entre um turno e outro ele é fechado, para não acumular a voz do próprio assistente.
+        with self._microphone(self._gate.block_size) as mic:
+            tail = self._gate.wait(timeout, mic.read)
+            if tail is None:
+                return None
+            print("[Palavra de ativação] Detectada! Fale o comando.")
+            if self._on_wake is not None:
+                self._on_wake()
+            return self._inner.listen_from(mic.read, tail, timeout)
+
+
+def record_examples(count: int = 3, seconds: float = 2.0) -> List[np.ndarray]:
+    # Grava exemplos da palavra de ativação usando o mesmo VAD do portão
+    import sounddevice as sd
+
+    config = replace(GATE_CONFIG, max_length=seconds, start_timeout=10.0)
+    examples = []
+    while len(examples) < count:
+        input(f"Pressione Enter e diga a palavra de ativação ({len(examples) + 1}/{count})...")
+        endpointer = Endpointer(config)
+        with sd.InputStream(samplerate=WHISPER_SAMPLE_RATE, channels=1, dtype="float32",
+                            blocksize=config.block_size) as stream:
+            while True:
+                block, _overflowed = stream.read(config.block_size)
+                segment = endpointer.feed(block)
+                if segment is not None or endpointer.timed_out:
+                    break
+        if segment is None:
+            print("Nenhuma fala detectada, tente de novo.")
+            continue
+        examples.append(segment)
+    return examples
+
+
+def enroll(count: int = 3, path: str = DEFAULT_TEMPLATES_PATH) -> TemplateSpotter:
+    spotter = TemplateSpotter.from_examples(record_examples(count))
+    spotter.save(path)
+    print(f"[Palavra de ativação] {count} exemplos salvos em {path} (limiar {spotter.threshold:.2f}).")
+    return spotter
+
+
+def build_gate(wake_word: str, path: Optional[str] = None) -> WakeWordGate:
+    # Falha com a instrução de correção em vez de seguir sem portão: transcrever cada
+    # trecho com o Whisper custaria o que o portão existe para evitar
+    path = path or os.getenv("WAKE_WORD_TEMPLATES", DEFAULT_TEMPLATES_PATH)
+    try:
+        detector = TemplateSpotter.load(path)
+    except Exception as e:
+        raise WakeWordUnavailable(f"Não foi possível ler os exemplos em {path}: {e}") from e
+    if detector is None or not detector.templates:
+        raise WakeWordUnavailable(
+            f"Nenhum exemplo da palavra '{wake_word}' gravado em {path}. "
+            "Grave com: python assistente_ai.py --enroll-wake-word 3")
+    try:
+        import sounddevice
+    except (ImportError, OSError) as e:
+        raise WakeWordUnavailable(f"O microfone precisa do sounddevice: {e}") from e
+    return WakeWordGate(detector)